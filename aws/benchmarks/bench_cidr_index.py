@@ -0,0 +1,72 @@
+"""
+Benchmark CIDR overlap detection on large synthetic address plans.
+
+Each plan carves /24 prefixes out of 10.0.0.0/8 across a number of accounts and
+regions and plants a known number of overlapping /16 and /25 prefixes. Run from
+the `aws` folder:
+
+    python3 benchmarks/bench_cidr_index.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources"))
+
+from cidr_index import CidrOverlapIndex
+
+REGIONS = ("us-east-1", "eu-west-1", "ap-southeast-1")
+BASE = int(ipaddress.ip_address("10.0.0.0"))
+
+
+def build_plan(size, accounts, overlaps, seed=0):
+    """Return (cidr, owner, account_id, region) tuples with `overlaps` planted conflicts."""
+    rng = random.Random(seed)
+    plan = []
+    per_partition = {}
+    for i in range(size - overlaps):
+        account_id = f"acc{i % accounts}"
+        region = REGIONS[i // accounts % len(REGIONS)]
+        slot = per_partition.get((account_id, region), 0)
+        per_partition[(account_id, region)] = slot + 1
+        cidr = f"{ipaddress.ip_address(BASE + slot * 256)}/24"
+        plan.append((cidr, f"vpc{i}", account_id, region))
+
+    for i in range(overlaps):
+        cidr, _, account_id, region = plan[rng.randrange(len(plan))]
+        subnet = next(ipaddress.ip_network(cidr).subnets(new_prefix=25))
+        plan.append((str(subnet), f"overlap{i}", account_id, region))
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CIDR overlap detection.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--overlaps", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'prefixes':>10} {'build':>9} {'check':>9} {'conflicts':>10} {'us/prefix':>10}")
+    for size in args.sizes:
+        plan = build_plan(size, args.accounts, args.overlaps)
+
+        start = time.perf_counter()
+        index = CidrOverlapIndex()
+        for cidr, owner, account_id, region in plan:
+            index.add(cidr, owner, account_id, region)
+        built = time.perf_counter()
+        conflicts = index.conflicts()
+        checked = time.perf_counter()
+
+        total = checked - start
+        print(
+            f"{size:>10} {built - start:>8.3f}s {checked - built:>8.3f}s "
+            f"{len(conflicts):>10} {total / size * 1e6:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
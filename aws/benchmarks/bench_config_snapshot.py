@@ -0,0 +1,100 @@
+"""
+Startup time of loading a large config tree with and without the compiled config snapshot.
+
+Writes a synthetic config/ tree (50k VPCs by default, see bench_pipeline.py) and times
+loading it into validated resources, as a run does before scheduling anything:
+
+- parse:        every file parsed and every resource schema-validated, without a snapshot
+- cold:         the same through --config-snapshot with no snapshot yet, which writes it
+- warm:         with an up-to-date snapshot, nothing parsed or validated
+- warm-changed: with one config file edited since the snapshot was written
+
+Config files are parsed in the main process (--load-jobs 1 by default). Run from the
+`aws` folder:
+
+    python3 benchmarks/bench_config_snapshot.py --vpcs 50000
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import tempfile
+import time
+
+from bench_pipeline import REGIONS, synthetic_vpcs, write_config_tree
+
+from config_snapshot import SCHEMA_GLOB, ConfigSnapshot  # noqa: E402
+from main import document_schema_errors, process_directory  # noqa: E402
+from schema_registry import schema_registry  # noqa: E402
+
+
+def load(config_dir, jobs, snapshot_file=None):
+    """Load and validate every resource, returning the number of resources and the snapshot report."""
+    snapshot = ConfigSnapshot(snapshot_file, document_schema_errors) if snapshot_file else None
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        resources_by_kind = process_directory(config_dir, jobs=jobs, snapshot=snapshot)
+        for resources in resources_by_kind.values():
+            for resource in resources:
+                resource.validation_errors(resource.SCHEMA_FILE)
+    report = [line for line in output.getvalue().splitlines() if line.startswith("Config snapshot:")]
+    return sum(len(resources) for resources in resources_by_kind.values()), "".join(report)
+
+
+def backdate(config_dir, seconds=3600):
+    """Age the tree, as a checkout of an earlier commit is. Files modified just before a
+    snapshot is built are hashed instead of trusted by mtime on the next run."""
+    mtime = time.time() - seconds
+    for root, _, files in os.walk(config_dir):
+        for file in files:
+            os.utime(os.path.join(root, file), (mtime, mtime))
+
+
+def edit_one_file(config_dir, vpc):
+    """Change the environment of one VPC, as a typical config change does."""
+    path = os.path.join(config_dir, vpc["account"], f"{vpc['name']}.yaml")
+    with open(path, "r") as file:
+        content = file.read()
+    with open(path, "w") as file:
+        file.write(content.replace(f"environment: {vpc['environment']}", "environment: staging"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold and warm config loading with the config snapshot.")
+    parser.add_argument("--vpcs", type=int, default=50000)
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--regions", type=int, default=4, choices=range(1, len(REGIONS) + 1), metavar="N")
+    parser.add_argument("--load-jobs", type=int, default=1)
+    args = parser.parse_args()
+
+    vpcs = synthetic_vpcs(args.vpcs, args.accounts, args.regions)
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_dir = os.path.join(work_dir, "config")
+        snapshot_file = os.path.join(work_dir, ".config-snapshot")
+        write_config_tree(config_dir, vpcs)
+        backdate(config_dir)
+        # Compile the validators up front, so no case pays for importing jsonschema
+        for schema_file in glob.glob(SCHEMA_GLOB):
+            schema_registry.get_validator(schema_file)
+
+        cases = [
+            ("parse", lambda: None, None),
+            ("cold", lambda: None, snapshot_file),
+            ("warm", lambda: None, snapshot_file),
+            ("warm-changed", lambda: edit_one_file(config_dir, vpcs[len(vpcs) // 2]), snapshot_file),
+        ]
+        print(f"{'case':<14} {'resources':>10} {'time':>9}")
+        results = {}
+        for case, prepare, snapshot in cases:
+            prepare()
+            start = time.perf_counter()
+            resources, report = load(config_dir, args.load_jobs, snapshot)
+            results[case] = time.perf_counter() - start
+            print(f"{case:<14} {resources:>10} {results[case]:>8.2f}s  {report}")
+        print(f"snapshot file: {os.path.getsize(snapshot_file) / 2**20:.1f}MiB")
+        print(f"warm start {results['parse'] / results['warm']:.1f}x faster than parsing")
+
+
+if __name__ == "__main__":
+    main()
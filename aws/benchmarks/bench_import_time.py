@@ -0,0 +1,73 @@
+"""
+Import-time regression check for the CLI, using `python -X importtime`.
+
+Imports main.py in a fresh interpreter a few times, takes the fastest cumulative
+import time of each module, prints the slowest ones and fails if main takes longer
+than --max-ms, or if any of the --forbid modules (boto3, jsonschema, jinja2 by
+default) is imported at startup. Run from the `aws` folder:
+
+    python3 benchmarks/bench_import_time.py --max-ms 150
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources")
+
+# "import time: self [us] | cumulative | imported package", nesting shown by indentation
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+DEFAULT_FORBIDDEN = ["boto3", "botocore", "jsonschema", "jinja2"]
+
+
+def import_times(module, resource_dir=RESOURCE_DIR):
+    """Return {module: cumulative microseconds} for importing a module in a fresh interpreter."""
+    code = f"import sys; sys.path.insert(0, {resource_dir!r}); import {module}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the CLI.")
+    parser.add_argument("--module", default="main", help="Module to import (default: main).")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to take the fastest time from.")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to print.")
+    parser.add_argument("--max-ms", type=float, help="Fail if the module takes longer than this to import.")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN,
+                        help="Modules that must not be imported at startup.")
+    args = parser.parse_args()
+
+    best = {}
+    for _ in range(args.runs):
+        for module, micros in import_times(args.module).items():
+            best[module] = min(micros, best.get(module, micros))
+
+    print(f"{'cumulative':>12}  module")
+    for module, micros in sorted(best.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{micros / 1000:>10.1f}ms  {module}")
+
+    failures = []
+    total = best[args.module] / 1000
+    if args.max_ms is not None and total > args.max_ms:
+        failures.append(f"{args.module} took {total:.1f}ms to import, limit {args.max_ms:.1f}ms")
+    for module in args.forbid:
+        if module in best:
+            failures.append(f"{module} is imported at startup")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"{args.module}: {total:.1f}ms")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Benchmark config parsing throughput on a synthetic config repository.
+
+Compares the previous loader (os.walk plus pure-Python yaml.safe_load per file)
+with config_loader serially, in a process pool, and with a kind filter that
+skips non-matching files without parsing them. Run from the `aws` folder:
+
+    python3 benchmarks/bench_loader.py --files 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources"))
+
+import yaml
+from config_loader import SafeLoader, load_documents
+
+VPC_DOCUMENT = """apiVersion: trafficplatform.aws/v1
+kind: VPC
+metadata:
+  name: vpc{i}
+spec:
+  account_id: "acc{account}"
+  vpc_name: vpc{i}
+  cidr_block: 10.{octet2}.{octet3}.0/24
+  region: us-east-1
+  environment: prod
+"""
+
+ATTACHMENT_DOCUMENT = """apiVersion: trafficplatform.aws/v1
+kind: CoreNetworkAttachment
+metadata:
+  name: acc{account}-core-network-attachment
+spec:
+  account_id: "acc{account}"
+  region: "us-east-1"
+"""
+
+
+def write_config_tree(input_dir, files, accounts=100):
+    """Write `files` config files, one in ten being a CoreNetworkAttachment."""
+    for i in range(files):
+        account = i % accounts
+        account_dir = os.path.join(input_dir, f"acc{account}")
+        os.makedirs(account_dir, exist_ok=True)
+        template = ATTACHMENT_DOCUMENT if i % 10 == 0 else VPC_DOCUMENT
+        with open(os.path.join(account_dir, f"resource{i}.yaml"), "w") as file:
+            file.write(template.format(i=i, account=account, octet2=i // 256 % 256, octet3=i % 256))
+
+
+def load_legacy(input_dir):
+    count = 0
+    for root, _, files in os.walk(input_dir):
+        for file in files:
+            if file.endswith(".yaml") or file.endswith(".yml"):
+                with open(os.path.join(root, file), 'r') as yaml_file:
+                    yaml.safe_load(yaml_file)
+                count += 1
+    return count
+
+
+def load_with(input_dir, kinds=None, jobs=1):
+    return sum(len(documents) for _, documents in load_documents(input_dir, kinds, jobs))
+
+
+def timed(label, files, func, *args):
+    start = time.perf_counter()
+    documents = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<38} {elapsed:8.2f}s {files / elapsed:10.0f} files/s {documents:>8} documents")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark config loading.")
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"libyaml loader: {SafeLoader.__name__}")
+    with tempfile.TemporaryDirectory() as input_dir:
+        write_config_tree(input_dir, args.files)
+        timed("os.walk + yaml.safe_load", args.files, load_legacy, input_dir)
+        timed("config_loader, serial", args.files, load_with, input_dir)
+        timed(f"config_loader, {args.jobs} processes", args.files, load_with, input_dir, None, args.jobs)
+        timed(
+            f"config_loader, {args.jobs} processes, kind filter",
+            args.files, load_with, input_dir, {"CoreNetworkAttachment"}, args.jobs,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Memory of the in-memory resource and inventory models, compared with the previous ones.
+
+Builds N VPC resources from freshly parsed documents, as the config loader does, once as
+the previous model (a plain object with a per-instance __dict__ holding the parsed dicts)
+and once as VPCResource (__slots__, interned keys and shared values). It also loads an
+inventory snapshot of N VPCs, once as the VPC dicts used before and once as VpcRecords.
+For each it reports the bytes allocated per item, measured with tracemalloc, and the time
+of a typical field access. Run from the `aws` folder:
+
+    python3 benchmarks/bench_memory.py --vpcs 100000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+from bench_pipeline import REGIONS, synthetic_vpcs, tgw_id
+
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources")
+sys.path.insert(0, RESOURCE_DIR)
+
+from trafficplatform_aws_v1_vpc import VPCResource  # noqa: E402
+from vpc_record import vpc_records  # noqa: E402
+
+
+class LegacyResource:
+    """The resource model before __slots__: every attribute in a per-instance __dict__."""
+
+    def __init__(self, api_version, kind, metadata, spec, source_path=None):
+        self.apiVersion = api_version
+        self.kind = kind
+        self.metadata = metadata
+        self.spec = spec
+        self.source_path = source_path
+
+
+def resource_documents(vpcs):
+    """Return every VPC as a JSON document, parsed once per resource so no strings are shared."""
+    return [
+        json.dumps({
+            "apiVersion": "trafficplatform.aws/v1",
+            "kind": "VPC",
+            "metadata": {"name": vpc["name"]},
+            "spec": {
+                "account_id": vpc["account"],
+                "vpc_name": vpc["name"],
+                "cidr_block": vpc["cidr"],
+                "region": vpc["region"],
+                "environment": vpc["environment"],
+            },
+        })
+        for vpc in vpcs
+    ]
+
+
+def inventory_snapshots(vpcs):
+    """Return one JSON inventory snapshot per (account, region), as written by the inventory cache."""
+    partitions = {}
+    for vpc in vpcs:
+        vpc_id = f"vpc-{vpc['index']:017x}"
+        partitions.setdefault((vpc["account"], vpc["region"]), []).append({
+            "vpc_id": vpc_id,
+            "vpc_name": vpc["name"],
+            "cidr_block": vpc["cidr"],
+            "environment": vpc["environment"],
+            "subnet_ids": [f"subnet-{vpc['index']:016x}{n}" for n in range(2)],
+            "route_table_ids": [f"rtb-{vpc['index']:017x}"],
+            "tgw_routes": {f"rtb-{vpc['index']:017x}": ["10.0.0.0/8"]},
+        })
+    return [
+        json.dumps({"account_id": account, "region": region, "transit_gateway_id": tgw_id(region), "vpcs": items})
+        for (account, region), items in partitions.items()
+    ]
+
+
+def measure(build):
+    """Return (bytes still allocated by the result of build(), result)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def build_resources(resource_class, documents):
+    resources = []
+    for document in documents:
+        data = json.loads(document)
+        resources.append(resource_class(data["apiVersion"], data["kind"], data["metadata"], data["spec"], "config/vpc.yaml"))
+    return resources
+
+
+def build_vpcs(decode, snapshots):
+    vpcs = []
+    for snapshot in snapshots:
+        vpcs.extend(decode(json.loads(snapshot)["vpcs"]))
+    return vpcs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the memory of the resource and inventory models.")
+    parser.add_argument("--vpcs", type=int, default=100000)
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--regions", type=int, default=4, choices=range(1, len(REGIONS) + 1), metavar="N")
+    args = parser.parse_args()
+
+    vpcs = synthetic_vpcs(args.vpcs, args.accounts, args.regions)
+    documents = resource_documents(vpcs)
+    snapshots = inventory_snapshots(vpcs)
+    del vpcs
+
+    cases = [
+        ("resource", "dict", lambda: build_resources(LegacyResource, documents), lambda item: item.spec["account_id"]),
+        ("resource", "slots", lambda: build_resources(VPCResource, documents), lambda item: item.spec["account_id"]),
+        ("vpc", "dict", lambda: build_vpcs(list, snapshots), lambda item: item["vpc_id"]),
+        ("vpc", "record", lambda: build_vpcs(vpc_records, snapshots), lambda item: item["vpc_id"]),
+    ]
+
+    print(f"{args.vpcs} VPCs")
+    print(f"{'model':<10} {'variant':<8} {'total':>10} {'per item':>10} {'access':>9}")
+    results = {}
+    for model, variant, build, access in cases:
+        size, items = measure(build)
+        item = items[len(items) // 2]
+        access_ns = min(timeit.repeat(lambda: access(item), number=100000, repeat=5)) / 100000 * 1e9
+        results.setdefault(model, {})[variant] = size
+        print(f"{model:<10} {variant:<8} {size / 2**20:>7.1f}MiB {size / len(items):>9.0f}B {access_ns:>7.0f}ns")
+        del items
+
+    for model, variants in results.items():
+        before, after = list(variants.values())
+        print(f"{model}: {1 - after / before:.0%} less memory")
+
+
+if __name__ == "__main__":
+    main()
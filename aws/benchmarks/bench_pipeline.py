@@ -0,0 +1,425 @@
+"""
+End-to-end benchmark of config generation on a synthetic config tree and a fake EC2.
+
+Writes a config/ tree with VPCs spread over accounts and regions, one TransitGateway
+document and one CoreNetworkAttachment per (account, region), and serves the matching
+inventory from an in-memory EC2 client with NextToken paging. Each repeat runs in a
+fresh interpreter and output directory and times the stages separately:
+
+- load:       parse config/ into resources
+- validate:   schema validation of every resource
+- cidr:       duplicate name and CIDR overlap checks of the VPCs
+- discovery:  VPC (and, for the model strategy, TGW routing) discovery through the client pool
+- pairing:    reachability pair planning per (account, region)
+- render:     rendering every VPC, attachment and reachability analyzer unit
+- write:      writing the units and the manifest
+
+The fastest time of each stage over the repeats is written as JSON, and --compare
+flags the stages that got slower between two such files. Run from the `aws` folder:
+
+    python3 benchmarks/bench_pipeline.py --vpcs 10000 --accounts 50 --regions 4 --output after.json
+    python3 benchmarks/bench_pipeline.py --compare before.json after.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources")
+sys.path.insert(0, RESOURCE_DIR)
+
+STAGES = ("load", "validate", "cidr", "discovery", "pairing", "render", "write")
+REGIONS = (
+    "us-east-1", "us-west-2", "eu-west-1", "eu-central-1", "ap-southeast-1",
+    "ap-northeast-1", "sa-east-1", "ca-central-1",
+)
+
+VPC_DOCUMENT = """apiVersion: trafficplatform.aws/v1
+kind: VPC
+metadata:
+  name: {name}
+spec:
+  account_id: "{account}"
+  vpc_name: {name}
+  cidr_block: {cidr}
+  region: {region}
+  environment: {environment}
+"""
+
+ATTACHMENT_DOCUMENT = """apiVersion: trafficplatform.aws/v1
+kind: CoreNetworkAttachment
+metadata:
+  name: {account}-{region}-core-network-attachment
+spec:
+  account_id: "{account}"
+  region: "{region}"
+"""
+
+
+def synthetic_vpcs(vpcs, accounts, regions):
+    """Return one dict per VPC, spread round-robin over accounts and regions with unique /26 CIDRs."""
+    result = []
+    for i in range(vpcs):
+        result.append({
+            "index": i,
+            "name": f"vpc{i}",
+            "account": f"acc{i % accounts}",
+            "region": REGIONS[i // accounts % regions],
+            "environment": "prod" if i % 3 else "dev",
+            "cidr": f"10.{i >> 10 & 255}.{i >> 2 & 255}.{(i & 3) * 64}/26",
+        })
+    return result
+
+
+def tgw_id(region):
+    return f"tgw-{REGIONS.index(region):017x}"
+
+
+def write_config_tree(config_dir, vpcs):
+    """Write one file per VPC, a CoreNetworkAttachment per (account, region) and the TransitGateways."""
+    partitions = sorted({(vpc["account"], vpc["region"]) for vpc in vpcs})
+    for vpc in vpcs:
+        account_dir = os.path.join(config_dir, vpc["account"])
+        os.makedirs(account_dir, exist_ok=True)
+        with open(os.path.join(account_dir, f"{vpc['name']}.yaml"), "w") as file:
+            file.write(VPC_DOCUMENT.format(**vpc))
+    for account, region in partitions:
+        with open(os.path.join(config_dir, account, f"core-net-att-{region}.yaml"), "w") as file:
+            file.write(ATTACHMENT_DOCUMENT.format(account=account, region=region))
+
+    regions = sorted({region for _, region in partitions})
+    with open(os.path.join(config_dir, "tgw.yaml"), "w") as file:
+        file.write("apiVersion: trafficplatform.aws/v1\nkind: TransitGateway\nmetadata:\n  name: tgw\nspec:\n")
+        file.write("  transit_gateways:\n")
+        for region in regions:
+            file.write(f"  - region: {region}\n    id: {tgw_id(region)}\n")
+
+
+def vpc_tags(vpc):
+    return [
+        {"Key": "Name", "Value": vpc["name"]},
+        {"Key": "Environment", "Value": vpc["environment"]},
+        {"Key": "TransitGatewayAttachment", "Value": "true"},
+    ]
+
+
+class FakeEC2:
+    """
+    In-memory EC2 client of one account and region, answering the describe calls made by
+    vpc_utils with 1000-item pages. Every VPC is attached to the region's TGW, has two
+    tagged subnets and a route table sending 10.0.0.0/8 to the TGW, and is reachable
+    through a single TGW route table.
+    """
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, vpcs):
+        self.transit_gateway_id = tgw_id(vpcs[0]["region"]) if vpcs else None
+        self.vpcs = [{"VpcId": f"vpc-{vpc['index']:017x}", "CidrBlock": vpc["cidr"], "Tags": vpc_tags(vpc)} for vpc in vpcs]
+        self.subnets = [
+            {"SubnetId": f"subnet-{vpc['index']:016x}{n}", "VpcId": f"vpc-{vpc['index']:017x}", "Tags": vpc_tags(vpc)}
+            for vpc in vpcs for n in range(2)
+        ]
+        self.route_tables = [
+            {
+                "RouteTableId": f"rtb-{vpc['index']:017x}",
+                "VpcId": f"vpc-{vpc['index']:017x}",
+                "Tags": vpc_tags(vpc),
+                "Routes": [{"DestinationCidrBlock": "10.0.0.0/8", "TransitGatewayId": self.transit_gateway_id, "State": "active"}],
+            }
+            for vpc in vpcs
+        ]
+        self.attachments = [
+            {"TransitGatewayAttachmentId": f"tgw-attach-{vpc['index']:017x}", "ResourceId": f"vpc-{vpc['index']:017x}"}
+            for vpc in vpcs
+        ]
+        self.tgw_routes = [
+            {
+                "DestinationCidrBlock": vpc["cidr"],
+                "State": "active",
+                "TransitGatewayAttachments": [{"TransitGatewayAttachmentId": f"tgw-attach-{vpc['index']:017x}"}],
+            }
+            for vpc in vpcs
+        ]
+
+    def _page(self, items, result_key, Filters=(), NextToken=None, **_):
+        for item_filter in Filters:
+            name, values = item_filter["Name"], set(item_filter["Values"])
+            if name == "vpc-id":
+                items = [item for item in items if item["VpcId"] in values]
+            elif name.startswith("tag:"):
+                key = name[len("tag:"):]
+                items = [item for item in items if any(
+                    tag["Key"] == key and tag["Value"] in values for tag in item.get("Tags", [])
+                )]
+        start = int(NextToken or 0)
+        page = {result_key: items[start:start + self.PAGE_SIZE]}
+        if start + self.PAGE_SIZE < len(items):
+            page["NextToken"] = str(start + self.PAGE_SIZE)
+        return page
+
+    def describe_vpcs(self, **kwargs):
+        return self._page(self.vpcs, "Vpcs", **kwargs)
+
+    def describe_subnets(self, **kwargs):
+        return self._page(self.subnets, "Subnets", **kwargs)
+
+    def describe_route_tables(self, **kwargs):
+        return self._page(self.route_tables, "RouteTables", **kwargs)
+
+    def describe_transit_gateway_attachments(self, **kwargs):
+        return self._page(self.attachments, "TransitGatewayAttachments", **kwargs)
+
+    def describe_transit_gateway_route_tables(self, **kwargs):
+        route_tables = [{"TransitGatewayRouteTableId": "tgw-rtb-00000000000000000"}]
+        return self._page(route_tables, "TransitGatewayRouteTables", **kwargs)
+
+    def get_transit_gateway_route_table_associations(self, TransitGatewayRouteTableId, **kwargs):
+        associations = [
+            {"TransitGatewayAttachmentId": attachment["TransitGatewayAttachmentId"], "State": "associated"}
+            for attachment in self.attachments
+        ]
+        return self._page(associations, "Associations", **kwargs)
+
+    def get_transit_gateway_route_table_propagations(self, TransitGatewayRouteTableId, **kwargs):
+        propagations = [
+            {"TransitGatewayAttachmentId": attachment["TransitGatewayAttachmentId"], "State": "enabled"}
+            for attachment in self.attachments
+        ]
+        return self._page(propagations, "TransitGatewayRouteTablePropagations", **kwargs)
+
+    def search_transit_gateway_routes(self, TransitGatewayRouteTableId, Filters=(), MaxResults=1000):
+        return {"Routes": self.tgw_routes[:MaxResults], "AdditionalRoutesAvailable": len(self.tgw_routes) > MaxResults}
+
+
+def run_once(work_dir, params):
+    """Run every stage once in `work_dir` and return (seconds per stage, counts)."""
+    os.chdir(work_dir)
+    from aws_clients import client_pool
+    from inventory_cache import inventory_cache
+    from main import build_processors, process_directory
+    from pair_planner import PairPlanner, PairState
+    from route_graph import RouteModel
+    from template_registry import template_registry
+    from tgw_registry import tgw_registry
+    from unit_manifest import unit_manifest
+
+    client_pool.configure(rate=1e9, concurrency=1024)
+    inventory_cache.configure(refresh=True)
+    fakes = {}
+    for vpc in synthetic_vpcs(params["vpcs"], params["accounts"], params["regions"]):
+        fakes.setdefault((vpc["account"], vpc["region"]), []).append(vpc)
+
+    timings = {}
+    counts = {"units": 0, "pairs": 0}
+
+    @contextlib.contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+        timings[name] = time.perf_counter() - start
+
+    with stage("load"):
+        resources_by_kind = process_directory(os.path.join(work_dir, "config"), None, params["load_jobs"])
+    processors = build_processors(resources_by_kind)
+
+    with stage("validate"):
+        failed = sum(processor(resources_by_kind[kind]).validate_batch().failed for kind, processor in processors.items())
+    with stage("cidr"):
+        cidr_ok = processors["VPC"](resources_by_kind["VPC"]).validate()
+    if failed or not cidr_ok:
+        raise SystemExit(f"Synthetic config failed validation: {failed} schema errors, CIDR checks ok: {cidr_ok}")
+
+    attachments = resources_by_kind["CoreNetworkAttachment"]
+    attachment_processor = processors["CoreNetworkAttachment"](attachments)
+    discovered = []
+    with stage("discovery"):
+        for resource in resources_by_kind["TransitGateway"]:
+            tgw_registry.register(resource)
+        for resource in attachments:
+            account_id, region = resource.spec["account_id"], resource.spec["region"]
+            transit_gateway_id = tgw_registry.find(region, account_id)
+            # Clients are shared per region, so each account's fake is swapped in for its discovery
+            client_pool.register_client("ec2", region, FakeEC2(fakes[(account_id, region)]))
+            vpcs = [
+                dict(vpc, region=region, transit_gateway_id=transit_gateway_id)
+                for vpc in inventory_cache.get_vpcs(account_id, region)
+            ]
+            routing = None
+            if params["pair_strategy"] == "model":
+                routing = {transit_gateway_id: inventory_cache.get_tgw_routing(account_id, region, transit_gateway_id)}
+            discovered.append((resource, transit_gateway_id, vpcs, routing))
+    counts["api_calls"] = client_pool.stats()["calls"]
+
+    planned = []
+    with stage("pairing"):
+        for resource, _, vpcs, routing in discovered:
+            account_id, region = resource.spec["account_id"], resource.spec["region"]
+            planner = PairPlanner(params["pair_strategy"])
+            analyzer_dir = f"live/{account_id}/ReachabilityAnalyzer"
+            model = RouteModel(vpcs, routing) if routing is not None else None
+            pairs = planner.plan(vpcs, PairState(analyzer_dir, region), model)
+            planned.append((resource, analyzer_dir, pairs))
+            counts["pairs"] += len(pairs)
+
+    units = []
+    with stage("render"):
+        for resource in resources_by_kind["VPC"]:
+            path = str(processors["VPC"]([]).unit_path(resource))
+            units.append((path, resource.transform(), resource.spec, resource.TEMPLATE_FILE, resource.source_path))
+        for resource, transit_gateway_id, vpcs, _ in discovered:
+            for vpc in vpcs:
+                context = attachment_processor.attachment_context(vpc, transit_gateway_id, resource)
+                content = attachment_processor.transform_resource(resource, vpc, transit_gateway_id)
+                path = str(attachment_processor.unit_path(resource, vpc))
+                units.append((path, content, context, resource.TEMPLATE_FILE, resource.source_path))
+        template_file = attachment_processor.REACHABILITY_TEMPLATE_FILE
+        for resource, analyzer_dir, pairs in planned:
+            for name, (source_vpc, target_vpc) in pairs.items():
+                context = attachment_processor.pair_context(source_vpc, target_vpc, resource.spec["account_id"])
+                content = template_registry.render(template_file, **context)
+                units.append((f"{analyzer_dir}/{name}/terragrunt.hcl", content, context, template_file, resource.source_path))
+    counts["units"] = len(units)
+
+    with stage("write"):
+        for unit in units:
+            unit_manifest.write_unit(*unit)
+        unit_manifest.save()
+
+    counts.update({kind: len(resources) for kind, resources in resources_by_kind.items()})
+    return timings, counts
+
+
+def run_repeats(params, repeats):
+    """Generate the config tree once and run each repeat in a fresh interpreter and output directory."""
+    work_dir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    try:
+        write_config_tree(
+            os.path.join(work_dir, "config"), synthetic_vpcs(params["vpcs"], params["accounts"], params["regions"])
+        )
+        # Template and schema paths are relative to the `aws` folder
+        os.symlink(os.path.abspath(RESOURCE_DIR), os.path.join(work_dir, "resources"))
+
+        runs = []
+        for _ in range(repeats):
+            for output in ("live", ".inventory"):
+                shutil.rmtree(os.path.join(work_dir, output), ignore_errors=True)
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run-once", work_dir, "--params", json.dumps(params)],
+                capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                raise SystemExit(f"Benchmark run failed:\n{result.stdout}{result.stderr}")
+            runs.append(json.loads(result.stdout))
+        return runs
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def summarize(params, runs):
+    """Return the JSON result: the fastest time of every stage and the total over the repeats."""
+    stages = {}
+    for stage_name in STAGES:
+        times = [run["timings"][stage_name] for run in runs]
+        stages[stage_name] = {"seconds": min(times), "runs": times}
+    totals = [sum(run["timings"].values()) for run in runs]
+    stages["total"] = {"seconds": min(totals), "runs": totals}
+    return {
+        "benchmark": "pipeline",
+        "params": params,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "created_at": time.time(),
+        "stages": stages,
+        "counts": runs[0]["counts"],
+    }
+
+
+def compare(base, current, threshold, min_delta):
+    """
+    Print the change of every stage between two results and return the stages that got
+    slower by more than `threshold` (relative) and `min_delta` seconds.
+    """
+    if base.get("params") != current.get("params"):
+        print(f"Warning: parameters differ: {base.get('params')} vs {current.get('params')}")
+
+    regressions = []
+    print(f"{'stage':<10} {'base':>10} {'current':>10} {'change':>8}")
+    for stage_name, stage in current["stages"].items():
+        base_stage = base["stages"].get(stage_name)
+        if base_stage is None:
+            print(f"{stage_name:<10} {'-':>10} {stage['seconds']:>9.3f}s")
+            continue
+        before, after = base_stage["seconds"], stage["seconds"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if after - before > min_delta and change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(stage_name)
+        elif before - after > min_delta and -change > threshold:
+            flag = "  improved"
+        print(f"{stage_name:<10} {before:>9.3f}s {after:>9.3f}s {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the config pipeline end to end.")
+    parser.add_argument("--vpcs", type=int, default=1000)
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--regions", type=int, default=2, choices=range(1, len(REGIONS) + 1), metavar="N")
+    parser.add_argument("--pair-strategy", default="sampled", help="Reachability pair strategy (default: sampled).")
+    parser.add_argument("--load-jobs", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs to take the fastest time of each stage from.")
+    parser.add_argument("--output", type=str, help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "CURRENT"), help="Compare two result files instead of running.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown flagged as a regression (default: 0.10).")
+    parser.add_argument("--min-delta", type=float, default=0.01, help="Ignore changes below this many seconds (default: 0.01).")
+    parser.add_argument("--run-once", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--params", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_once:
+        timings, counts = run_once(args.run_once, json.loads(args.params))
+        print(json.dumps({"timings": timings, "counts": counts}))
+        return 0
+
+    if args.compare:
+        with open(args.compare[0]) as base_file, open(args.compare[1]) as current_file:
+            regressions = compare(json.load(base_file), json.load(current_file), args.threshold, args.min_delta)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+        return 1 if regressions else 0
+
+    params = {
+        "vpcs": args.vpcs,
+        "accounts": args.accounts,
+        "regions": args.regions,
+        "pair_strategy": args.pair_strategy,
+        "load_jobs": args.load_jobs,
+    }
+    result = summarize(params, run_repeats(params, args.repeat))
+
+    counts = result["counts"]
+    print(f"{counts['VPC']} VPCs, {counts['CoreNetworkAttachment']} attachments, {counts['units']} units, "
+          f"{counts['pairs']} pairs, {counts['api_calls']} EC2 calls")
+    for stage_name, stage in result["stages"].items():
+        print(f"{stage_name:<10} {stage['seconds']:>9.3f}s")
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(result, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Benchmark the plan guard on large synthetic Terraform plans.
+
+Writes a directory of plan JSON files with large `planned_values` and `prior_state`
+sections and a few planted deletes, then compares:
+
+- load:      json.load of each whole plan and a scan of resource_changes, serially
+             (what conftest does per file, without its process spawn)
+- stream:    plan_guard serially
+- parallel:  plan_guard with a process pool
+- conftest:  one `conftest test` per file, only if conftest is installed
+
+and the peak Python heap of decoding one large plan either way. Run from the `aws` folder:
+
+    python3 benchmarks/bench_plan_guard.py --plans 200 --resources 2000
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources"))
+
+from plan_guard import check_plan, check_plans
+
+POLICY_DIR = "policy"
+
+
+def resource_values(i):
+    return {
+        "id": f"subnet-{i:017x}",
+        "cidr_block": f"10.{i // 256 % 256}.{i % 256}.0/24",
+        "tags": {"Name": f"subnet-{i}", "Environment": "prod", "Description": "x" * 200},
+    }
+
+
+def write_plan(path, resources, deletes):
+    changes = []
+    for i in range(resources):
+        actions = ["delete"] if i < deletes else ["no-op"]
+        changes.append({
+            "address": f"aws_subnet.s{i}",
+            "type": "aws_subnet",
+            "change": {"actions": actions, "before": resource_values(i), "after": None if i < deletes else resource_values(i)},
+        })
+    plan = {
+        "format_version": "1.2",
+        "planned_values": {"root_module": {"resources": [{"address": f"aws_subnet.s{i}", "values": resource_values(i)}
+                                                         for i in range(resources)]}},
+        "resource_changes": changes,
+        "prior_state": {"values": {"root_module": {"resources": [{"values": resource_values(i)} for i in range(resources)]}}},
+    }
+    with open(path, "w") as plan_file:
+        json.dump(plan, plan_file)
+
+
+def check_loaded(file_path):
+    with open(file_path) as plan_file:
+        plan = json.load(plan_file)
+    return sum(1 for change in plan.get("resource_changes", []) if "delete" in change["change"]["actions"])
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the plan guard.")
+    parser.add_argument("--plans", type=int, default=200)
+    parser.add_argument("--resources", type=int, default=2000, help="Resource changes per plan.")
+    parser.add_argument("--deletes", type=int, default=1, help="Planted deletes per plan.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp(prefix="plans-")
+    try:
+        files = []
+        for n in range(args.plans):
+            path = os.path.join(output_dir, f"tfplan-{n}.json")
+            write_plan(path, args.resources, args.deletes)
+            files.append(path)
+        size = sum(os.path.getsize(path) for path in files)
+        print(f"{args.plans} plans, {args.resources} resource changes each, {size / 1e6:.1f} MB")
+
+        loaded, load_time = timed(lambda: sum(check_loaded(path) for path in files))
+        streamed, stream_time = timed(lambda: check_plans([output_dir], jobs=1))
+        parallel, parallel_time = timed(lambda: check_plans([output_dir], jobs=args.jobs))
+        assert loaded == sum(len(result["violations"]) for result in streamed) == \
+            sum(len(result["violations"]) for result in parallel)
+
+        print(f"{'load':>10} {load_time:>8.3f}s")
+        print(f"{'stream':>10} {stream_time:>8.3f}s")
+        print(f"{'parallel':>10} {parallel_time:>8.3f}s  ({args.jobs} jobs)")
+
+        if shutil.which("conftest") and os.path.isdir(POLICY_DIR):
+            _, conftest_time = timed(lambda: [
+                subprocess.run(["conftest", "test", path, "--policy", POLICY_DIR], capture_output=True) for path in files
+            ])
+            print(f"{'conftest':>10} {conftest_time:>8.3f}s")
+
+        print(f"Peak heap for one plan: load {peak_memory(lambda: check_loaded(files[0])) / 1e6:.1f} MB, "
+              f"stream {peak_memory(lambda: check_plan(files[0])) / 1e6:.1f} MB")
+    finally:
+        shutil.rmtree(output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark the offline route model on synthetic Transit Gateway topologies.
+
+Each topology attaches N VPCs with one /16 each to a single TGW, splits them over
+a few TGW route tables, and breaks a fraction of the paths (missing propagation,
+blackhole or partial VPC routes). The stubbed inventory never calls AWS. Run from
+the `aws` folder:
+
+    python3 benchmarks/bench_route_graph.py --sizes 100 500 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources"))
+
+from route_graph import RouteModel
+
+TGW_ID = "tgw-0123456789abcdef0"
+
+
+def build_topology(size, route_tables, broken, seed=0):
+    """Return (vpcs, routing) with roughly `broken` of the VPCs misconfigured."""
+    rng = random.Random(seed)
+    vpcs = []
+    attachments = {}
+    for i in range(size):
+        vpc_id = f"vpc-{i:017x}"
+        tgw_routes = {f"rtb-{i:017x}": ["10.0.0.0/8"]}
+        if rng.random() < broken / 3:
+            tgw_routes[f"rtb-{i:016x}b"] = [f"10.{i % 256}.0.0/16"]  # Partial VPC routes
+        vpcs.append({
+            "vpc_id": vpc_id,
+            "vpc_name": f"vpc{i}",
+            "cidr_block": f"10.{i // 256}.{i % 256}.0/24",
+            "transit_gateway_id": TGW_ID,
+            "tgw_routes": tgw_routes,
+        })
+        attachments[f"tgw-attach-{i:017x}"] = vpc_id
+
+    tables = [
+        {"route_table_id": f"tgw-rtb-{n:017x}", "associations": [], "propagations": [], "routes": []}
+        for n in range(route_tables)
+    ]
+    for i, attachment in enumerate(attachments):
+        tables[i % route_tables]["associations"].append(attachment)
+        for table in tables:
+            roll = rng.random()
+            if roll < broken / 3:
+                continue  # Not propagated
+            state = "blackhole" if roll < broken * 2 / 3 else "active"
+            if state == "active":
+                table["propagations"].append(attachment)
+            table["routes"].append({
+                "cidr": vpcs[i]["cidr_block"],
+                "state": state,
+                "attachment_ids": [attachment] if state == "active" else [],
+            })
+
+    routing = {TGW_ID: {"transit_gateway_id": TGW_ID, "attachments": attachments, "route_tables": tables}}
+    return vpcs, routing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline route model.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--route-tables", type=int, default=4)
+    parser.add_argument("--broken", type=float, default=0.05, help="Fraction of misconfigured VPCs.")
+    args = parser.parse_args()
+
+    print(f"{'vpcs':>6} {'pairs':>9} {'build':>9} {'verdicts':>9} {'reachable':>10} {'analyzed':>9}")
+    for size in args.sizes:
+        vpcs, routing = build_topology(size, args.route_tables, args.broken)
+
+        start = time.perf_counter()
+        model = RouteModel(vpcs, routing)
+        built = time.perf_counter()
+        unreachable = sum(1 for _ in model.unreachable())
+        checked = time.perf_counter()
+
+        pairs = model.pair_count()
+        print(
+            f"{size:>6} {pairs:>9} {built - start:>8.3f}s {checked - built:>8.3f}s "
+            f"{pairs - unreachable:>10} {unreachable:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Peak memory of generating the VPC units of a large config, loaded as a whole or streamed.
+
+Writes a synthetic config/ tree (100k VPCs by default, see bench_pipeline.py) and runs
+`main.py --resource VPC` on it without and with --stream, and with the units written to
+one --output-archive instead of below live/, each in a fresh interpreter and output
+directory. For each mode it reports the peak RSS of the process,
+the time until the first unit was written and the total time. Run from the `aws` folder:
+
+    python3 benchmarks/bench_streaming.py --vpcs 100000
+    python3 benchmarks/bench_streaming.py --vpcs 100000 --max-stream-rss-mb 150
+
+With --max-stream-rss-mb the script exits 1 when the streamed run exceeds the limit,
+so it can guard the memory bound in CI. Config files are parsed in the main process
+(--load-jobs 1) so the peak RSS is that of one process.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_pipeline import REGIONS, RESOURCE_DIR, synthetic_vpcs, write_config_tree
+
+MODES = {"batch": [], "stream": ["--stream"], "archive": ["--output-archive", "units.tar"]}
+
+
+def run_mode(work_dir, extra_args, load_jobs):
+    """Run main.py once in `work_dir` and return its peak RSS, time to first unit and total time."""
+    shutil.rmtree(os.path.join(work_dir, "live"), ignore_errors=True)
+    if os.path.exists(os.path.join(work_dir, "units.tar")):
+        os.remove(os.path.join(work_dir, "units.tar"))
+    command = [
+        sys.executable, os.path.join(RESOURCE_DIR, "main.py"),
+        "--resource", "VPC", "--load-jobs", str(load_jobs),
+    ] + extra_args
+
+    start = time.perf_counter()
+    first_unit = None
+    units = 0
+    process = subprocess.Popen(command, cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    tail = []
+    for line in process.stdout:
+        if line.startswith("Generated"):
+            units += 1
+            if first_unit is None:
+                first_unit = time.perf_counter() - start
+        tail = (tail + [line])[-5:]
+    # wait4 instead of wait() for the child's resource usage; ru_maxrss is in KiB on Linux
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    total = time.perf_counter() - start
+    if process.returncode != 0:
+        raise SystemExit(f"main.py {' '.join(extra_args)} failed:\n{''.join(tail)}")
+
+    return {
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+        "first_unit_seconds": first_unit,
+        "total_seconds": total,
+        "units": units,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the peak memory of batch and streamed generation.")
+    parser.add_argument("--vpcs", type=int, default=100000)
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--regions", type=int, default=4, choices=range(1, len(REGIONS) + 1), metavar="N")
+    parser.add_argument("--load-jobs", type=int, default=1, help="Config parser processes passed to main.py (default: 1).")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--max-stream-rss-mb", type=float, help="Fail if the streamed run's peak RSS exceeds this many MiB.")
+    parser.add_argument("--output", type=str, help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench-streaming-")
+    try:
+        write_config_tree(os.path.join(work_dir, "config"), synthetic_vpcs(args.vpcs, args.accounts, args.regions))
+        # Template and schema paths are relative to the `aws` folder
+        os.symlink(os.path.abspath(RESOURCE_DIR), os.path.join(work_dir, "resources"))
+        results = {mode: run_mode(work_dir, MODES[mode], args.load_jobs) for mode in args.modes}
+    finally:
+        shutil.rmtree(work_dir)
+
+    print(f"{args.vpcs} VPCs")
+    print(f"{'mode':<8} {'peak RSS':>10} {'first unit':>11} {'total':>9} {'units':>7}")
+    for mode, result in results.items():
+        first_unit = result["first_unit_seconds"]
+        first_unit = f"{first_unit:>10.2f}s" if first_unit is not None else f"{'-':>11}"
+        print(f"{mode:<8} {result['peak_rss_mb']:>7.1f}MiB {first_unit} {result['total_seconds']:>8.2f}s {result['units']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"benchmark": "streaming", "vpcs": args.vpcs, "modes": results}, output_file, indent=2)
+
+    stream = results.get("stream")
+    if args.max_stream_rss_mb and stream and stream["peak_rss_mb"] > args.max_stream_rss_mb:
+        print(f"Streamed peak RSS {stream['peak_rss_mb']:.1f}MiB exceeds {args.max_stream_rss_mb:.1f}MiB")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
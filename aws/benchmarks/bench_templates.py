@@ -0,0 +1,80 @@
+"""
+Benchmark Jinja2 rendering of VPC and reachability pair units.
+
+Compares the previous approach (read the .j2 file and build a new Template per
+render) against the shared TemplateRegistry. Run from the `aws` folder:
+
+    python3 benchmarks/bench_templates.py --units 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources"))
+
+from jinja2 import Template
+from template_registry import TemplateRegistry
+
+VPC_TEMPLATE = "resources/templates/vpc_terragrunt.hcl.j2"
+PAIR_TEMPLATE = "resources/templates/reachability_analyzer_terragrunt.hcl.j2"
+
+
+def vpc_contexts(count):
+    for i in range(count):
+        yield {
+            "vpc_name": f"vpc{i}",
+            "cidr_block": f"10.{i // 256 % 256}.{i % 256}.0/24",
+            "region": "us-east-1",
+            "environment": "prod",
+        }
+
+
+def pair_contexts(count):
+    for i in range(count):
+        yield {"source_vpc_id": f"vpc-{i:017x}", "target_vpc_id": f"vpc-{i + 1:017x}"}
+
+
+def render_uncached(template_file, contexts):
+    for context in contexts:
+        with open(template_file, 'r') as file:
+            template_content = file.read()
+        Template(template_content).render(**context)
+
+
+def render_registry(registry, template_file, contexts):
+    for context in contexts:
+        registry.render(template_file, **context)
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark template rendering.")
+    parser.add_argument("--units", type=int, default=10000, help="Number of VPC and pair units to render.")
+    args = parser.parse_args()
+
+    for label, template_file, contexts in (
+        ("VPC", VPC_TEMPLATE, vpc_contexts),
+        ("pair", PAIR_TEMPLATE, pair_contexts),
+    ):
+        uncached = timed(f"{label}: Template per render", render_uncached, template_file, contexts(args.units))
+        cached = timed(f"{label}: TemplateRegistry", render_registry, TemplateRegistry(), template_file, contexts(args.units))
+        print(f"{label}: speedup {uncached / cached:.1f}x over {args.units} units")
+
+    # Cold start with and without a warm bytecode cache
+    with tempfile.TemporaryDirectory() as cache_dir:
+        TemplateRegistry(bytecode_cache_dir=cache_dir).get_template(PAIR_TEMPLATE)
+        timed("compile without bytecode cache", lambda: TemplateRegistry().get_template(PAIR_TEMPLATE))
+        timed("load from bytecode cache", lambda: TemplateRegistry(bytecode_cache_dir=cache_dir).get_template(PAIR_TEMPLATE))
+
+
+if __name__ == "__main__":
+    main()
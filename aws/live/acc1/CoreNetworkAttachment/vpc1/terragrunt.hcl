@@ -2,6 +2,10 @@ terraform {
   source = "../../../../terraform-modules/core-network-attachment"
 }
 
+dependencies {
+  paths = ["../../VPC/vpc1", "../../TransitGateway/tgw-01"]
+}
+
 inputs = {
   vpc_id             = "vpc-0ef5790be12fcd7db"
   transit_gateway_id = "tgw-008a46bb27ebdc169"
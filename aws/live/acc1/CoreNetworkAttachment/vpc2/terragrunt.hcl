@@ -2,6 +2,10 @@ terraform {
   source = "../../../../terraform-modules/core-network-attachment"
 }
 
+dependencies {
+  paths = ["../../VPC/vpc2", "../../TransitGateway/tgw-01"]
+}
+
 inputs = {
   vpc_id             = "vpc-084d0d2e74a789756"
   transit_gateway_id = "tgw-008a46bb27ebdc169"
@@ -2,6 +2,9 @@ terraform {
   source = "../../../../terraform-modules/reachability-analyzer"
 }
 
+dependencies {
+  paths = ["../../CoreNetworkAttachment/vpc1", "../../CoreNetworkAttachment/vpc2"]
+}
 
 inputs = {
   source_vpc_id     = "vpc-0ef5790be12fcd7db"
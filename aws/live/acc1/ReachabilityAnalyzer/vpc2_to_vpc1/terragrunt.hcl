@@ -2,6 +2,9 @@ terraform {
   source = "../../../../terraform-modules/reachability-analyzer"
 }
 
+dependencies {
+  paths = ["../../CoreNetworkAttachment/vpc2", "../../CoreNetworkAttachment/vpc1"]
+}
 
 inputs = {
   source_vpc_id     = "vpc-084d0d2e74a789756"
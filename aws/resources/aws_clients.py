@@ -0,0 +1,248 @@
+import random
+import threading
+import time
+from instrumentation import metrics
+
+THROTTLING_ERROR_CODES = {
+    "RequestLimitExceeded",
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+}
+
+# Server-side failures worth another attempt, along with any other 5xx response
+TRANSIENT_ERROR_CODES = {
+    "InternalError",
+    "InternalFailure",
+    "ServiceUnavailable",
+    "Unavailable",
+    "RequestTimeout",
+    "RequestTimeoutException",
+}
+
+DEFAULT_RATE = 20.0  # Requests per second per region
+DEFAULT_CONCURRENCY = 8  # Concurrent requests per region
+MIN_RATE = 1.0
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `capacity` tokens."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, waiting for the bucket to refill if it is empty."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self._sleep(wait)
+
+
+class AdaptiveLimiter:
+    """
+    Per-region limiter combining a token bucket with an adaptive concurrency cap.
+
+    Throttling halves both the request rate and the number of concurrent requests
+    (multiplicative decrease). Each successful call raises them again by a small step
+    (additive increase), up to the configured maximums.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, concurrency=DEFAULT_CONCURRENCY, clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = rate
+        self.max_concurrency = concurrency
+        self.concurrency = float(concurrency)
+        self.bucket = TokenBucket(rate, clock=clock, sleep=sleep)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self._in_flight >= max(1, int(self.concurrency)):
+                self._condition.wait()
+            self._in_flight += 1
+        self.bucket.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / max(1.0, self.concurrency))
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + 0.5)
+            self._condition.notify()
+
+    def on_throttle(self):
+        with self._condition:
+            self.concurrency = max(1.0, self.concurrency / 2)
+            self.bucket.rate = max(MIN_RATE, self.bucket.rate / 2)
+
+
+class ClientPool:
+    """
+    Shared AWS clients and per-region limiters for all discovery calls.
+
+    Clients are created once per (service, region) and reused. Every call goes through
+    the region's AdaptiveLimiter and is retried with jittered exponential backoff when
+    AWS throttles it. botocore's own retries are disabled so that throttling is seen,
+    counted and fed back into the limiter here. Transient failures botocore would have
+    retried (5xx responses, connection errors and timeouts) are retried with the same
+    backoff, without lowering the limits.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, concurrency=DEFAULT_CONCURRENCY, max_attempts=8,
+                 base_delay=0.2, max_delay=20.0, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._sleep = sleep
+        self._clients = {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.throttles = {}
+        self.retries = {}
+
+    def configure(self, rate=None, concurrency=None, max_attempts=None):
+        """Change limits. Limiters are rebuilt on next use, clients are kept."""
+        with self._lock:
+            if rate is not None:
+                self.rate = rate
+            if concurrency is not None:
+                self.concurrency = concurrency
+            if max_attempts is not None:
+                self.max_attempts = max_attempts
+            self._limiters.clear()
+
+    def client(self, service, region):
+        """Return the shared client for a service and region, creating it on first use."""
+        key = (service, region)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                # boto3 takes longer to import than the rest of the CLI, so only runs that call AWS pay for it
+                import boto3
+                from botocore.config import Config
+
+                config = Config(retries={"mode": "standard", "max_attempts": 1})
+                client = boto3.client(service, region_name=region, config=config)
+                self._clients[key] = client
+        return client
+
+    def register_client(self, service, region, client):
+        """Use a given client for a service and region, e.g. one wrapped in a botocore Stubber."""
+        with self._lock:
+            self._clients[(service, region)] = client
+
+    def limiter(self, region):
+        with self._lock:
+            limiter = self._limiters.get(region)
+            if limiter is None:
+                limiter = AdaptiveLimiter(self.rate, self.concurrency, clock=self._clock, sleep=self._sleep)
+                self._limiters[region] = limiter
+        return limiter
+
+    def call(self, service, region, operation, client=None, **kwargs):
+        """
+        Call an API operation through the region's limiter, retrying throttled calls and
+        transient failures.
+
+        Raises:
+            ClientError: For other errors, or when throttling or a transient error outlasts max_attempts.
+            BotoCoreError: For connection errors and timeouts that outlast max_attempts.
+        """
+        from botocore.exceptions import (
+            ClientError, ConnectionClosedError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError,
+        )
+
+        client = client or self.client(service, region)
+        limiter = self.limiter(region)
+        method = getattr(client, operation)
+
+        for attempt in range(1, self.max_attempts + 1):
+            self._count(self.calls, region)
+            metrics.count("aws_api_calls", service=service, operation=operation, region=region)
+            try:
+                with limiter, metrics.stage("aws_call", operation=operation):
+                    response = method(**kwargs)
+            except (ClientError, ConnectionClosedError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError) as e:
+                if isinstance(e, ClientError) and e.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+                    self._count(self.throttles, region)
+                    metrics.count("aws_api_throttles", service=service, operation=operation, region=region)
+                    limiter.on_throttle()
+                elif not isinstance(e, ClientError) or self.is_transient(e):
+                    metrics.count("aws_api_transient_errors", service=service, operation=operation, region=region)
+                else:
+                    metrics.count("aws_api_errors", service=service, operation=operation, region=region)
+                    raise
+                if attempt == self.max_attempts:
+                    raise
+                self._count(self.retries, region)
+                # Full jitter exponential backoff
+                self._sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                continue
+
+            limiter.on_success()
+            return response
+
+    @staticmethod
+    def is_transient(error):
+        """Return True for a ClientError of a server-side failure that may pass on its own."""
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+        return error.response.get("Error", {}).get("Code") in TRANSIENT_ERROR_CODES or status >= 500
+
+    def paginate(self, service, region, operation, result_key, client=None, **kwargs):
+        """Yield every item of a NextToken-paginated operation, each page going through call()."""
+        next_token = None
+        while True:
+            if next_token:
+                kwargs["NextToken"] = next_token
+            page = self.call(service, region, operation, client=client, **kwargs)
+            yield from page.get(result_key, [])
+            next_token = page.get("NextToken")
+            if not next_token:
+                return
+
+    def stats(self):
+        """Return call, throttle and retry counters summed over all regions."""
+        return {
+            "calls": sum(self.calls.values()),
+            "throttles": sum(self.throttles.values()),
+            "retries": sum(self.retries.values()),
+        }
+
+    def merge_stats(self, stats, region="*"):
+        """Add counters reported by another process."""
+        for counters, key in ((self.calls, "calls"), (self.throttles, "throttles"), (self.retries, "retries")):
+            if stats.get(key):
+                self._count(counters, region, stats[key])
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"AWS API: {stats['calls']} calls, {stats['throttles']} throttled, {stats['retries']} retries")
+
+    def _count(self, counters, region, value=1):
+        with self._lock:
+            counters[region] = counters.get(region, 0) + value
+
+
+# Process-wide pool shared by all discovery calls
+client_pool = ClientPool()
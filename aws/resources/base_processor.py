@@ -1,30 +1,83 @@
 from pathlib import Path
+from instrumentation import metrics
+from schema_registry import ValidationReport
+from unit_manifest import unit_manifest
 
 class BaseProcessor:
     def __init__(self, resources):
         self.resources = resources
+        self.seen_names = set()  # Names admitted so far when streaming
+
+    # Kinds whose units must be generated before the units of this kind
+    DEPENDS_ON = ()
 
     def process(self):
         """Process the resources: validate and transform them."""
         if not self.validate():
             return None
-        
+
+        self.process_resources()
+
+    def process_resources(self):
+        """Validate, transform and write each resource. Cross-resource validation is done by validate()."""
         # Loop through resources, validate, transform, and write them to the filesystem
         for resource in self.resources:
-            if not self.validate_resource(resource):
-                print(f"Validation failed for resource {resource.metadata['name']}")
-                continue
-            
-            terragrunt_content = self.transform_resource(resource)
-            if terragrunt_content:
-                self.write_to_filesystem(resource, terragrunt_content)
-            else:
-                print(f"Failed to render terragrunt.hcl for {resource.metadata['name']}")
+            self.process_resource(resource)
+
+    def process_resource(self, resource):
+        """Validate, transform and write a single resource."""
+        if not self.validate_resource(resource):
+            print(f"Validation failed for resource {resource.metadata['name']}")
+            metrics.count("resources_failed", kind=resource.kind, account=resource.spec.get("account_id"), reason="validation")
+            return
+
+        # Skip resources whose spec and template are unchanged since the last run
+        if unit_manifest.is_current(
+            str(self.unit_path(resource)), resource.spec, resource.TEMPLATE_FILE, resource.source_path
+        ):
+            return
+
+        terragrunt_content = self.transform_resource(resource)
+        if terragrunt_content:
+            self.write_to_filesystem(resource, terragrunt_content)
+        else:
+            print(f"Failed to render terragrunt.hcl for {resource.metadata['name']}")
+            metrics.count("resources_failed", kind=resource.kind, account=resource.spec.get("account_id"), reason="render")
 
     def validate(self):
         """Validate the list of resources. This will be overridden by each processor."""
         raise NotImplementedError("Validation method must be implemented in a subclass.")
 
+    def admit(self, resource):
+        """
+        Cross-resource checks of one resource against those admitted before it, for the
+        streaming pipeline where the whole kind is never held in memory. Only a compact
+        record of admitted resources is kept, by default their names.
+
+        Returns:
+            bool: True if the resource may be processed.
+        """
+        resource_name = resource.metadata["name"]
+        if resource_name in self.seen_names:
+            print(f"Duplicate name found: {resource_name}")
+            return False
+        self.seen_names.add(resource_name)
+        return True
+
+    def validate_batch(self):
+        """
+        Schema-validate all resources in one pass, collecting every error per resource.
+
+        Returns:
+            ValidationReport: Errors keyed by resource name plus validated/failed counts.
+        """
+        kind = self.resources[0].kind if self.resources else self.__class__.__name__
+        report = ValidationReport(kind)
+        for resource in self.resources:
+            errors = resource.validation_errors(resource.SCHEMA_FILE)
+            report.add(resource.metadata.get("name"), errors)
+        return report
+
     def validate_resource(self, resource):
         """Validate a single resource. This method can be overridden in a subclass if needed."""
         return resource.validate()  # Calls the validate method of the resource model
@@ -33,16 +86,18 @@ class BaseProcessor:
         """Transform a single resource into the desired output format. This will be overridden by each processor."""
         return resource.transform()  # Calls the transform method of the resource model
 
-    def write_to_filesystem(self, resource, terragrunt_content):
-        """Write the transformed content to the filesystem."""
+    def unit_path(self, resource):
+        """Return the path of the terragrunt.hcl generated for a resource."""
         resource_name = resource.metadata["name"]  # Access name attribute
         account_id = resource.spec.get("account_id")  # Access account_id attribute
         kind = resource.kind  # Access kind attribute
-        live_dir = Path(f"live/{account_id}/{kind}/{resource_name}")
-        live_dir.mkdir(parents=True, exist_ok=True)
-
-        terragrunt_file_path = live_dir / "terragrunt.hcl"
-        with open(terragrunt_file_path, "w") as terragrunt_file:
-            terragrunt_file.write(terragrunt_content)
-        
-        print(f"Generated terragrunt.hcl for {kind} {resource_name} at {terragrunt_file_path}")
\ No newline at end of file
+        return Path(f"live/{account_id}/{kind}/{resource_name}") / "terragrunt.hcl"
+
+    def write_to_filesystem(self, resource, terragrunt_content):
+        """Write the transformed content to the filesystem if it changed."""
+        terragrunt_file_path = self.unit_path(resource)
+        written = unit_manifest.write_unit(
+            str(terragrunt_file_path), terragrunt_content, resource.spec, resource.TEMPLATE_FILE, resource.source_path
+        )
+        if written:
+            print(f"Generated terragrunt.hcl for {resource.kind} {resource.metadata['name']} at {terragrunt_file_path}")
\ No newline at end of file
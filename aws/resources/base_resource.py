@@ -1,36 +1,71 @@
 import json
+import sys
 import yaml
-from jsonschema import validate, ValidationError
-from jinja2 import Template
+from schema_registry import schema_registry
+from template_registry import template_registry
+
+# Spec fields whose values repeat across many resources, interned so each value is stored once
+INTERNED_FIELDS = frozenset(("account_id", "region", "environment", "routing_domain"))
+
+
+def intern_fields(mapping, fields=INTERNED_FIELDS):
+    """
+    Return a copy of a dict with interned keys and interned string values for `fields`.
+    YAML and JSON parsers create new key strings for every document, so without this each
+    resource carries its own copy of 'account_id', 'region' and so on.
+    """
+    if not isinstance(mapping, dict):
+        return mapping
+    return {
+        sys.intern(key) if isinstance(key, str) else key:
+            sys.intern(value) if key in fields and isinstance(value, str) else value
+        for key, value in mapping.items()
+    }
 
 
 class BaseResource:
-    def __init__(self, api_version, kind, metadata, spec):
-        self.apiVersion = api_version
-        self.kind = kind
-        self.metadata = metadata
-        self.spec = spec
+    # No per-instance __dict__: large configs hold hundreds of thousands of resources.
+    # Subclasses declare `__slots__ = ()` to keep it that way.
+    __slots__ = ("apiVersion", "kind", "metadata", "spec", "source_path", "schema_errors")
 
-    def validate(self, schema_file):
+    def __init__(self, api_version, kind, metadata, spec, source_path=None):
+        self.apiVersion = sys.intern(api_version) if isinstance(api_version, str) else api_version
+        self.kind = sys.intern(kind) if isinstance(kind, str) else kind
+        self.metadata = intern_fields(metadata)
+        self.spec = intern_fields(spec)
+        self.source_path = source_path  # Config file the resource was loaded from
+        self.schema_errors = None  # Errors against SCHEMA_FILE cached by a config snapshot, None if unknown
+
+    def to_dict(self):
         """
-        Validate the resource against a JSON schema.
+        Return the resource as a plain dictionary in its KRM layout.
         """
-        with open(schema_file, 'r') as schema:
-            schema_data = json.load(schema)
-
-        resource_data = {
+        return {
             "apiVersion": self.apiVersion,
             "kind": self.kind,
             "metadata": self.metadata,
             "spec": self.spec
         }
 
-        try:
-            validate(instance=resource_data, schema=schema_data)
-            return True
-        except ValidationError as e:
-            print(f"Validation error: {e.message}")
-            return False
+    def validation_errors(self, schema_file):
+        """
+        Collect all JSON schema errors for the resource as (path, message) tuples.
+        """
+        if self.schema_errors is not None and schema_file == getattr(self, "SCHEMA_FILE", None):
+            return list(self.schema_errors)
+        return schema_registry.validation_errors(schema_file, self.to_dict())
+
+    def validate(self, schema_file):
+        """
+        Validate the resource against a JSON schema.
+        """
+        errors = self.validation_errors(schema_file)
+        for path, message in errors:
+            if path:
+                print(f"Validation error at {path}: {message}")
+            else:
+                print(f"Validation error: {message}")
+        return not errors
 
     @classmethod
     def from_json(cls, json_str):
@@ -52,9 +87,5 @@ class BaseResource:
         """
         Transform the resource using a Jinja2 template.
         """
-        with open(template_file, 'r') as template_file:
-            template_content = template_file.read()
-
-        template = Template(template_content)
-        return template.render(**self.spec)
+        return template_registry.render(template_file, **self.spec)
     
@@ -0,0 +1,129 @@
+import ipaddress
+
+DEFAULT_ROUTING_DOMAIN = "default"
+
+
+class CidrOverlapIndex:
+    """
+    Detect overlapping CIDR blocks across large address plans.
+
+    Prefixes are grouped by (account_id, region, routing_domain) and stored as integer
+    intervals. Two CIDR prefixes can only overlap by one containing the other, so a
+    single sort followed by a sweep with a stack of enclosing prefixes finds every
+    conflicting pair in O(n log n + k), where k is the number of conflicts.
+    """
+
+    def __init__(self):
+        self._prefixes = {}
+        # For admit(), per key: the entries of each network by (version, prefix length, address),
+        # the (version, prefix length) pairs in use, the entries of the longer prefixes within each
+        # network of a checked length by (version, prefix length, address), and the checked lengths
+        self._networks = {}
+        self._lengths = {}
+        self._within = {}
+        self._checked = {}
+
+    def add(self, cidr_block, owner, account_id, region, routing_domain=None, live=False):
+        """
+        Add a CIDR block to the index.
+
+        Args:
+            cidr_block (str): e.g. '10.10.0.0/16'.
+            owner (str): Name reported in conflicts, e.g. the resource or VPC name.
+            live (bool): True for CIDRs of already-discovered VPCs rather than declared ones.
+
+        Raises:
+            ValueError: If the CIDR block is not a valid network.
+        """
+        network = ipaddress.ip_network(cidr_block, strict=False)
+        start = int(network.network_address)
+        end = int(network.broadcast_address)
+        key = (account_id, region, routing_domain or DEFAULT_ROUTING_DOMAIN)
+        self._prefixes.setdefault(key, []).append(
+            (network.version, start, end, str(network), owner, live)
+        )
+
+    def conflicts(self):
+        """
+        Find every pair of overlapping prefixes within the same account, region and routing domain.
+
+        Returns:
+            list: (key, (cidr, owner, live), (cidr, owner, live)) tuples, the enclosing prefix first.
+        """
+        conflicts = []
+        for key in sorted(self._prefixes, key=str):
+            # Sort by start address, larger prefixes first, so enclosing prefixes precede their subnets
+            prefixes = sorted(self._prefixes[key], key=lambda prefix: (prefix[0], prefix[1], -prefix[2]))
+            stack = []
+            for prefix in prefixes:
+                version, start, _, cidr, owner, live = prefix
+                while stack and (stack[-1][0] != version or stack[-1][2] < start):
+                    stack.pop()
+                for enclosing in stack:
+                    if enclosing[5] and live:
+                        continue  # Overlaps between two live VPCs are not ours to report
+                    conflicts.append((key, (enclosing[3], enclosing[4], enclosing[5]), (cidr, owner, live)))
+                stack.append(prefix)
+        return conflicts
+
+    def admit(self, cidr_block, owner, account_id, region, routing_domain=None, live=False, live_name=None):
+        """
+        Add a CIDR block unless it overlaps one added before, for streaming admission.
+
+        Unlike add() and conflicts(), overlaps are found on insertion with dict lookups
+        only: enclosing prefixes by masking the address to each prefix length in use, and
+        enclosed prefixes through the entries kept per network for each prefix length a
+        block was checked at. Insertion and lookup cost one step per distinct prefix length,
+        whatever the number of prefixes, and the index of a new prefix length is built once
+        from the prefixes admitted before it. Live CIDRs are always added. Overlaps with the
+        live VPC named `live_name` are ignored, since that VPC is the declared one.
+
+        Returns:
+            tuple: The (cidr, owner, live) of a prefix the block overlaps, or None if it was added.
+
+        Raises:
+            ValueError: If the CIDR block is not a valid network.
+        """
+        network = ipaddress.ip_network(cidr_block, strict=False)
+        version, prefixlen, start = network.version, network.prefixlen, int(network.network_address)
+        key = (account_id, region, routing_domain or DEFAULT_ROUTING_DOMAIN)
+        networks = self._networks.setdefault(key, {})
+        lengths = self._lengths.setdefault(key, set())
+        within = self._within.setdefault(key, {})
+        checked = self._checked.setdefault(key, set())
+
+        if not live:
+            if (version, prefixlen) not in checked:
+                checked.add((version, prefixlen))
+                for (other_version, length, other_start), entries in networks.items():
+                    if other_version == version and length > prefixlen:
+                        supernet = self._supernet(version, other_start, prefixlen)
+                        within.setdefault((version, prefixlen, supernet), []).extend(entries)
+            for conflict in self._overlapping(networks, lengths, within, version, prefixlen, start):
+                if not (conflict[2] and conflict[1] == live_name):
+                    return conflict
+
+        entry = (str(network), owner, live)
+        networks.setdefault((version, prefixlen, start), []).append(entry)
+        lengths.add((version, prefixlen))
+        for checked_version, length in checked:
+            if checked_version == version and length < prefixlen:
+                within.setdefault((version, length, self._supernet(version, start, length)), []).append(entry)
+        return None
+
+    @staticmethod
+    def _supernet(version, address, length):
+        """Return the address of the network of a prefix length that holds an address."""
+        bits = 32 if version == 4 else 128
+        return address & (((1 << bits) - 1) ^ ((1 << (bits - length)) - 1))
+
+    @classmethod
+    def _overlapping(cls, networks, lengths, within, version, prefixlen, start):
+        """Yield the entries of the prefixes that enclose, equal or lie within a network."""
+        for other_version, length in sorted(lengths):
+            if other_version == version and length <= prefixlen:
+                yield from networks.get((version, length, cls._supernet(version, start, length)), ())
+        yield from within.get((version, prefixlen, start), ())
+
+    def __len__(self):
+        return sum(len(prefixes) for prefixes in self._prefixes.values())
@@ -0,0 +1,158 @@
+import hashlib
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import yaml
+
+try:
+    # libyaml-backed loader, several times faster than the pure-Python one
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Top-level `kind:` lines, used to skip files without parsing them
+KIND_PATTERN = re.compile(rb"^kind:[ \t]*['\"]?([A-Za-z0-9_]+)", re.MULTILINE)
+
+# Below this many files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 256
+
+# Batches in flight per worker process, bounding the parsed documents held in memory
+BATCHES_PER_WORKER = 2
+
+
+def iter_config_files(input_dir):
+    """Yield all YAML/YML files below a directory in a stable order."""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(".yaml") or file.endswith(".yml"):
+                yield os.path.join(root, file)
+
+
+def peek_kinds(file_path):
+    """
+    Return the kinds declared at the top level of a YAML file without parsing it.
+    The file is memory-mapped, so this stays cheap for very large files.
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return set()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            return {match.decode() for match in KIND_PATTERN.findall(content)}
+
+
+def parse_documents(stream, file_path, kinds=None):
+    """
+    Parse every document of a YAML string, bytes or file.
+
+    Returns:
+        list: The documents of the given kinds, or None if the YAML could not be parsed.
+    """
+    documents = []
+    try:
+        # load_all streams documents one at a time, so large multi-document files are fine
+        for document in yaml.load_all(stream, Loader=SafeLoader):
+            if not isinstance(document, dict):
+                continue
+            if kinds and document.get("kind") not in kinds:
+                continue
+            documents.append(document)
+    except yaml.YAMLError as e:
+        print(f"Error parsing YAML file {file_path}: {e}")
+        return None
+    return documents
+
+
+def load_file(file_path, kinds=None):
+    """
+    Parse every document of a YAML file.
+
+    Args:
+        file_path (str): The file to load.
+        kinds (set): Only return documents of these kinds. Files that declare none of
+            them are skipped without a full parse.
+
+    Returns:
+        tuple: (file_path, documents) where documents is a list of dicts.
+    """
+    if kinds:
+        declared = peek_kinds(file_path)
+        if declared and declared.isdisjoint(kinds):
+            return file_path, []
+
+    with open(file_path, 'r') as file:
+        documents = parse_documents(file, file_path, kinds)
+    return file_path, documents if documents is not None else []
+
+
+def load_file_digest(file_path, kinds=None):
+    """
+    Like load_file, also returning the sha256 of the bytes that were parsed, so the
+    digest always describes the documents even when the file changes meanwhile.
+
+    Returns:
+        tuple: (file_path, documents, sha256), sha256 being None if the file could not be parsed.
+    """
+    with open(file_path, 'rb') as file:
+        content = file.read()
+    documents = parse_documents(content, file_path, kinds)
+    if documents is None:
+        return file_path, [], None
+    return file_path, documents, hashlib.sha256(content).hexdigest()
+
+
+def load_batch(file_paths, kinds=None, loader=load_file):
+    """Load several files in one worker call."""
+    return [loader(file_path, kinds) for file_path in file_paths]
+
+
+def iter_loaded_batches(pool, files, kinds, jobs, chunksize, loader=load_file):
+    """
+    Yield loader results in file order, keeping at most BATCHES_PER_WORKER batches per
+    worker submitted ahead of the consumer. Unlike pool.map, parsed documents never pile
+    up when the consumer is slower than the parsers.
+    """
+    batches = (files[start:start + chunksize] for start in range(0, len(files), chunksize))
+    pending = []
+    for batch in batches:
+        pending.append(pool.submit(load_batch, batch, kinds, loader))
+        if len(pending) >= jobs * BATCHES_PER_WORKER:
+            yield from pending.pop(0).result()
+    for future in pending:
+        yield from future.result()
+
+
+def load_documents(input_dir, kinds=None, jobs=0):
+    """
+    Load all documents below a directory, optionally in a process pool.
+
+    Args:
+        input_dir (str): The config directory.
+        kinds (set): Only yield documents of these kinds.
+        jobs (int): Worker processes. 0 picks one per CPU when there are enough files, 1 is serial.
+
+    Yields:
+        tuple: (file_path, documents) per file in file order, documents being empty for skipped files.
+    """
+    return load_files(list(iter_config_files(input_dir)), kinds, jobs)
+
+
+def load_files(files, kinds=None, jobs=0, loader=load_file):
+    """Like load_documents, for a list of files. Yields what loader (load_file or load_file_digest) returns."""
+    if jobs == 0:
+        jobs = (os.cpu_count() or 1) if len(files) >= PARALLEL_THRESHOLD else 1
+
+    if jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        chunksize = max(1, min(256, len(files) // (jobs * 8)))
+        results = iter_loaded_batches(pool, files, kinds, jobs, chunksize, loader)
+    else:
+        pool = None
+        results = (loader(file_path, kinds) for file_path in files)
+
+    try:
+        yield from results
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
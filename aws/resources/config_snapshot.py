@@ -0,0 +1,209 @@
+import glob
+import hashlib
+import marshal
+import os
+import tempfile
+import time
+from config_loader import iter_config_files, load_file_digest, load_files
+from instrumentation import metrics
+from unit_manifest import file_mode
+
+SNAPSHOT_FILE = ".config-snapshot"
+SNAPSHOT_VERSION = 2
+
+SCHEMA_GLOB = "resources/schemas/*.json"
+
+# Files modified this close to the scan a snapshot was built from may have changed again
+# within the same mtime tick without changing size, so they are checked by hash instead of
+# trusted. 2 seconds covers the coarsest filesystem timestamps (FAT).
+RACY_SECONDS = 2
+
+
+def file_sha256(file_path):
+    with open(file_path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def marshallable(value):
+    """Return True if marshal can store a value, which YAML timestamps, for one, are not."""
+    try:
+        marshal.dumps(value)
+    except ValueError:
+        return False
+    return True
+
+
+def schema_digest(pattern=SCHEMA_GLOB):
+    """Return a digest of the schema files, which cached validation results depend on."""
+    digest = hashlib.sha256()
+    for schema_file in sorted(glob.glob(pattern)):
+        digest.update(schema_file.encode("utf-8"))
+        digest.update(file_sha256(schema_file).encode("ascii"))
+    return digest.hexdigest()
+
+
+class ConfigSnapshot:
+    """
+    Compiled snapshot of the config tree: the parsed documents of every YAML file with the
+    file's mtime, size and sha256, and the schema validation errors of each document.
+
+    A run loads the snapshot (one marshal.load) and only re-parses the files whose mtime
+    or size changed and whose content hash differs. Files touched without a change keep
+    their documents. Documents are validated the first time a run needs them, and their
+    errors are cached until a schema file changes. The snapshot is rewritten when
+    anything changed.
+
+    The snapshot is stored with marshal, which only reads back plain data, so a snapshot
+    restored from a shared cache cannot run code the way a pickle can. Files whose
+    documents hold values marshal does not support (YAML timestamps) are left out and
+    parsed on every run.
+
+    Args:
+        path (str): The snapshot file.
+        validate: Called with a document, returns its schema errors, or None if its kind
+            is not supported.
+    """
+
+    def __init__(self, path=SNAPSHOT_FILE, validate=None):
+        self.path = path
+        self.validate = validate
+        self.files = {}
+        self.scanned_at = 0
+        self.dirty = False
+        self.stats = {"reused": 0, "parsed": 0, "removed": 0, "validated": 0}
+
+    def read(self, schemas):
+        """Load the snapshot. Returns False if there is none or it cannot be used."""
+        try:
+            with open(self.path, 'rb') as snapshot_file:
+                data = marshal.load(snapshot_file)
+        except FileNotFoundError:
+            return False
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            print(f"Ignoring unreadable config snapshot {self.path}: {e}")
+            return False
+        if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+            print(f"Ignoring config snapshot {self.path} of another version")
+            return False
+
+        self.files = data["files"]
+        self.scanned_at = data["scanned_at"]
+        if data["schemas"] != schemas:
+            # Documents stay valid, their validation results do not
+            for entry in self.files.values():
+                entry["errors"] = [None] * len(entry["documents"])
+        return True
+
+    def write(self, schemas):
+        """Atomically write the snapshot."""
+        data = {"version": SNAPSHOT_VERSION, "schemas": schemas, "scanned_at": self.scanned_at, "files": self.files}
+        try:
+            content = marshal.dumps(data)
+        except ValueError:
+            # Left out, files holding values marshal cannot store are parsed again next run
+            data["files"] = {file_path: entry for file_path, entry in self.files.items() if marshallable(entry)}
+            content = marshal.dumps(data)
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            # mkstemp creates the file 0600, which the rename would keep
+            os.fchmod(fd, file_mode(self.path))
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(content)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def is_current(self, file_path, entry, stat):
+        """Return True if a file still has the content its entry was compiled from."""
+        # Files that did not parse are parsed again, to report their errors again
+        if entry["sha256"] is None or entry["size"] != stat.st_size:
+            return False
+        racy = stat.st_mtime_ns >= self.scanned_at - RACY_SECONDS * 10**9
+        if entry["mtime_ns"] == stat.st_mtime_ns and not racy:
+            return True
+        if entry["sha256"] != file_sha256(file_path):
+            return False
+        # Touched but unchanged, or racy: record the new mtime so it is trusted once settled
+        entry["mtime_ns"] = stat.st_mtime_ns
+        self.dirty = True
+        return True
+
+    def load(self, input_dir, kinds=None, jobs=0):
+        """
+        Bring the snapshot up to date with a config directory and yield its documents.
+
+        Args:
+            input_dir (str): The config directory.
+            kinds (set): Only yield documents of these kinds.
+            jobs (int): Worker processes used to parse changed files, as for load_documents.
+
+        Yields:
+            tuple: (file_path, documents, errors) per file in file order, errors[i] being
+                the cached schema errors of documents[i] or None.
+        """
+        schemas = schema_digest()
+        with metrics.stage("snapshot_read"):
+            self.read(schemas)
+
+        files = {}
+        changed = []
+        scanned_at = time.time_ns()
+        with metrics.stage("snapshot_stat"):
+            for file_path in iter_config_files(input_dir):
+                stat = os.stat(file_path)
+                entry = self.files.get(file_path)
+                if entry is not None and self.is_current(file_path, entry, stat):
+                    files[file_path] = entry
+                    self.stats["reused"] += 1
+                else:
+                    files[file_path] = None
+                    changed.append((file_path, stat))
+
+        # Changed files are parsed whole, the snapshot holds every kind
+        with metrics.stage("snapshot_parse"):
+            stats = dict(changed)
+            # The hash is of the bytes that were parsed. The stat may predate them, which only
+            # makes the next run hash the file again and find it unchanged.
+            for file_path, documents, sha256 in load_files([path for path, _ in changed], None, jobs, load_file_digest):
+                stat = stats[file_path]
+                files[file_path] = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "sha256": sha256,
+                    "documents": documents,
+                    "errors": [None] * len(documents),
+                }
+                self.stats["parsed"] += 1
+
+        self.stats["removed"] = len(set(self.files) - set(files))
+        if changed or self.stats["removed"]:
+            self.dirty = True
+        self.files = files
+
+        for file_path, entry in files.items():
+            documents = []
+            errors = []
+            for index, document in enumerate(entry["documents"]):
+                if kinds and document.get("kind") not in kinds:
+                    continue
+                if entry["errors"][index] is None and self.validate is not None:
+                    entry["errors"][index] = self.validate(document)
+                    if entry["errors"][index] is not None:
+                        self.stats["validated"] += 1
+                        self.dirty = True
+                documents.append(document)
+                errors.append(entry["errors"][index])
+            yield file_path, documents, errors
+
+        if self.dirty:
+            self.scanned_at = scanned_at
+            with metrics.stage("snapshot_write"):
+                self.write(schemas)
+        print(
+            f"Config snapshot: {self.stats['reused']} files reused, {self.stats['parsed']} parsed, "
+            f"{self.stats['removed']} removed, {self.stats['validated']} documents validated"
+        )
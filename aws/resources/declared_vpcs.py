@@ -0,0 +1,167 @@
+import json
+import os
+from config_loader import load_documents
+from instrumentation import metrics
+from inventory_cache import inventory_cache
+from vpc_record import VpcRecord
+
+VPC_SOURCES = ("discover", "declared", "merged")
+
+# Files in a VPC unit directory holding its Terraform outputs, in order of preference:
+# `terragrunt output -json > outputs.json`, or a local state file
+OUTPUT_FILES = ("outputs.json", "terraform.tfstate")
+
+
+def read_outputs(unit_dir):
+    """
+    Return the Terraform output values of a unit, or None if none were saved.
+
+    Both `terraform output -json` files ({name: {"value": ...}}) and state files
+    ({"version": 4, "outputs": {name: {"value": ...}}}) are understood.
+    """
+    for file_name in OUTPUT_FILES:
+        path = os.path.join(unit_dir, file_name)
+        try:
+            with open(path, 'r') as output_file:
+                data = json.load(output_file)
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable Terraform outputs {path}: {e}")
+            continue
+        if "version" in data and isinstance(data.get("outputs"), dict):
+            data = data["outputs"]
+        return {name: output.get("value") for name, output in data.items() if isinstance(output, dict)}
+    return None
+
+
+class DeclaredVpcIndex:
+    """
+    Index of the VPCs declared by VPC resources, joined with the outputs of their units.
+
+    VPCs are indexed by (account_id, region) and vpc_name. The IDs an attachment needs
+    (vpc_id, tgw_attachment_subnets, private_route_table_ids) come from the outputs the
+    terraform-modules/vpc module left in the VPC's unit directory, so attachments can be
+    rendered without calling EC2. The source decides how VPCs are resolved:
+
+    - discover: always discover VPCs from EC2 (through the inventory cache)
+    - declared: use the declared VPCs of a partition when all of them have outputs, and
+                discover the partition from EC2 otherwise
+    - merged:   use the declared VPCs, and add the VPCs discovered in EC2 that are not
+                declared (unmanaged VPCs)
+    """
+
+    def __init__(self, source="discover"):
+        self.source = source
+        self._by_partition = {}
+        self._directory_loaded = False
+
+    def configure(self, source=None):
+        if source is not None:
+            if source not in VPC_SOURCES:
+                raise ValueError(f"Unknown VPC source: {source}")
+            self.source = source
+
+    @property
+    def enabled(self):
+        return self.source != "discover"
+
+    def register(self, resource):
+        """Index a VPC resource, replacing an earlier one of the same name."""
+        self.register_document(resource.metadata["name"], resource.spec)
+
+    def register_document(self, name, spec):
+        """Index a VPC spec. Its outputs are looked up in the unit VPCProcessor generates for it."""
+        partition = (str(spec.get("account_id")), spec.get("region"))
+        unit_dir = f"live/{spec.get('account_id')}/VPC/{name}"
+        self._by_partition.setdefault(partition, {})[spec.get("vpc_name")] = (spec, unit_dir)
+
+    def unregister(self, resource):
+        """Drop a VPC resource, e.g. one whose config file changed or was removed."""
+        spec = resource.spec
+        vpcs = self._by_partition.get((str(spec.get("account_id")), spec.get("region")), {})
+        vpcs.pop(spec.get("vpc_name"), None)
+
+    def load_directory(self, input_dir):
+        """Register every VPC document found in the YAML files of a directory."""
+        for _, documents in load_documents(input_dir, {"VPC"}, jobs=1):
+            for document in documents:
+                self.register_document(document["metadata"]["name"], document.get("spec") or {})
+        self._directory_loaded = True
+
+    def ensure_loaded(self, account_id, region, input_dir=None):
+        """
+        Load VPC documents from the config directory unless VPCs of the partition were
+        registered, e.g. in a worker process that did not run the partition's VPC task.
+        """
+        if not self._directory_loaded and not self._by_partition.get((str(account_id), region)):
+            self.load_directory(input_dir or os.path.join(os.getcwd(), "config"))
+
+    def declared(self, account_id, region):
+        """
+        Return the declared VPCs of a partition joined with their outputs.
+
+        Returns:
+            tuple: (records, missing) with a VpcRecord per VPC with outputs, and the names
+                of the declared VPCs without outputs.
+        """
+        self.ensure_loaded(account_id, region)
+        records = []
+        missing = []
+        for vpc_name, (spec, unit_dir) in self._by_partition.get((str(account_id), region), {}).items():
+            outputs = read_outputs(unit_dir)
+            if not outputs or not outputs.get("vpc_id"):
+                missing.append(vpc_name)
+                continue
+            records.append(VpcRecord(
+                outputs["vpc_id"],
+                vpc_name=vpc_name,
+                cidr_block=spec.get("cidr_block"),
+                environment=spec.get("environment"),
+                subnet_ids=outputs.get("tgw_attachment_subnets") or (),
+                route_table_ids=outputs.get("private_route_table_ids") or (),
+            ))
+        return records, missing
+
+    def unit_dir(self, account_id, region, vpc_name):
+        """Return the unit directory of the VPC declared under a name, or None if it is not declared."""
+        self.ensure_loaded(account_id, region)
+        declared = self._by_partition.get((str(account_id), region), {}).get(vpc_name)
+        return declared[1] if declared else None
+
+    def get_vpcs(self, account_id, region):
+        """
+        Return the VPCs to attach in an account and region, resolved according to the source.
+
+        Returns:
+            list: VpcRecords, declared VPCs first.
+        """
+        if not self.enabled:
+            return inventory_cache.get_vpcs(account_id, region)
+
+        records, missing = self.declared(account_id, region)
+        if self.source == "declared" and records and not missing:
+            metrics.count("vpc_resolution", result="declared", account=account_id, region=region)
+            return records
+
+        if self.source == "declared" and missing:
+            print(
+                f"No Terraform outputs for declared VPC(s) {', '.join(missing)} in account {account_id}, "
+                f"region {region}, discovering them from EC2"
+            )
+        metrics.count("vpc_resolution", result="discovered", account=account_id, region=region)
+        declared_ids = {record.vpc_id for record in records}
+        declared_names = {record.vpc_name for record in records}
+        discovered = [
+            vpc for vpc in inventory_cache.get_vpcs(account_id, region)
+            if vpc["vpc_id"] not in declared_ids and vpc.get("vpc_name") not in declared_names
+        ]
+        return records + discovered
+
+    def clear(self):
+        self._by_partition.clear()
+        self._directory_loaded = False
+
+
+# Process-wide index shared by the VPC and CoreNetworkAttachment processors
+declared_vpcs = DeclaredVpcIndex()
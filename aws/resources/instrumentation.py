@@ -0,0 +1,203 @@
+import bisect
+import contextlib
+import json
+import threading
+import time
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = "controlplane_"
+FORMATS = ("jsonl", "openmetrics")
+
+# Shared do-nothing context manager, so a disabled stage() costs one attribute check
+NULL_STAGE = contextlib.nullcontext()
+
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+
+def unit_labels(unit_path):
+    """Return the kind and account of a unit from its path, live/<account_id>/<kind>/<name>/terragrunt.hcl."""
+    parts = str(unit_path).replace("\\", "/").split("/")
+    if len(parts) >= 3 and parts[0] == "live":
+        return {"account": parts[1], "kind": parts[2]}
+    return {}
+
+
+class Histogram:
+    """Per-bucket (not cumulative) counts, sum and count of observed values."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts, total, count):
+        for index, bucket_count in enumerate(counts):
+            self.counts[index] += bucket_count
+        self.sum += total
+        self.count += count
+
+
+class Metrics:
+    """
+    Process-wide counters and latency histograms of a run.
+
+    Stages (load, validate, discover, render, write, process) are timed with the stage()
+    context manager and counters are bumped with count(), both keyed by a metric name and
+    labels such as kind and account. Metrics are disabled by default, and then stage()
+    returns a shared no-op context manager and count() returns immediately, so the hooks
+    can stay in hot paths. Worker processes hand their metrics to the parent with take()
+    and merge().
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.enabled = False
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=None):
+        if enabled is not None:
+            self.enabled = enabled
+
+    def stage(self, name, **labels):
+        """Time a block as one observation of the `stage_seconds` histogram."""
+        if not self.enabled:
+            return NULL_STAGE
+        return self._timed(name, labels)
+
+    @contextlib.contextmanager
+    def _timed(self, name, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=name, **labels)
+
+    def observe(self, name, value, **labels):
+        """Add an observation to a histogram."""
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def count(self, name, value=1, **labels):
+        """Increase a counter."""
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def take(self):
+        """Return and reset the metrics collected so far, in a picklable form for merge()."""
+        with self._lock:
+            taken = {
+                "counters": list(self._counters.items()),
+                "histograms": [(key, (h.counts, h.sum, h.count)) for key, h in self._histograms.items()],
+            }
+            self._counters.clear()
+            self._histograms.clear()
+        return taken
+
+    def merge(self, taken):
+        """Add metrics taken in another process."""
+        with self._lock:
+            for key, value in taken["counters"]:
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (counts, total, count) in taken["histograms"]:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(self.buckets)
+                histogram.merge(counts, total, count)
+
+    def records(self):
+        """Return every counter and histogram as a dict, sorted by name and labels."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            records = [
+                {"type": "counter", "name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in counters
+            ]
+            for (name, labels), histogram in histograms:
+                records.append({
+                    "type": "histogram",
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], histogram.counts)),
+                })
+        return records
+
+    def write(self, file_path, file_format="jsonl"):
+        """Write the metrics as JSON lines or as an OpenMetrics text exposition."""
+        if file_format not in FORMATS:
+            raise ValueError(f"Unknown metrics format: {file_format}")
+        records = self.records()
+        with open(file_path, "w") as metrics_file:
+            if file_format == "jsonl":
+                timestamp = time.time()
+                for record in records:
+                    metrics_file.write(json.dumps(dict(record, timestamp=timestamp)) + "\n")
+            else:
+                metrics_file.write(openmetrics(records))
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels.items()) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def openmetrics(records):
+    """Return records as OpenMetrics text, one family per metric name."""
+    lines = []
+    families = {}
+    for record in records:
+        families.setdefault((record["name"], record["type"]), []).append(record)
+
+    for (name, metric_type), family in sorted(families.items()):
+        metric = METRIC_PREFIX + name
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for record in family:
+            labels = record["labels"]
+            if metric_type == "counter":
+                lines.append(f"{metric}_total{format_labels(labels)} {record['value']}")
+                continue
+            cumulative = 0
+            for bound, count in record["buckets"].items():
+                cumulative += count
+                lines.append(f"{metric}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{metric}_count{format_labels(labels)} {record['count']}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {record['sum']:.6f}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+# Process-wide metrics shared by all processors
+metrics = Metrics()
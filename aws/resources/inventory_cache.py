@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+from instrumentation import metrics
+from vpc_record import vpc_records
+from vpc_utils import find_tgw_routing, find_vpcs_with_tgw_attachment
+
+INVENTORY_DIR = ".inventory"
+DEFAULT_TTL_SECONDS = 3600
+
+
+class InventoryCache:
+    """
+    Cache of discovered VPCs, subnets and route tables per (account_id, region), and of
+    Transit Gateway routing per (account_id, region, transit_gateway_id).
+
+    Lookups go through an in-process memo first, then an on-disk snapshot that is
+    valid for `ttl` seconds, and only then to EC2. In offline mode the last snapshot
+    is used regardless of its age and AWS is never called.
+    """
+
+    def __init__(self, snapshot_dir=INVENTORY_DIR, ttl=DEFAULT_TTL_SECONDS, offline=False, refresh=False):
+        self.snapshot_dir = snapshot_dir
+        self.ttl = ttl
+        self.offline = offline
+        self.refresh = refresh
+        self._memo = {}
+        self._lock = threading.Lock()
+        self.memo_hits = 0
+        self.snapshot_hits = 0
+        self.misses = 0
+
+    def configure(self, snapshot_dir=None, ttl=None, offline=None, refresh=None):
+        """Update cache settings. Clears the in-process memo."""
+        if snapshot_dir is not None:
+            self.snapshot_dir = snapshot_dir
+        if ttl is not None:
+            self.ttl = ttl
+        if offline is not None:
+            self.offline = offline
+        if refresh is not None:
+            self.refresh = refresh
+        self._memo.clear()
+
+    def snapshot_path(self, account_id, region, transit_gateway_id=None):
+        if transit_gateway_id:
+            return os.path.join(self.snapshot_dir, str(account_id), f"{region}.{transit_gateway_id}.json")
+        return os.path.join(self.snapshot_dir, str(account_id), f"{region}.json")
+
+    def get_vpcs(self, account_id, region):
+        """
+        Return the VPCs with TGW attachment tags for an account and region.
+
+        Returns:
+            list: VpcRecords as produced by find_vpcs_with_tgw_attachment.
+        """
+        vpcs = self._get(
+            account_id, region, None, "vpcs", lambda: find_vpcs_with_tgw_attachment(account_id, region), vpc_records
+        )
+        return [] if vpcs is None else vpcs
+
+    def get_tgw_routing(self, account_id, region, transit_gateway_id):
+        """
+        Return the attachments and route tables of a Transit Gateway as seen from an account.
+
+        Returns:
+            dict: Routing as produced by find_tgw_routing, or None in offline mode without a snapshot.
+        """
+        return self._get(
+            account_id, region, transit_gateway_id, "routing",
+            lambda: find_tgw_routing(region, transit_gateway_id),
+        )
+
+    def _get(self, account_id, region, transit_gateway_id, field, discover, decode=None):
+        key = (account_id, region, transit_gateway_id)
+        with self._lock:
+            memo = self._memo.get(key)
+            # Memo entries expire with their snapshot, so a long-running process rediscovers
+            if memo is not None and not self._expired(memo[0]):
+                self.memo_hits += 1
+                metrics.count("inventory_lookups", result="memory", account=account_id, region=region)
+                return memo[1]
+
+        value = None
+        fetched_at = time.time()
+        if not self.refresh:
+            snapshot = self._read_snapshot(account_id, region, transit_gateway_id)
+            if snapshot is not None and snapshot.get(field) is not None:
+                fetched_at, value = snapshot.get("fetched_at", 0), snapshot[field]
+                if decode is not None:
+                    value = decode(value)
+                with self._lock:
+                    self.snapshot_hits += 1
+                metrics.count("inventory_lookups", result="snapshot", account=account_id, region=region)
+
+        if value is None:
+            if self.offline:
+                subject = f"Transit Gateway {transit_gateway_id} in account" if transit_gateway_id else "account"
+                print(f"No inventory snapshot found for {subject} {account_id} in region {region} (offline mode).")
+                return None
+            with self._lock:
+                self.misses += 1
+            metrics.count("inventory_lookups", result="miss", account=account_id, region=region)
+            with metrics.stage("discover", account=account_id, region=region, data=field):
+                value = discover()
+            self._write_snapshot(account_id, region, transit_gateway_id, field, value, fetched_at)
+
+        with self._lock:
+            self._memo[key] = (fetched_at, value)
+        return value
+
+    def _expired(self, fetched_at):
+        return not self.offline and time.time() - fetched_at > self.ttl
+
+    def invalidate(self, account_id=None, region=None):
+        """
+        Drop cached inventory. Without arguments everything is dropped, otherwise only
+        the matching account and/or region.
+        """
+        for key in list(self._memo):
+            if (account_id is None or key[0] == account_id) and (region is None or key[1] == region):
+                del self._memo[key]
+
+        if not os.path.isdir(self.snapshot_dir):
+            return
+        for account_dir in os.listdir(self.snapshot_dir):
+            if account_id is not None and account_dir != str(account_id):
+                continue
+            account_path = os.path.join(self.snapshot_dir, account_dir)
+            for file_name in os.listdir(account_path):
+                if region is None or file_name.startswith(f"{region}."):
+                    os.remove(os.path.join(account_path, file_name))
+
+    def stats(self):
+        """Return the hit and miss counters."""
+        return {"memo_hits": self.memo_hits, "snapshot_hits": self.snapshot_hits, "misses": self.misses}
+
+    def merge_stats(self, stats):
+        """Add counters reported by another process."""
+        with self._lock:
+            self.memo_hits += stats.get("memo_hits", 0)
+            self.snapshot_hits += stats.get("snapshot_hits", 0)
+            self.misses += stats.get("misses", 0)
+
+    def print_stats(self):
+        hits = self.memo_hits + self.snapshot_hits
+        print(
+            f"Inventory cache: {hits} hits ({self.memo_hits} memory, {self.snapshot_hits} snapshot), "
+            f"{self.misses} misses"
+        )
+
+    def _read_snapshot(self, account_id, region, transit_gateway_id):
+        path = self.snapshot_path(account_id, region, transit_gateway_id)
+        try:
+            with open(path, 'r') as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable inventory snapshot {path}: {e}")
+            return None
+
+        if self._expired(snapshot.get("fetched_at", 0)):
+            return None
+        return snapshot
+
+    def _write_snapshot(self, account_id, region, transit_gateway_id, field, value, fetched_at):
+        path = self.snapshot_path(account_id, region, transit_gateway_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        snapshot = {
+            "account_id": account_id,
+            "region": region,
+            "fetched_at": fetched_at,
+            field: value,
+        }
+        if transit_gateway_id:
+            snapshot["transit_gateway_id"] = transit_gateway_id
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as snapshot_file:
+            # Records such as VpcRecord are mappings and are written as plain objects
+            json.dump(snapshot, snapshot_file, indent=2, default=dict)
+        os.replace(temp_path, path)
+
+
+# Process-wide cache shared by resources and processors
+inventory_cache = InventoryCache()
@@ -0,0 +1,127 @@
+import importlib
+import os
+import re
+
+RESOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROCESSOR_SUFFIX = "_processor"
+
+
+def module_prefix(api_version):
+    """Return the module name prefix of an apiVersion, e.g. 'trafficplatform_aws_v1' for 'trafficplatform.aws/v1'."""
+    return re.sub(r"[^0-9a-zA-Z]+", "_", api_version).strip("_").lower()
+
+
+def snake_case(kind):
+    """Return the module name part of a kind, e.g. 'core_network_attachment' for 'CoreNetworkAttachment', 'vpc' for 'VPC'."""
+    return re.sub(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])", "_", kind).lower()
+
+
+class KindRegistry:
+    """
+    Resource model and processor classes keyed by (apiVersion, kind), imported on first use.
+
+    By convention the kind `Kind` of `trafficplatform.aws/v1` lives in the modules
+    trafficplatform_aws_v1_<kind>.py (class KindResource) and
+    trafficplatform_aws_v1_<kind>_processor.py (class KindProcessor), so adding a kind
+    only takes those two files. Modules are imported the first time a document of their
+    kind is loaded, which keeps boto3, jsonschema and jinja2 out of runs that never need
+    them. Kinds living elsewhere can be added with register().
+    """
+
+    def __init__(self, module_dir=RESOURCE_DIR):
+        self.module_dir = module_dir
+        self._registered = {}
+        self._classes = {}
+        self._module_files = None
+
+    def register(self, api_version, kind, resource_module, processor_module, resource_class=None, processor_class=None):
+        """
+        Register a kind whose modules or classes do not follow the naming convention.
+
+        Args:
+            resource_module (str): Module of the resource model, imported lazily.
+            processor_module (str): Module of the processor, imported lazily.
+            resource_class (str): Class name, defaults to '<kind>Resource'.
+            processor_class (str): Class name, defaults to '<kind>Processor'.
+        """
+        self._registered[(api_version, kind)] = (
+            (resource_module, resource_class or f"{kind}Resource"),
+            (processor_module, processor_class or f"{kind}Processor"),
+        )
+        self._classes.pop((api_version, kind), None)
+
+    @property
+    def module_files(self):
+        """The .py files of the module directory, listed once since every loaded document is looked up."""
+        if self._module_files is None:
+            self._module_files = frozenset(file for file in os.listdir(self.module_dir) if file.endswith(".py"))
+        return self._module_files
+
+    def _module_exists(self, module):
+        return f"{module}.py" in self.module_files
+
+    def _lookup(self, api_version, kind):
+        """Return the ((module, class), (module, class)) of a kind, or None if it is unknown."""
+        registered = self._registered.get((api_version, kind))
+        if registered is not None:
+            return registered
+        if not isinstance(api_version, str) or not isinstance(kind, str) or not kind:
+            return None
+        module = f"{module_prefix(api_version)}_{snake_case(kind)}"
+        if not self._module_exists(module) or not self._module_exists(module + PROCESSOR_SUFFIX):
+            return None
+        return (module, f"{kind}Resource"), (module + PROCESSOR_SUFFIX, f"{kind}Processor")
+
+    def supports_api_version(self, api_version):
+        """Return True if any kind is known for an apiVersion, without importing anything."""
+        if any(registered_version == api_version for registered_version, _ in self._registered):
+            return True
+        if not isinstance(api_version, str):
+            return False
+        prefix = module_prefix(api_version) + "_"
+        return any(file.startswith(prefix) for file in self.module_files)
+
+    def supports(self, api_version, kind):
+        """Return True if a kind is known, without importing its modules."""
+        return self._lookup(api_version, kind) is not None
+
+    def _load(self, api_version, kind):
+        classes = self._classes.get((api_version, kind))
+        if classes is None:
+            lookup = self._lookup(api_version, kind)
+            if lookup is None:
+                raise KeyError(f"Unsupported kind {kind} of apiVersion {api_version}")
+            classes = tuple(getattr(importlib.import_module(module), name) for module, name in lookup)
+            self._classes[(api_version, kind)] = classes
+        return classes
+
+    def resource_class(self, api_version, kind):
+        """Return the resource model class of a kind, importing its module on first use."""
+        return self._load(api_version, kind)[0]
+
+    def processor_class(self, api_version, kind):
+        """Return the processor class of a kind, importing its module on first use."""
+        return self._load(api_version, kind)[1]
+
+    def kinds(self, api_version):
+        """
+        Return every kind of an apiVersion, sorted. This imports all of its processor
+        modules, since kind names are taken from the processor classes.
+        """
+        kinds = {kind for registered_version, kind in self._registered if registered_version == api_version}
+        prefix = module_prefix(api_version) + "_"
+        for file in sorted(os.listdir(self.module_dir)):
+            if not (file.startswith(prefix) and file.endswith(PROCESSOR_SUFFIX + ".py")):
+                continue
+            module_name = file[:-len(".py")]
+            kind_module = module_name[len(prefix):-len(PROCESSOR_SUFFIX)]
+            module = importlib.import_module(module_name)
+            for name in dir(module):
+                kind = name[:-len("Processor")]
+                if name.endswith("Processor") and kind and snake_case(kind) == kind_module and self.supports(api_version, kind):
+                    kinds.add(kind)
+        return sorted(kinds)
+
+
+# Process-wide registry of all kinds
+kind_registry = KindRegistry()
@@ -1,97 +1,334 @@
 import os
-import yaml
 import argparse
+import functools
 from pathlib import Path
-from trafficplatform_aws_v1_vpc_processor import VPCProcessor
-from trafficplatform_aws_v1_core_network_attachment_processor import CoreNetworkAttachmentProcessor
-from trafficplatform_aws_v1_vpc import VPCResource
-from trafficplatform_aws_v1_core_network_attachment import CoreNetworkAttachmentResource
-
-# Dictionary to keep track of resources by kind
-resources_by_kind = {
-    "CoreNetworkAttachment": [],
-    "VPC": [],
-}
-
-RESOURCE_MODELS = {
-    "trafficplatform.aws/v1": {
-        "CoreNetworkAttachment": CoreNetworkAttachmentResource,
-        "VPC": VPCResource,
-    },
-}
-
-PROCESSORS = {
-    "trafficplatform.aws/v1": {
-        "CoreNetworkAttachment": CoreNetworkAttachmentProcessor,
-        "VPC": VPCProcessor,
-    },
-}
+from kind_registry import kind_registry
+from schema_registry import schema_registry
+from instrumentation import metrics, FORMATS as METRICS_FORMATS
+from template_registry import template_registry
+from inventory_cache import inventory_cache
+from aws_clients import client_pool
+from tgw_registry import tgw_registry, SELECTION_POLICIES
+from declared_vpcs import declared_vpcs, VPC_SOURCES
+from scheduler import KindScheduler, EXECUTORS, SHARDINGS
+from unit_manifest import unit_manifest, ARCHIVE_SUFFIXES
+from pair_planner import STRATEGIES
+from config_loader import load_documents, load_file
+from config_snapshot import ConfigSnapshot, SNAPSHOT_FILE
+from reconciler import Reconciler, DEFAULT_DEBOUNCE
+from pipeline import StreamingPipeline
+from shard_planner import write_shard_plan
+import json
 
-def process_yaml_file(file_path, resource_type=None):
-    """Process a single YAML file and group resources by kind."""
-    # Load the YAML file
-    with open(file_path, 'r') as file:
-        resource_data = yaml.safe_load(file)
-
-    kind = resource_data.get("kind")
-    api_version = resource_data.get("apiVersion")
-
-    # Skip processing if the kind does not match the specified resource type
-    if resource_type and kind != resource_type:
-        print(f"Skipping file: {file_path}")
-        return
+API_VERSION = "trafficplatform.aws/v1"
 
-    # Extract required fields for the resource model
-    metadata = resource_data["metadata"]
-    spec = resource_data["spec"]
+def build_resource(document, file_path):
+    """Create the resource model instance for a parsed YAML document."""
+    kind = document.get("kind")
+    api_version = document.get("apiVersion")
 
     # Get the correct resource model class based on api_version and kind
-    if api_version not in RESOURCE_MODELS:
+    if not kind_registry.supports_api_version(api_version):
         print(f"Unsupported apiVersion: {api_version}")
-        return
+        return None
 
-    if kind not in RESOURCE_MODELS[api_version]:
+    if not kind_registry.supports(api_version, kind):
         print(f"Unsupported kind: {kind}")
+        return None
+
+    # Imports the kind's modules the first time one of its documents is loaded
+    resource_model_class = kind_registry.resource_class(api_version, kind)
+
+    # Extract required fields and initialize the resource model instance
+    metadata = document["metadata"]
+    spec = document["spec"]
+    return resource_model_class(api_version, kind, metadata, spec, os.path.relpath(file_path))
+
+
+def process_yaml_file(file_path, resource_type=None):
+    """Process a single YAML file and return its resources, one per document."""
+    _, documents = load_file(file_path, {resource_type} if resource_type else None)
+
+    # Skip processing if no document matches the specified resource type
+    if resource_type and not documents:
+        print(f"Skipping file: {file_path}")
+        return []
+
+    resources = (build_resource(document, file_path) for document in documents)
+    return [resource for resource in resources if resource is not None]
+
+
+def document_schema_errors(document):
+    """Return the schema errors of a parsed YAML document, or None if its kind is not supported."""
+    api_version = document.get("apiVersion")
+    kind = document.get("kind")
+    if not kind_registry.supports_api_version(api_version) or not kind_registry.supports(api_version, kind):
+        return None
+    schema_file = getattr(kind_registry.resource_class(api_version, kind), "SCHEMA_FILE", None)
+    if schema_file is None:
+        return None
+    # The layout BaseResource.to_dict validates
+    instance = {"apiVersion": api_version, "kind": kind, "metadata": document["metadata"], "spec": document["spec"]}
+    return schema_registry.validation_errors(schema_file, instance)
+
+
+def iter_documents(input_dir, kinds=None, jobs=0, snapshot=None):
+    """Yield (file_path, documents, schema errors) per file, through the config snapshot if there is one."""
+    if snapshot is not None:
+        yield from snapshot.load(input_dir, kinds, jobs)
         return
+    for file_path, documents in load_documents(input_dir, kinds, jobs):
+        yield file_path, documents, [None] * len(documents)
+
+
+def iter_resources(input_dir, resource_type=None, jobs=0, snapshot=None):
+    """Yield the resources of all YAML/YML files in the given directory for the specified resource type."""
+    kinds = {resource_type} if resource_type else None
+    for file_path, documents, errors in iter_documents(input_dir, kinds, jobs, snapshot):
+        if resource_type and not documents:
+            print(f"Skipping file: {file_path}")
+            continue
+
+        for document, schema_errors in zip(documents, errors):
+            resource = build_resource(document, file_path)
+            if resource is not None:
+                resource.schema_errors = schema_errors
+                yield resource
+
 
-    resource_model_class = RESOURCE_MODELS[api_version][kind]
+def process_directory(input_dir, resource_type=None, jobs=0, snapshot=None):
+    """Process all YAML/YML files in the given directory and group the resources by kind."""
+    resources_by_kind = {}
+    with metrics.stage("load"):
+        for resource in iter_resources(input_dir, resource_type, jobs, snapshot):
+            resources_by_kind.setdefault(resource.kind, []).append(resource)
+    for kind, resources in resources_by_kind.items():
+        metrics.count("resources_loaded", len(resources), kind=kind)
+    return resources_by_kind
 
-    # Initialize the resource model instance
-    resource_instance = resource_model_class(api_version, kind, metadata, spec)
 
-    # Add the resource instance to resources_by_kind
-    resources_by_kind[kind].append(resource_instance)
+def build_processor(kind, options_by_kind=None, api_version=API_VERSION):
+    """Return the processor factory of a kind, the processor class with its options bound."""
+    processor_class = kind_registry.processor_class(api_version, kind)
+    options = (options_by_kind or {}).get(kind)
+    return functools.partial(processor_class, **options) if options else processor_class
 
 
-def process_directory(input_dir, resource_type=None):
-    """Process all YAML/YML files in the given directory for the specified resource type."""
-    for root, _, files in os.walk(input_dir):
-        for file in files:
-            if file.endswith(".yaml") or file.endswith(".yml"):
-                file_path = os.path.join(root, file)
-                process_yaml_file(file_path, resource_type)
+def build_processors(kinds, options_by_kind=None, api_version=API_VERSION):
+    """
+    Return the processor factory of each kind, in name order.
+
+    Args:
+        kinds: Kinds to build processors for. Only their modules are imported.
+        options_by_kind (dict): Processor keyword arguments per kind.
+    """
+    return {kind: build_processor(kind, options_by_kind, api_version) for kind in sorted(kinds)}
+
+
+def configure_runtime(options):
+    """Apply the process-wide cache and registry settings. Also runs in each worker process."""
+    if options["template_cache_dir"]:
+        template_registry.configure(bytecode_cache_dir=options["template_cache_dir"])
+    tgw_registry.configure(policy=options["tgw_selection"])
+    declared_vpcs.configure(source=options["vpc_source"])
+    inventory_cache.configure(
+        ttl=options["inventory_ttl"], offline=options["offline"], refresh=options["refresh_inventory"]
+    )
+    client_pool.configure(rate=options["api_rate"], concurrency=options["api_concurrency"])
+    metrics.configure(enabled=options["metrics"])
+    unit_manifest.archiving = bool(options["output_archive"])
+
+
+def report_units(prune_orphans=False, changed_units_file=None):
+    """Save the unit manifest and report changed and orphaned units."""
+    report = unit_manifest.report()
+    for unit_path in report["removed"]:
+        if unit_path not in report["orphaned"]:
+            print(f"Removed: {os.path.dirname(unit_path)}")
+    if prune_orphans and report["orphaned"]:
+        unit_manifest.prune(report["orphaned"])
+        for unit_path in report["orphaned"]:
+            print(f"Pruned orphaned unit {os.path.dirname(unit_path)}")
+    # Units written to an archive are not below live/, so the manifest keeps describing live/
+    if not unit_manifest.archiving:
+        unit_manifest.save()
+
+    print(f"Units: {len(report['changed'])} changed, {report['unchanged']} unchanged, {len(report['orphaned'])} orphaned")
+    for unit_path in report["changed"]:
+        print(f"Changed: {os.path.dirname(unit_path)}")
+    if not prune_orphans:
+        for unit_path in report["orphaned"]:
+            print(f"Orphaned: {os.path.dirname(unit_path)}")
+
+    if changed_units_file:
+        with open(changed_units_file, "w") as file:
+            json.dump({
+                "changed": [os.path.dirname(unit_path) for unit_path in report["changed"]],
+                "orphaned": [os.path.dirname(unit_path) for unit_path in report["orphaned"]],
+                "removed": [os.path.dirname(unit_path) for unit_path in report["removed"]],
+                "pruned": prune_orphans,
+            }, file, indent=2)
+
+
+def report_run(args):
+    """Report the units of a run and export its metrics."""
+    report_units(args.prune_orphans, args.changed_units_file)
+    if args.shard_plan:
+        try:
+            write_shard_plan(args.shard_plan, args.shards, durations_file=args.plan_durations)
+        except (OSError, ValueError) as e:
+            print(f"Error planning shards: {e}")
+    if args.metrics_file:
+        metrics.write(args.metrics_file, args.metrics_format)
+
 
 def main():
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Process YAML files and group resources by kind.")
     parser.add_argument("--resource", type=str, help="Specify the resource type to process (e.g., CoreNetworkAttachment, VPC).")
+    parser.add_argument("--validate-only", action="store_true", help="Only schema-validate the resources and report every error.")
+    parser.add_argument("--template-cache-dir", type=str, help="Directory for the Jinja2 bytecode cache, reused across runs.")
+    parser.add_argument("--refresh-inventory", action="store_true", help="Ignore inventory snapshots and re-discover VPCs from AWS.")
+    parser.add_argument("--offline", action="store_true", help="Use the last inventory snapshots only, never calling AWS.")
+    parser.add_argument("--inventory-ttl", type=int, help="Seconds an inventory snapshot stays valid (default: 3600).")
+    parser.add_argument("--tgw-selection", choices=SELECTION_POLICIES, help="How to pick a Transit Gateway when several match a region (default: default).")
+    parser.add_argument("--vpc-source", choices=VPC_SOURCES, default="discover", help="Where attachments get their VPCs from: EC2, declared VPCs with saved Terraform outputs, or both (default: discover).")
+    parser.add_argument("--check-live-cidrs", action="store_true", help="Also check VPC CIDRs for overlaps with discovered live VPCs.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of (account, region) partitions to process concurrently.")
+    parser.add_argument("--executor", choices=EXECUTORS, default="thread", help="Run partitions on a thread or process pool (default: thread).")
+    parser.add_argument("--shard-by", choices=SHARDINGS, default="partition", help="Schedule one task per kind, account and region, or one per account covering all its kinds (default: partition).")
+    parser.add_argument("--output-archive", type=str, help="Write the units of the run to this .tar, .tar.gz, .tgz or .zip file instead of below live/.")
+    parser.add_argument("--force", action="store_true", help="Regenerate every unit, even if its inputs are unchanged.")
+    parser.add_argument("--prune-orphans", action="store_true", help="Delete units whose source config was removed, and reachability pairs that are no longer planned.")
+    parser.add_argument("--changed-units-file", type=str, help="Write the changed and orphaned units as JSON to this file.")
+    parser.add_argument("--load-jobs", type=int, default=0, help="Processes used to parse config files (default: one per CPU for large trees).")
+    parser.add_argument("--api-rate", type=float, help="Maximum EC2 requests per second per region (default: 20).")
+    parser.add_argument("--api-concurrency", type=int, help="Maximum concurrent EC2 requests per region (default: 8).")
+    parser.add_argument("--pair-strategy", choices=STRATEGIES, help="Reachability pair strategy for attachments without one in their spec (default: full_mesh).")
+    parser.add_argument("--watch", action="store_true", help="Keep running and regenerate units whenever files in config/ change.")
+    parser.add_argument("--poll-interval", type=float, help="With --watch, poll for changes at this interval instead of using inotify.")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE, help="With --watch, seconds to wait for further changes before reconciling.")
+    parser.add_argument("--shard-plan", type=str, help="Write a plan splitting the units into dependency-ordered waves of balanced CI shards to this file.")
+    parser.add_argument("--shards", type=int, default=1, help="With --shard-plan, number of parallel CI workers (default: 1).")
+    parser.add_argument("--plan-durations", type=str, help="With --shard-plan, JSON file of recorded plan durations per unit to balance shards by.")
+    parser.add_argument("--metrics-file", type=str, help="Write stage latencies and unit, resource and AWS API counters to this file.")
+    parser.add_argument("--metrics-format", choices=METRICS_FORMATS, default="jsonl", help="Format of --metrics-file: JSON lines or OpenMetrics text (default: jsonl).")
+    parser.add_argument("--profile", type=str, help="Write cProfile stats of the run to this file, for pstats or snakeviz.")
+    parser.add_argument("--stream", action="store_true", help="Process resources as they are loaded with bounded memory, instead of loading every resource first.")
+    parser.add_argument("--config-snapshot", type=str, nargs="?", const=SNAPSHOT_FILE, help=f"Load config/ through a compiled snapshot, re-parsing and re-validating only changed files (default file: {SNAPSHOT_FILE}).")
     args = parser.parse_args()
 
+    if args.refresh_inventory and args.offline:
+        parser.error("--refresh-inventory and --offline are mutually exclusive")
+    if args.stream and (args.validate_only or args.watch):
+        parser.error("--stream cannot be combined with --validate-only or --watch")
+    if args.stream and args.config_snapshot:
+        parser.error("--stream cannot be combined with --config-snapshot, which holds every document in memory")
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if args.output_archive:
+        if not args.output_archive.endswith(ARCHIVE_SUFFIXES):
+            parser.error(f"--output-archive must end with one of {', '.join(ARCHIVE_SUFFIXES)}")
+        if args.validate_only or args.watch or args.prune_orphans or args.shard_plan:
+            parser.error("--output-archive cannot be combined with --validate-only, --watch, --prune-orphans or --shard-plan")
+
+    if not args.profile:
+        run(args)
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        run(args)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print(f"Wrote profile to {args.profile}")
+
+
+def run(args):
+    """Generate the units for parsed command-line arguments."""
+    runtime_options = {
+        "template_cache_dir": args.template_cache_dir,
+        "tgw_selection": args.tgw_selection,
+        "vpc_source": args.vpc_source,
+        "inventory_ttl": args.inventory_ttl,
+        "offline": args.offline,
+        "refresh_inventory": args.refresh_inventory,
+        "api_rate": args.api_rate,
+        "api_concurrency": args.api_concurrency,
+        "metrics": bool(args.metrics_file),
+        "output_archive": args.output_archive,
+    }
+    configure_runtime(runtime_options)
+
     current_dir = os.getcwd()
     input_dir = os.path.join(current_dir, "config")
 
+    options_by_kind = {
+        "VPC": {"include_live_cidrs": args.check_live_cidrs},
+        "CoreNetworkAttachment": {"pair_strategy": args.pair_strategy, "prune_pairs": args.prune_orphans},
+    }
+    unit_manifest.force = args.force
+    if args.output_archive:
+        unit_manifest.open_archive(args.output_archive)
+
     print(f"Processing resource type '{args.resource}'")
-    # Process all YAML/YML files in the directory for the specified resource type
-    process_directory(input_dir, args.resource)
+    if args.stream:
+        # Only the kinds that depend on other kinds are held in memory, for the scheduler below
+        pipeline = StreamingPipeline(functools.partial(build_processor, options_by_kind=options_by_kind))
+        with metrics.stage("stream"):
+            resources_by_kind = pipeline.run(iter_resources(input_dir, args.resource, args.load_jobs))
+    else:
+        # Process all YAML/YML files in the directory for the specified resource type
+        snapshot = ConfigSnapshot(args.config_snapshot, document_schema_errors) if args.config_snapshot else None
+        resources_by_kind = process_directory(input_dir, args.resource, args.load_jobs, snapshot)
+
+    if args.validate_only:
+        failed = 0
+        for kind, processor_class in build_processors(resources_by_kind).items():
+            with metrics.stage("validate", kind=kind):
+                report = processor_class(resources_by_kind[kind]).validate_batch()
+            report.print_report()
+            failed += report.failed
+        if args.metrics_file:
+            metrics.write(args.metrics_file, args.metrics_format)
+        raise SystemExit(1 if failed else 0)
+
+    # Process resources for each kind using the corresponding processors, in dependency order
+    # Only kinds that were loaded are imported, except in watch mode where any kind may appear later
+    kinds = kind_registry.kinds(API_VERSION) if args.watch else resources_by_kind
+    processors = build_processors(kinds, options_by_kind)
+    scheduler = KindScheduler(
+        processors,
+        jobs=args.jobs,
+        executor=args.executor,
+        initializer=configure_runtime,
+        initargs=(runtime_options,),
+        shard_by=args.shard_by,
+    )
+    if args.watch:
+        reconciler = Reconciler(
+            input_dir,
+            scheduler,
+            load_file=functools.partial(process_yaml_file, resource_type=args.resource),
+            report=functools.partial(report_run, args),
+            debounce=args.debounce,
+            poll_interval=args.poll_interval,
+        )
+        reconciler.run(resources_by_kind)
+        return
 
-    # Process resources for each kind using the corresponding processors
-    if resources_by_kind["CoreNetworkAttachment"]:
-        core_network_attachment_processor = CoreNetworkAttachmentProcessor(resources_by_kind["CoreNetworkAttachment"])
-        core_network_attachment_processor.process()
+    scheduler.run(resources_by_kind)
+    if args.output_archive:
+        archived = len(unit_manifest.archive.names)
+        print(f"Wrote {archived} units to {unit_manifest.close_archive()}")
 
-    if resources_by_kind["VPC"]:
-        vpc_processor = VPCProcessor(resources_by_kind["VPC"])
-        vpc_processor.process()
+    report_run(args)
+    inventory_cache.print_stats()
+    client_pool.print_stats()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
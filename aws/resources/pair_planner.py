@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+from unit_manifest import atomic_write, context_hash
+
+STRATEGIES = ("full_mesh", "hub_spoke", "sampled", "changed", "model")
+DEFAULT_SAMPLE_SIZE = 2
+
+
+def vpc_label(vpc):
+    """Name used for a VPC in pair directory names."""
+    return vpc.get("vpc_name") or vpc["vpc_id"]
+
+
+def pair_name(source_vpc, target_vpc):
+    return f"{vpc_label(source_vpc)}_to_{vpc_label(target_vpc)}"
+
+
+def vpc_fingerprint(vpc):
+    """Hash of the discovered attributes of a VPC that affect its reachability."""
+    return context_hash({key: vpc.get(key) for key in ("vpc_id", "vpc_name", "cidr_block", "subnet_ids", "route_table_ids", "tgw_routes")})
+
+
+class PairState:
+    """
+    What the planner generated last time for one account and region, stored next to
+    the pair units in live/<account>/ReachabilityAnalyzer/.pairs-<region>.json.
+    """
+
+    def __init__(self, analyzer_dir, region):
+        self.analyzer_dir = analyzer_dir
+        self.path = os.path.join(analyzer_dir, f".pairs-{region}.json")
+        self.vpcs = {}
+        self.pairs = None
+        self.verdicts = None
+        try:
+            with open(self.path, 'r') as state_file:
+                state = json.load(state_file)
+            self.vpcs = state.get("vpcs", {})
+            self.pairs = set(state.get("pairs", []))
+            self.verdicts = state.get("verdicts")
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            print(f"Ignoring unreadable pair state {self.path}: {e}")
+
+    def existing_pairs(self, vpcs):
+        """
+        Return the pair units of this region that exist on disk. Without a recorded state,
+        units whose both VPC names belong to the given VPCs are adopted.
+        """
+        if not os.path.isdir(self.analyzer_dir):
+            return set()
+        on_disk = {
+            name for name in os.listdir(self.analyzer_dir)
+            if os.path.isfile(os.path.join(self.analyzer_dir, name, "terragrunt.hcl"))
+        }
+        if self.pairs is not None:
+            return on_disk & self.pairs
+
+        labels = {vpc_label(vpc) for vpc in vpcs}
+        return {name for name in on_disk if all(part in labels for part in name.split("_to_", 1))}
+
+    def save(self, vpcs, pairs, verdicts=None):
+        state = {
+            "vpcs": {vpc["vpc_id"]: vpc_fingerprint(vpc) for vpc in vpcs},
+            "pairs": sorted(pairs),
+        }
+        if verdicts is not None:
+            state["verdicts"] = dict(sorted(verdicts.items()))
+        atomic_write(self.path, json.dumps(state, indent=2) + "\n")
+
+
+class PairPlanner:
+    """
+    Choose which ordered VPC pairs get a Reachability Analyzer unit.
+
+    Strategies:
+    - full_mesh: every ordered pair, N*(N-1) units
+    - hub_spoke: both directions between each probe VPC and every other VPC
+    - sampled:   per region and environment, each VPC probes its successor in a ring
+                 (so every VPC is covered as source and target) plus up to
+                 `sample_size - 1` further targets picked by a stable hash
+    - changed:   pairs involving VPCs added or changed since the last run; other
+                 existing pairs are kept as they are
+    - model:     pairs the offline route model (route_graph.RouteModel) does not expect
+                 to be reachable, pairs of VPCs added or changed since the last run, and
+                 pairs that became reachable; pairs that stay reachable get no unit
+    """
+
+    def __init__(self, strategy="full_mesh", probe_vpcs=(), sample_size=DEFAULT_SAMPLE_SIZE):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown reachability strategy: {strategy}")
+        self.strategy = strategy
+        self.probe_vpcs = set(probe_vpcs)
+        self.sample_size = max(1, sample_size)
+        self.verdicts = None  # Route model verdicts of the unreachable pairs, set by the 'model' strategy
+        self.undecided = None  # Why the last plan() could not decide which pairs to keep, if it could not
+
+    @classmethod
+    def from_spec(cls, settings, default_strategy=None):
+        """Build a planner from a CoreNetworkAttachment `reachability` spec block."""
+        settings = settings or {}
+        return cls(
+            strategy=settings.get("strategy") or default_strategy or "full_mesh",
+            probe_vpcs=settings.get("probe_vpcs", ()),
+            sample_size=settings.get("sample_size", DEFAULT_SAMPLE_SIZE),
+        )
+
+    def plan(self, vpcs, state=None, model=None):
+        """
+        Return the planned pairs as an ordered dict of pair name to (source_vpc, target_vpc).
+        The 'model' strategy needs the RouteModel of the VPCs, and plans the full mesh without it.
+        When the inputs of the strategy are missing, no pairs are planned and `undecided` says why:
+        the existing pairs are then neither confirmed nor stale.
+        """
+        vpcs = sorted(vpcs, key=vpc_label)
+        self.undecided = None
+        if not vpcs:
+            self.undecided = "no VPCs were discovered"
+            pairs = []
+        elif self.strategy == "hub_spoke":
+            pairs = self._hub_spoke(vpcs)
+        elif self.strategy == "sampled":
+            pairs = self._sampled(vpcs)
+        elif self.strategy == "changed":
+            pairs = self._changed(vpcs, state)
+        elif self.strategy == "model" and model is not None:
+            pairs = self._modelled(vpcs, state, model)
+        else:
+            pairs = self._full_mesh(vpcs)
+        return {pair_name(source, target): (source, target) for source, target in pairs}
+
+    def keep_existing(self, existing, vpcs):
+        """
+        Return the existing pairs the 'changed' strategy leaves in place, those whose both
+        VPCs still exist, as a dict of pair name to (source_vpc, target_vpc).
+        """
+        if self.strategy != "changed":
+            return {}
+        by_label = {vpc_label(vpc): vpc for vpc in vpcs}
+        kept = {}
+        for name in sorted(existing):
+            source, _, target = name.partition("_to_")
+            if source in by_label and target in by_label:
+                kept[name] = (by_label[source], by_label[target])
+        return kept
+
+    def _full_mesh(self, vpcs):
+        return [(source, target) for source in vpcs for target in vpcs if source["vpc_id"] != target["vpc_id"]]
+
+    def _hub_spoke(self, vpcs):
+        hubs = [vpc for vpc in vpcs if vpc["vpc_id"] in self.probe_vpcs or vpc_label(vpc) in self.probe_vpcs]
+        if not hubs:
+            self.undecided = "no probe VPCs found for the hub_spoke strategy"
+        pairs = []
+        for hub in hubs:
+            for vpc in vpcs:
+                if vpc["vpc_id"] != hub["vpc_id"]:
+                    pairs.append((hub, vpc))
+                    if vpc not in hubs:
+                        pairs.append((vpc, hub))
+        return pairs
+
+    def _sampled(self, vpcs):
+        groups = {}
+        for vpc in vpcs:
+            groups.setdefault((vpc.get("region"), vpc.get("environment")), []).append(vpc)
+
+        pairs = []
+        for group in groups.values():
+            if len(group) < 2:
+                continue
+            for index, source in enumerate(group):
+                ring_target = group[(index + 1) % len(group)]
+                others = [vpc for vpc in group if vpc is not source and vpc is not ring_target]
+                others.sort(key=lambda target: hashlib.sha256(
+                    f"{source['vpc_id']}:{target['vpc_id']}".encode()).hexdigest())
+                for target in [ring_target] + others[:self.sample_size - 1]:
+                    pairs.append((source, target))
+        return pairs
+
+    def _changed_vpc_ids(self, vpcs, state):
+        previous = state.vpcs if state else {}
+        return {vpc["vpc_id"] for vpc in vpcs if previous.get(vpc["vpc_id"]) != vpc_fingerprint(vpc)}
+
+    def _changed(self, vpcs, state):
+        changed = self._changed_vpc_ids(vpcs, state)
+        return [
+            (source, target) for source, target in self._full_mesh(vpcs)
+            if source["vpc_id"] in changed or target["vpc_id"] in changed
+        ]
+
+    def _modelled(self, vpcs, state, model):
+        self.verdicts = {}
+        pairs = {}
+        for source, target, verdict in model.unreachable():
+            name = pair_name(source, target)
+            self.verdicts[name] = verdict
+            pairs[name] = (source, target)
+
+        if state is None or state.verdicts is None:
+            # Nothing to compare with, verify every pair once
+            return self._full_mesh(vpcs)
+
+        # Pairs of added or changed VPCs
+        changed = self._changed_vpc_ids(vpcs, state)
+        for vpc in vpcs:
+            if vpc["vpc_id"] not in changed:
+                continue
+            for other in vpcs:
+                if other["vpc_id"] != vpc["vpc_id"]:
+                    pairs.setdefault(pair_name(vpc, other), (vpc, other))
+                    pairs.setdefault(pair_name(other, vpc), (other, vpc))
+
+        # Pairs that were not reachable last time and are now
+        by_label = {vpc_label(vpc): vpc for vpc in vpcs}
+        for name in state.verdicts:
+            source, _, target = name.partition("_to_")
+            if name not in pairs and source in by_label and target in by_label:
+                pairs[name] = (by_label[source], by_label[target])
+
+        return [pairs[name] for name in sorted(pairs)]
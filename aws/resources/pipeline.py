@@ -0,0 +1,71 @@
+from instrumentation import metrics
+from scheduler import depends_on
+
+
+class StreamingPipeline:
+    """
+    Process resources one at a time as they are loaded, instead of grouping every resource
+    of a kind in memory first.
+
+    Resources are pulled from a generator, so the config loader only parses ahead as far
+    as its bounded window of in-flight batches. Each resource is admitted, validated,
+    rendered and written, then dropped. Per kind only one processor instance lives for
+    the whole run, holding the compact cross-resource state its admit() checks against
+    (names, CIDR index). Kinds that depend on other kinds (DEPENDS_ON) need the resources
+    they depend on to be processed first and may work on the whole kind at once, so they
+    are collected and returned for the KindScheduler.
+    """
+
+    def __init__(self, processor_factory):
+        """
+        Args:
+            processor_factory: Returns the processor factory of a kind, called once per kind.
+        """
+        self.processor_factory = processor_factory
+        self.failed = 0
+
+    def run(self, resources):
+        """
+        Stream resources through their processors.
+
+        Args:
+            resources: Iterable of resources, typically streamed from the config loader.
+
+        Returns:
+            dict: The resources of the deferred kinds, grouped by kind.
+        """
+        factories = {}
+        processors = {}
+        deferred = {}
+        for resource in resources:
+            kind = resource.kind
+            metrics.count("resources_loaded", kind=kind)
+            if kind not in factories:
+                factories[kind] = self.processor_factory(kind)
+            if depends_on(factories[kind]):
+                deferred.setdefault(kind, []).append(resource)
+                continue
+
+            processor = processors.get(kind)
+            if processor is None:
+                processor = processors[kind] = factories[kind]([])
+            self.process(processor, resource)
+        return deferred
+
+    def process(self, processor, resource):
+        """Admit and process one resource. Returns True on success."""
+        resource_name = resource.metadata["name"]
+        account_id = resource.spec.get("account_id")
+        if not processor.admit(resource):
+            print(f"Rejected {resource.kind} {resource_name}")
+            metrics.count("resources_failed", kind=resource.kind, account=account_id, reason="admission")
+            self.failed += 1
+            return False
+        try:
+            processor.process_resource(resource)
+        except Exception as e:
+            print(f"Error processing {resource.kind} {resource_name}: {e}")
+            metrics.count("resources_failed", kind=resource.kind, account=account_id, reason="error")
+            self.failed += 1
+            return False
+        return True
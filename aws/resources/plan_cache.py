@@ -0,0 +1,264 @@
+"""
+Skip planning units that cannot have changed since their last no-op plan.
+
+Every unit below live/ gets a fingerprint of what its plan depends on: its rendered
+terragrunt.hcl, the source tree of the terraform-modules/* module it references and its
+.terraform.lock.hcl. The index (live/.plan-cache.json) keeps the fingerprints whose last
+plan was a no-op. `select` lists the units to plan, those without a matching fingerprint,
+and `record` updates the index from the plans of the selected units. A full plan of every
+unit is selected with --full, or when --full-every seconds passed since the last one, to
+catch changes made outside of Terraform. Run from the `aws` folder:
+
+    python3 resources/plan_cache.py select --full-every 86400 --output plan-selection.json --args-output plan-args.txt
+    terragrunt run-all plan --terragrunt-working-dir=live/acc1/VPC --terragrunt-json-out-dir=output $(cat plan-args.txt)
+    python3 resources/plan_cache.py record --selection plan-selection.json live/acc1/VPC/output
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from plan_guard import iter_plan_files, iter_resource_changes
+from shard_planner import SKIPPED_DIRS, UNIT_FILE, iter_units
+from unit_manifest import atomic_write
+
+INDEX_FILE = "live/.plan-cache.json"
+INDEX_VERSION = 1
+
+LOCK_FILE = ".terraform.lock.hcl"
+
+# Resource change actions that leave the infrastructure as it is
+NO_OP_ACTIONS = {"no-op", "read"}
+
+SOURCE_PATTERN = re.compile(r'\bterraform\s*\{[^}]*?\bsource\s*=\s*"([^"]*)"')
+
+
+def file_digest(path):
+    """Return the sha256 of a file, or None if it does not exist."""
+    try:
+        with open(path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class UnitFingerprinter:
+    """
+    Fingerprint units from the files their plan depends on.
+
+    Module trees are hashed once per run, however many units reference them.
+    """
+
+    def __init__(self):
+        self._modules = {}
+
+    def module_digest(self, unit_dir, source):
+        """
+        Return the digest of the module a unit's `source` points to. Local sources are
+        hashed by content, including every file below the module directory. Remote
+        sources (git::, registry) are pinned by their address, so the address is used.
+        """
+        if "::" in source or "://" in source:
+            return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+        # `path//subdir` selects a module inside the downloaded tree
+        module_dir = os.path.normpath(os.path.join(unit_dir, source.replace("//", "/")))
+        digest = self._modules.get(module_dir)
+        if digest is None:
+            digest = self._modules[module_dir] = self.tree_digest(module_dir)
+        return digest
+
+    @staticmethod
+    def tree_digest(directory):
+        """Return the digest of the relative paths and contents of every file below a directory."""
+        tree = hashlib.sha256()
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+            for file in sorted(files):
+                path = os.path.join(root, file)
+                tree.update(os.path.relpath(path, directory).encode("utf-8"))
+                tree.update(b"\0")
+                tree.update((file_digest(path) or "").encode("ascii"))
+        return tree.hexdigest()
+
+    def fingerprint(self, unit_dir):
+        """Return the fingerprint of a unit directory."""
+        with open(os.path.join(unit_dir, UNIT_FILE), 'rb') as unit_file:
+            content = unit_file.read()
+        match = SOURCE_PATTERN.search(content.decode("utf-8", "replace"))
+        module = self.module_digest(unit_dir, match.group(1)) if match else ""
+        lock = file_digest(os.path.join(unit_dir, LOCK_FILE)) or ""
+        return hashlib.sha256(
+            b"\0".join((hashlib.sha256(content).hexdigest().encode("ascii"), module.encode("ascii"), lock.encode("ascii")))
+        ).hexdigest()
+
+
+def is_no_op(plan_file):
+    """Return True if a plan JSON changes no resource. Unreadable plans count as changes."""
+    try:
+        return all(
+            set(change.get("change", {}).get("actions", [])) <= NO_OP_ACTIONS
+            for change in iter_resource_changes(plan_file)
+        )
+    except (OSError, ValueError) as e:
+        print(f"Unreadable plan {plan_file}: {e}")
+        return False
+
+
+class PlanCache:
+    """
+    Index of the units whose last plan was a no-op, by fingerprint.
+
+    Args:
+        index_file (str): Where the index is kept between runs, e.g. in a CI cache.
+    """
+
+    def __init__(self, index_file=INDEX_FILE):
+        self.index_file = index_file
+        self.units = {}
+        self.last_full = None
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_file, 'r') as index:
+                data = json.load(index)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable plan cache {self.index_file}: {e}")
+            return
+        if data.get("version") != INDEX_VERSION:
+            print(f"Ignoring plan cache {self.index_file} of version {data.get('version')}")
+            return
+        self.units = data.get("units", {})
+        self.last_full = data.get("last_full")
+
+    def save(self):
+        data = {"version": INDEX_VERSION, "last_full": self.last_full, "units": dict(sorted(self.units.items()))}
+        atomic_write(self.index_file, json.dumps(data, indent=2) + "\n")
+
+    def full_due(self, full_every, now):
+        """Return True if a full plan is due, full_every seconds after the last one."""
+        return full_every is not None and (self.last_full is None or now - self.last_full >= full_every)
+
+    def select(self, live_dir="live", full=False, full_every=None, now=None):
+        """
+        Select the units to plan.
+
+        Args:
+            live_dir (str): Directory holding the units.
+            full (bool): Plan every unit.
+            full_every (float): Seconds between scheduled full plans, None for no schedule.
+            now (float): Current time, defaults to time.time().
+
+        Returns:
+            dict: {"generated_at", "full", "include", "exclude", "fingerprints"}, with the
+                fingerprints of the included units for `record`.
+        """
+        now = time.time() if now is None else now
+        full = full or self.full_due(full_every, now)
+        fingerprinter = UnitFingerprinter()
+        include = []
+        exclude = []
+        fingerprints = {}
+        for unit_dir in iter_units(live_dir):
+            fingerprint = fingerprinter.fingerprint(unit_dir)
+            if not full and self.units.get(unit_dir) == fingerprint:
+                exclude.append(unit_dir)
+                continue
+            include.append(unit_dir)
+            fingerprints[unit_dir] = fingerprint
+        return {"generated_at": now, "full": full, "include": include, "exclude": exclude, "fingerprints": fingerprints}
+
+    def record(self, selection, plan_dirs):
+        """
+        Update the index from the plans of the selected units.
+
+        Plans are looked up as terragrunt's --terragrunt-json-out-dir writes them: the
+        plan of unit <working dir>/<path> is <working dir>/<output>/<path>/*.json, with
+        each plan directory directly below its working dir. A selected unit is indexed
+        when its plan is a no-op and dropped when it changes anything or has no plan.
+
+        Returns:
+            tuple: (no_op, changed) unit counts.
+        """
+        no_op_units = set()
+        changed_units = set()
+        for plan_dir in plan_dirs:
+            working_dir = os.path.dirname(os.path.normpath(plan_dir))
+            for plan_file in iter_plan_files([plan_dir]):
+                unit_dir = os.path.normpath(os.path.join(working_dir, os.path.relpath(os.path.dirname(plan_file), plan_dir)))
+                if unit_dir not in selection["fingerprints"]:
+                    print(f"Ignoring plan {plan_file}: {unit_dir} was not selected")
+                    continue
+                if is_no_op(plan_file):
+                    no_op_units.add(unit_dir)
+                else:
+                    changed_units.add(unit_dir)
+
+        for unit_dir, fingerprint in selection["fingerprints"].items():
+            if unit_dir in no_op_units and unit_dir not in changed_units:
+                self.units[unit_dir] = fingerprint
+            else:
+                self.units.pop(unit_dir, None)
+        # Drift found by a full plan shows up as changed units, the schedule restarts all the same
+        if selection["full"]:
+            self.last_full = selection["generated_at"]
+        return len(no_op_units - changed_units), len(changed_units)
+
+
+def terragrunt_args(include):
+    """Return the terragrunt flags that restrict run-all to the included units."""
+    args = ["--terragrunt-strict-include"]
+    for unit_dir in include:
+        args += ["--terragrunt-include-dir", os.path.abspath(unit_dir)]
+    return args
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skip planning units that cannot have changed since their last no-op plan.")
+    parser.add_argument("--index", type=str, default=INDEX_FILE, help=f"Plan cache index file (default: {INDEX_FILE}).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    select = commands.add_parser("select", help="List the units to plan and the units to skip.")
+    select.add_argument("--live-dir", type=str, default="live", help="Directory holding the units (default: live).")
+    select.add_argument("--full", action="store_true", help="Plan every unit.")
+    select.add_argument("--full-every", type=float, help="Plan every unit when this many seconds passed since the last full plan.")
+    select.add_argument("--output", type=str, default="plan-selection.json", help="File to write the selection to (default: plan-selection.json).")
+    select.add_argument("--args-output", type=str, help="Also write the terragrunt include flags of the selection to this file.")
+
+    record = commands.add_parser("record", help="Index the units whose plans were no-ops.")
+    record.add_argument("--selection", type=str, default="plan-selection.json", help="Selection the plans were made from (default: plan-selection.json).")
+    record.add_argument("plan_dirs", nargs="+", help="terragrunt JSON plan output directories, e.g. live/acc1/VPC/output.")
+    args = parser.parse_args()
+
+    cache = PlanCache(args.index)
+    if args.command == "select":
+        selection = cache.select(args.live_dir, args.full, args.full_every)
+        with open(args.output, 'w') as output:
+            json.dump(selection, output, indent=2)
+            output.write("\n")
+        if args.args_output:
+            with open(args.args_output, 'w') as output:
+                output.write(" ".join(terragrunt_args(selection["include"])) + "\n")
+        mode = "full" if selection["full"] else "incremental"
+        print(
+            f"Plan selection ({mode}): {len(selection['include'])} units to plan, "
+            f"{len(selection['exclude'])} skipped, written to {args.output}"
+        )
+        return 0
+
+    with open(args.selection, 'r') as selection_file:
+        selection = json.load(selection_file)
+    no_op, changed = cache.record(selection, args.plan_dirs)
+    cache.save()
+    missing = len(selection["fingerprints"]) - no_op - changed
+    print(f"Plan cache: {no_op} no-op units indexed, {changed} with changes, {missing} without a plan")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
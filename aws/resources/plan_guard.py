@@ -0,0 +1,262 @@
+"""
+Check Terraform plan JSON files for destructive changes.
+
+Native replacement for running `conftest test` with policy/deny_delete.rego once per
+plan file. Plan files are streamed: only `resource_changes` is decoded, one element at
+a time, so memory stays flat however large `planned_values` or `prior_state` are.
+Run from the `aws` folder:
+
+    python3 resources/plan_guard.py live/acc1/VPC/output live/acc1/TransitGateway/output
+"""
+import argparse
+import codecs
+import json
+import mmap
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+CHUNK_SIZE = 1 << 20
+
+# Below this many plan files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 64
+
+# Top-level keys, scalar values, and runs of strings and other non-bracket content.
+# Strings are matched with an unrolled loop, much faster than an alternation per character.
+KEY_PATTERN = re.compile(rb'\s*,?\s*("[^"\\]*(?:\\.[^"\\]*)*")\s*:\s*')
+SCALAR_PATTERN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[^,}\]\s]*')
+SKIP_PATTERN = re.compile(rb'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+OBJECT_START = re.compile(rb'\s*\{')
+OBJECT_END = re.compile(rb'\s*\}')
+RESOURCE_CHANGES_KEY = b'"resource_changes"'
+SEPARATOR_PATTERN = re.compile(r'[\s,]*')
+
+DENY = "deny"
+WARN = "warn"
+
+SKIPPED_DIRS = {".terraform", ".terragrunt-cache"}
+
+
+class PlanRule:
+    """
+    A rule on the actions of a resource change.
+
+    Args:
+        name (str): Rule name used in reports.
+        matches (callable): Takes the list of change actions and returns True on a violation.
+        message (str): Message format, filled in with the resource address.
+        severity (str): DENY fails the check, WARN is only reported.
+    """
+
+    def __init__(self, name, matches, message, severity=DENY):
+        self.name = name
+        self.matches = matches
+        self.message = message
+        self.severity = severity
+
+
+def is_replace(actions):
+    return "delete" in actions and "create" in actions
+
+
+def is_delete(actions):
+    return "delete" in actions and "create" not in actions
+
+
+def is_forget(actions):
+    return "forget" in actions
+
+
+DEFAULT_RULES = (
+    PlanRule("replace", is_replace, "Replace operation detected for resource: {address}"),
+    # Same message as policy/deny_delete.rego
+    PlanRule("delete", is_delete, "Delete operation detected for resource: {address}"),
+    PlanRule("forget", is_forget, "Resource removed from state: {address}", WARN),
+)
+
+
+def skip_value(content, position):
+    """
+    Return the offset just after the JSON value starting at `position`, without decoding it.
+    Strings and everything between brackets are skipped by a regular expression, so Python
+    only steps through the brackets.
+    """
+    if content[position:position + 1] not in (b"{", b"["):
+        return SCALAR_PATTERN.match(content, position).end()
+
+    depth = 0
+    while True:
+        position = SKIP_PATTERN.match(content, position).end()
+        if position >= len(content) or content[position] == 0x22:  # '"'
+            raise ValueError("Truncated JSON value")
+        depth += 1 if content[position] in b"{[" else -1
+        position += 1
+        if depth == 0:
+            return position
+
+
+def find_resource_changes(content):
+    """
+    Return the offset just after the opening bracket of the top-level `resource_changes`
+    array, or None if the plan has none. Other top-level values are skipped undecoded.
+    """
+    start = OBJECT_START.match(content)
+    if not start:
+        raise ValueError("Not a JSON plan object")
+
+    position = start.end()
+    while True:
+        key = KEY_PATTERN.match(content, position)
+        if not key:
+            if OBJECT_END.match(content, position):
+                return None
+            raise ValueError("Not a JSON plan object")
+        position = key.end()
+        if key.group(1) == RESOURCE_CHANGES_KEY:
+            if content[position:position + 1] == b"[":
+                return position + 1
+            return None
+        position = skip_value(content, position)
+
+
+def iter_resource_changes(file_path):
+    """Yield the elements of a plan file's `resource_changes` one at a time."""
+    with open(file_path, 'rb') as plan_file:
+        if os.fstat(plan_file.fileno()).st_size == 0:
+            raise ValueError("Empty plan file")
+        with mmap.mmap(plan_file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            start = find_resource_changes(content)
+        if start is None:
+            return
+
+        plan_file.seek(start)
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        buffer, index, read_size, eof = "", 0, CHUNK_SIZE, False
+        while True:
+            index = SEPARATOR_PATTERN.match(buffer, index).end()
+            if index < len(buffer) and buffer[index] == "]":
+                return
+            try:
+                if index == len(buffer):
+                    raise ValueError("end of buffer")
+                element, index = decoder.raw_decode(buffer, index)
+            except ValueError:
+                # Element cut off at the end of the buffer: read more, doubling for large elements
+                if eof:
+                    raise ValueError(f"Truncated resource_changes in {file_path}")
+                data = plan_file.read(read_size)
+                eof = not data
+                buffer = buffer[index:] + utf8.decode(data, final=eof)
+                index = 0
+                read_size *= 2
+                continue
+            read_size = CHUNK_SIZE
+            yield element
+
+
+def check_plan(file_path, rules=DEFAULT_RULES, allowed_types=()):
+    """
+    Evaluate the rules against every resource change of a plan file.
+
+    Args:
+        file_path (str): The plan JSON file.
+        rules: PlanRules to evaluate.
+        allowed_types: Resource types whose violations are downgraded to warnings.
+
+    Returns:
+        dict: {"path", "resources", "violations": [(severity, rule, address, message)], "error"}
+    """
+    result = {"path": file_path, "resources": 0, "violations": [], "error": None}
+    try:
+        for change in iter_resource_changes(file_path):
+            result["resources"] += 1
+            actions = change.get("change", {}).get("actions", [])
+            address = change.get("address", "<unknown>")
+            for rule in rules:
+                if rule.matches(actions):
+                    severity = WARN if change.get("type") in allowed_types else rule.severity
+                    result["violations"].append((severity, rule.name, address, rule.message.format(address=address)))
+    except (OSError, ValueError) as e:
+        result["error"] = str(e)
+    return result
+
+
+def iter_plan_files(paths):
+    """Yield plan JSON files from files and directories, in a stable order."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+            for file in sorted(files):
+                if file.endswith(".json") and not file.startswith("."):
+                    yield os.path.join(root, file)
+
+
+def check_plans(paths, jobs=0, allowed_types=()):
+    """
+    Check every plan file below the given paths, in a process pool when there are many.
+
+    Args:
+        paths: Plan files or directories such as live/acc1/VPC/output.
+        jobs (int): Worker processes. 0 picks one per CPU when there are enough files, 1 is serial.
+        allowed_types: Resource types whose violations are downgraded to warnings.
+
+    Returns:
+        list: check_plan results in file order.
+    """
+    files = list(iter_plan_files(paths))
+    if jobs == 0:
+        jobs = (os.cpu_count() or 1) if len(files) >= PARALLEL_THRESHOLD else 1
+
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            chunksize = max(1, len(files) // (jobs * 8))
+            return list(pool.map(check_plan, files, [DEFAULT_RULES] * len(files),
+                                 [tuple(allowed_types)] * len(files), chunksize=chunksize))
+    return [check_plan(file_path, DEFAULT_RULES, allowed_types) for file_path in files]
+
+
+def print_report(results):
+    """Print every violation and a summary. Returns the exit code: 1 on any denial or error."""
+    denied = warned = errors = resources = 0
+    for result in results:
+        resources += result["resources"]
+        if result["error"]:
+            errors += 1
+            print(f"ERROR {result['path']}: {result['error']}")
+        for severity, rule, address, message in result["violations"]:
+            if severity == DENY:
+                denied += 1
+            else:
+                warned += 1
+            print(f"{severity.upper()} {result['path']}: {message}")
+
+    print(
+        f"Plan guard: {len(results)} plans, {resources} resource changes, "
+        f"{denied} denied, {warned} warnings, {errors} errors"
+    )
+    return 1 if denied or errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check Terraform plan JSON files for destructive changes.")
+    parser.add_argument("paths", nargs="+", help="Plan JSON files or directories, e.g. live/acc1/VPC/output.")
+    parser.add_argument("--jobs", type=int, default=0, help="Worker processes (default: one per CPU for large scans).")
+    parser.add_argument("--allow-type", action="append", default=[],
+                        help="Resource type whose deletes and replacements are only warnings. Repeatable.")
+    parser.add_argument("--report", type=str, help="Also write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    results = check_plans(args.paths, jobs=args.jobs, allowed_types=tuple(args.allow_type))
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(results, report_file, indent=2)
+    return print_report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from config_loader import iter_config_files
+from declared_vpcs import declared_vpcs
+from scheduler import partition_key
+from tgw_registry import tgw_registry
+from unit_manifest import unit_manifest
+
+DEFAULT_DEBOUNCE = 0.5  # Seconds without further changes before reconciling
+MAX_BATCH_SECONDS = 5.0  # Reconcile a continuous burst of changes at least this often
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_config_file(path):
+    return path.endswith(".yaml") or path.endswith(".yml")
+
+
+class InotifyWatcher:
+    """
+    Watch a directory tree for changed YAML files with Linux inotify, through libc.
+
+    Raises:
+        OSError: If inotify is not available, e.g. on macOS.
+    """
+
+    def __init__(self, directory):
+        libc_name = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        for root, _, _ in os.walk(directory):
+            self._add_watch(root)
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self._dirs[wd] = directory
+
+    def wait(self, timeout=None):
+        """
+        Wait up to `timeout` seconds for changes.
+
+        Returns:
+            set: Changed, created or deleted YAML files, empty on timeout. None when events
+            were lost and everything has to be rescanned.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Watch the new directory and pick up files created before the watch
+                    for root, _, files in os.walk(path):
+                        self._add_watch(root)
+                        changed.update(os.path.join(root, file) for file in files if is_config_file(file))
+                elif mask & IN_MOVED_FROM:
+                    return None
+            elif is_config_file(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Watch a directory tree for changed YAML files by comparing modification times and sizes."""
+
+    def __init__(self, directory, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        self._state = self._scan()
+
+    def _scan(self):
+        state = {}
+        for file_path in iter_config_files(self.directory):
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            state[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def wait(self, timeout=None):
+        """Wait up to `timeout` seconds for changes, see InotifyWatcher.wait."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self._scan()
+            changed = {path for path in state.keys() | self._state.keys() if state.get(path) != self._state.get(path)}
+            self._state = state
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            sleep = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(sleep)
+
+    def close(self):
+        pass
+
+
+def create_watcher(directory, poll_interval=None):
+    """Return an inotify watcher, or a polling one if inotify is unavailable or a poll interval is given."""
+    if poll_interval is None:
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            print(f"Falling back to polling for file changes: {e}")
+            poll_interval = 1.0
+    return PollingWatcher(directory, poll_interval)
+
+
+class Reconciler:
+    """
+    Long-running controller that regenerates units as config files change.
+
+    Schemas, templates, the TGW registry and the inventory stay loaded between changes.
+    A batch of changed files is reloaded and only the partitions holding their resources
+    are processed again, plus the partitions sharing a config file with those. A change
+    to a TransitGateway reprocesses all TransitGateway and CoreNetworkAttachment partitions,
+    since TGW selection depends on every declaration. When attachments are resolved from
+    declared VPCs, a VPC change also reprocesses the attachments of its partition.
+
+    Args:
+        input_dir (str): The config directory.
+        scheduler (KindScheduler): Runs the processors.
+        load_file (callable): Returns the resources of one config file.
+        report (callable): Saves the manifest and reports the units after each reconcile.
+        debounce (float): Seconds without further changes before reconciling.
+        poll_interval (float): Poll instead of using inotify, at this interval.
+    """
+
+    def __init__(self, input_dir, scheduler, load_file, report, debounce=DEFAULT_DEBOUNCE, poll_interval=None):
+        self.input_dir = input_dir
+        self.scheduler = scheduler
+        self.load_file = load_file
+        self.report = report
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.resources_by_file = {}
+
+    def run(self, resources_by_kind):
+        """Process everything once, then reconcile changes until interrupted."""
+        for resources in resources_by_kind.values():
+            for resource in resources:
+                self.resources_by_file.setdefault(resource.source_path, []).append(resource)
+
+        watcher = create_watcher(self.input_dir, self.poll_interval)
+        start = time.monotonic()
+        self.scheduler.run(resources_by_kind)
+        self.report()
+        unit_manifest.force = False
+        print(f"Initial reconcile took {time.monotonic() - start:.3f}s, watching {self.input_dir} for changes")
+
+        try:
+            while True:
+                changed = watcher.wait(1.0)
+                if changed == set():
+                    continue
+                first_change = time.monotonic()
+                changed = self._debounce(watcher, changed, first_change)
+                self.reconcile(changed, first_change)
+        except KeyboardInterrupt:
+            print("Stopped watching")
+        finally:
+            watcher.close()
+
+    def _debounce(self, watcher, changed, first_change):
+        """Collect further changes until none arrive for `debounce` seconds."""
+        while time.monotonic() - first_change < MAX_BATCH_SECONDS:
+            more = watcher.wait(self.debounce)
+            if more == set():
+                break
+            changed = None if changed is None or more is None else changed | more
+        return changed
+
+    def reconcile(self, changed, first_change=None):
+        """
+        Reload changed config files and process the partitions they affect.
+
+        Args:
+            changed (set): Changed file paths, or None to reload every file.
+            first_change (float): time.monotonic() of the first change, for the latency log.
+        """
+        start = time.monotonic()
+        if changed is None:
+            changed = set(self.resources_by_file) | set(iter_config_files(self.input_dir))
+        changed = sorted({os.path.relpath(path) for path in changed})
+
+        old_kinds = {resource.kind for path in changed for resource in self.resources_by_file.get(path, [])}
+        for path in changed:
+            for resource in self.resources_by_file.get(path, []):
+                if resource.kind == "VPC":
+                    declared_vpcs.unregister(resource)
+            resources = self.load_file(path) if os.path.exists(path) else []
+            if resources:
+                self.resources_by_file[path] = resources
+            else:
+                self.resources_by_file.pop(path, None)
+
+        resources_by_kind = {kind: [] for kind in self.scheduler.processors}
+        for path in sorted(self.resources_by_file):
+            for resource in self.resources_by_file[path]:
+                resources_by_kind.setdefault(resource.kind, []).append(resource)
+
+        kinds = old_kinds | {resource.kind for path in changed for resource in self.resources_by_file.get(path, [])}
+        partitions = self.affected_partitions(changed, resources_by_kind, kinds)
+
+        unit_manifest.reset()
+        self.scheduler.run(resources_by_kind, partitions)
+        self.report()
+
+        done = time.monotonic()
+        latency = f", {done - first_change:.3f}s after the first change" if first_change is not None else ""
+        print(f"Reconciled {len(changed)} changed file(s) in {done - start:.3f}s{latency}: {', '.join(changed)}")
+
+    def affected_partitions(self, changed, resources_by_kind, kinds):
+        """Return the (kind, partition) keys to process for a set of changed files."""
+        partitions_by_file = {}
+        files_by_partition = {}
+        for kind, resources in resources_by_kind.items():
+            for resource in resources:
+                key = (kind, partition_key(resource))
+                partitions_by_file.setdefault(resource.source_path, set()).add(key)
+                files_by_partition.setdefault(key, set()).add(resource.source_path)
+
+        selected = set()
+        if "TransitGateway" in kinds:
+            tgw_registry.clear()
+            selected.update(key for key in files_by_partition if key[0] in ("TransitGateway", "CoreNetworkAttachment"))
+
+        # Units are tracked per source file, so every partition of a touched file is processed
+        pending = [path for path in changed if path in partitions_by_file]
+        pending += [path for key in selected for path in files_by_partition[key]]
+        self._close_over_files(pending, selected, partitions_by_file, files_by_partition)
+
+        if declared_vpcs.enabled:
+            vpc_partitions = {partition for kind, partition in selected if kind == "VPC"}
+            attachments = [
+                key for key in files_by_partition
+                if key[0] == "CoreNetworkAttachment" and key[1] in vpc_partitions and key not in selected
+            ]
+            selected.update(attachments)
+            pending = [path for key in attachments for path in files_by_partition[key]]
+            self._close_over_files(pending, selected, partitions_by_file, files_by_partition)
+        return selected
+
+    @staticmethod
+    def _close_over_files(pending, selected, partitions_by_file, files_by_partition):
+        """Add every partition sharing a config file with a pending file to `selected`."""
+        seen = set()
+        while pending:
+            path = pending.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            for key in partitions_by_file.get(path, ()):
+                if key not in selected:
+                    selected.add(key)
+                    pending.extend(files_by_partition[key])
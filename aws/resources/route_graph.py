@@ -0,0 +1,254 @@
+import bisect
+import ipaddress
+from collections import Counter
+
+REACHABLE = "reachable"
+
+# Verdicts for pairs the model does not expect to be reachable, or cannot model
+UNKNOWN = "unknown"  # Missing CIDR, VPC routes or Transit Gateway routing data, or truncated TGW routes
+NOT_ATTACHED = "not_attached"  # No available VPC attachment on the Transit Gateway
+DIFFERENT_TGW = "different_tgw"  # Attached to different Transit Gateways
+NO_VPC_ROUTE = "no_vpc_route"  # No route table of the source sends the target CIDR to the TGW
+PARTIAL_VPC_ROUTE = "partial_vpc_route"  # Only some route tables of the source do
+NOT_ASSOCIATED = "not_associated"  # Source attachment has no TGW route table association
+NO_TGW_ROUTE = "no_tgw_route"  # TGW route table has no route covering the target CIDR
+NOT_PROPAGATED = "not_propagated"  # ...and the target attachment does not propagate to it
+BLACKHOLE = "blackhole"  # Longest matching TGW route is a blackhole
+MISROUTED = "misrouted"  # Longest matching TGW route points at another attachment
+
+
+def parse_network(cidr):
+    """Return (prefix length, network address as int) of an IPv4 CIDR, or None if it is not one."""
+    try:
+        network = ipaddress.IPv4Network(cidr, strict=False)
+    except (TypeError, ValueError):
+        return None
+    return network.prefixlen, int(network.network_address)
+
+
+def longest_match(routes, network):
+    """
+    Return the most specific route covering a network from a dict keyed by
+    (prefix length, network address), by walking the network's supernets.
+    """
+    prefixlen, address = network
+    for length in range(prefixlen, -1, -1):
+        mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
+        route = routes.get((length, address & mask))
+        if route is not None:
+            return route
+    return None
+
+
+def bit_positions(mask):
+    """Yield the positions of the set bits of a non-negative int, lowest first."""
+    # Binary digits least significant first, so the index of each "1" is a position
+    digits = bin(mask)[:1:-1]
+    position = digits.find("1")
+    while position != -1:
+        yield position
+        position = digits.find("1", position + 1)
+
+
+class RouteModel:
+    """
+    Expected reachability between discovered VPCs, computed from their TGW-bound VPC routes
+    and the Transit Gateway route tables, without calling AWS.
+
+    VPC attachments do not forward transit traffic, so every path is
+    source VPC route table -> TGW route table associated with the source attachment ->
+    target attachment. Reachability of all pairs is therefore the intersection of two
+    bitsets per source VPC: the targets its route tables send to the TGW, and the targets
+    its associated TGW route table delivers to the right attachment. Each bitset is built
+    once per route table, so the model costs O(route tables * VPCs) route lookups plus
+    one bit test per pair.
+
+    Args:
+        vpcs (list): VPC records as returned by the inventory, with `transit_gateway_id`.
+        routing (dict): Routing per Transit Gateway ID, as returned by find_tgw_routing.
+            Transit Gateways without routing make their pairs unknown, as do route tables
+            whose routes were truncated for the VPCs associated with them.
+    """
+
+    def __init__(self, vpcs, routing):
+        self.vpcs = list(vpcs)
+        self.index = {vpc["vpc_id"]: position for position, vpc in enumerate(self.vpcs)}
+        self.networks = [parse_network(vpc.get("cidr_block")) for vpc in self.vpcs]
+        self.routing = {tgw_id: data for tgw_id, data in (routing or {}).items() if data is not None}
+
+        # Attachment and associated TGW route table of each VPC
+        self.attachments = [None] * len(self.vpcs)
+        self.associations = [None] * len(self.vpcs)
+        self.route_tables = {}
+        for tgw_id, data in self.routing.items():
+            attachment_by_vpc = {vpc_id: attachment for attachment, vpc_id in data.get("attachments", {}).items()}
+            route_table_by_attachment = {}
+            for route_table in data.get("route_tables", []):
+                self.route_tables[route_table["route_table_id"]] = route_table
+                for attachment in route_table.get("associations", []):
+                    route_table_by_attachment[attachment] = route_table["route_table_id"]
+            for position, vpc in enumerate(self.vpcs):
+                if vpc.get("transit_gateway_id") == tgw_id:
+                    self.attachments[position] = attachment_by_vpc.get(vpc["vpc_id"])
+                    self.associations[position] = route_table_by_attachment.get(self.attachments[position])
+
+        # Routes of each TGW route table keyed by (prefix length, network address)
+        self.tgw_routes = {}
+        self.propagations = {}
+        # Route tables with routes missing from the model: a missing route may be the most specific one
+        self.truncated = {
+            route_table_id for route_table_id, route_table in self.route_tables.items() if route_table.get("truncated")
+        }
+        for route_table_id, route_table in self.route_tables.items():
+            self.propagations[route_table_id] = set(route_table.get("propagations", []))
+            routes = self.tgw_routes[route_table_id] = {}
+            for route in route_table.get("routes", []):
+                network = parse_network(route["cidr"])
+                if network is not None:
+                    routes[network] = route
+
+        self.tgw_masks = {route_table_id: self._tgw_mask(routes) for route_table_id, routes in self.tgw_routes.items()}
+        # VPC networks by address, to find the VPCs inside a route's CIDR with a range lookup
+        self._by_address = sorted(
+            (network[1], network[0], position) for position, network in enumerate(self.networks) if network is not None
+        )
+        self._addresses = [address for address, _, _ in self._by_address]
+        # VPC route tables usually share a handful of route sets, each is resolved once
+        self._route_set_masks = {}
+        self.vpc_masks = [self._vpc_masks(vpc) for vpc in self.vpcs]
+        self.reachable = [self.reachable_mask(position) for position in range(len(self.vpcs))]
+
+        # Bitsets used to explain unreachable pairs
+        self.tgw_members = {}
+        self.has_network = self.attached = 0
+        for position, vpc in enumerate(self.vpcs):
+            bit = 1 << position
+            tgw_id = vpc.get("transit_gateway_id")
+            self.tgw_members[tgw_id] = self.tgw_members.get(tgw_id, 0) | bit
+            if self.networks[position] is not None:
+                self.has_network |= bit
+            if self.attachments[position] is not None:
+                self.attached |= bit
+
+    def _tgw_mask(self, routes):
+        """Bitset of the VPCs a TGW route table delivers to their own attachment."""
+        mask = 0
+        for position, network in enumerate(self.networks):
+            if network is None or self.attachments[position] is None:
+                continue
+            route = longest_match(routes, network)
+            if (
+                route is not None
+                and route.get("state") == "active"
+                and self.attachments[position] in route.get("attachment_ids", [])
+            ):
+                mask |= 1 << position
+        return mask
+
+    def _vpc_masks(self, vpc):
+        """
+        Bitsets of the VPCs that all, and that any, of a VPC's tagged route tables send to
+        the TGW. Returns None when the VPC routes were not discovered.
+        """
+        route_tables = vpc.get("tgw_routes")
+        if not route_tables:
+            return None
+
+        all_mask, any_mask = -1, 0
+        for cidrs in route_tables.values():
+            mask = self._route_set_mask(tuple(sorted(cidrs)))
+            all_mask &= mask
+            any_mask |= mask
+        return all_mask, any_mask
+
+    def _route_set_mask(self, cidrs):
+        """Bitset of the VPCs covered by a set of TGW-bound destination CIDRs."""
+        mask = self._route_set_masks.get(cidrs)
+        if mask is None:
+            mask = 0
+            for network in map(parse_network, cidrs):
+                if network is None:
+                    continue
+                prefixlen, address = network
+                first = bisect.bisect_left(self._addresses, address)
+                last = bisect.bisect_right(self._addresses, address + (1 << (32 - prefixlen)) - 1)
+                for _, vpc_prefixlen, position in self._by_address[first:last]:
+                    if vpc_prefixlen >= prefixlen:
+                        mask |= 1 << position
+            self._route_set_masks[cidrs] = mask
+        return mask
+
+    def reachable_mask(self, position):
+        """Bitset of the VPCs the model expects the VPC at `position` to reach."""
+        vpc_masks = self.vpc_masks[position]
+        route_table_id = self.associations[position]
+        if vpc_masks is None or route_table_id is None or route_table_id in self.truncated:
+            return 0
+        return vpc_masks[0] & self.tgw_masks[route_table_id]
+
+    def verdict(self, source_vpc, target_vpc):
+        """Return REACHABLE or the reason the model does not expect the pair to be reachable."""
+        source = self.index[source_vpc["vpc_id"]]
+        target = self.index[target_vpc["vpc_id"]]
+        if self.reachable[source] >> target & 1:
+            return REACHABLE
+        return next(self._reasons(source, 1 << target))[1]
+
+    def unreachable(self):
+        """
+        Yield (source_vpc, target_vpc, verdict) for every ordered pair the model does not
+        expect to be reachable. Reasons are assigned a bitset at a time, so the cost follows
+        the number of such pairs rather than all N*(N-1) pairs.
+        """
+        everyone = (1 << len(self.vpcs)) - 1
+        for source, reachable in enumerate(self.reachable):
+            missing = everyone & ~reachable & ~(1 << source)
+            for target, verdict in self._reasons(source, missing):
+                yield self.vpcs[source], self.vpcs[target], verdict
+
+    def _reasons(self, source, missing):
+        """Yield (target, verdict) for the targets in the `missing` bitset of a source VPC."""
+        tgw_id = self.vpcs[source].get("transit_gateway_id")
+        checks = [(DIFFERENT_TGW, ~self.tgw_members[tgw_id])]
+        if tgw_id not in self.routing or self.vpc_masks[source] is None:
+            checks.append((UNKNOWN, -1))
+        checks.append((UNKNOWN, ~self.has_network))
+        if self.attachments[source] is None:
+            checks.append((NOT_ATTACHED, -1))
+        checks.append((NOT_ATTACHED, ~self.attached))
+        if self.vpc_masks[source] is not None:
+            all_mask, any_mask = self.vpc_masks[source]
+            checks += [(NO_VPC_ROUTE, ~any_mask), (PARTIAL_VPC_ROUTE, ~all_mask)]
+        if self.associations[source] is None:
+            checks.append((NOT_ASSOCIATED, -1))
+        elif self.associations[source] in self.truncated:
+            checks.append((UNKNOWN, -1))
+
+        for verdict, mask in checks:
+            for target in bit_positions(missing & mask):
+                yield target, verdict
+            missing &= ~mask
+            if not missing:
+                return
+
+        # What is left is routed by the TGW route table, look up each target's route
+        route_table_id = self.associations[source]
+        propagations = self.propagations[route_table_id]
+        for target in bit_positions(missing):
+            route = longest_match(self.tgw_routes[route_table_id], self.networks[target])
+            if route is None:
+                yield target, NO_TGW_ROUTE if self.attachments[target] in propagations else NOT_PROPAGATED
+            elif route.get("state") == "blackhole":
+                yield target, BLACKHOLE
+            else:
+                yield target, MISROUTED
+
+    def pair_count(self):
+        return len(self.vpcs) * (len(self.vpcs) - 1)
+
+    def summary(self, verdicts):
+        """Return a one-line count of the verdicts of unreachable pairs, reachable pairs first."""
+        counts = Counter(verdicts.values())
+        parts = [f"{self.pair_count() - len(verdicts)} reachable"]
+        parts += [f"{count} {verdict}" for verdict, count in sorted(counts.items())]
+        return ", ".join(parts)
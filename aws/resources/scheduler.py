@@ -0,0 +1,396 @@
+import contextlib
+import io
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from aws_clients import client_pool
+from instrumentation import metrics
+from inventory_cache import inventory_cache
+from unit_manifest import unit_manifest
+
+EXECUTORS = ("thread", "process")
+
+# How resources are split into tasks: one task per (kind, account_id, region), or one per
+# account running all of the account's kinds in dependency order
+SHARDINGS = ("partition", "account")
+
+# Partition of resources that are not bound to an account or region, e.g. TransitGateway
+GLOBAL_PARTITION = ("", "")
+
+
+def partition_key(resource):
+    """Return the (account_id, region) partition a resource belongs to."""
+    spec = resource.spec or {}
+    return (str(spec.get("account_id") or ""), str(spec.get("region") or ""))
+
+
+def depends_on(processor_factory):
+    """Return the kinds a processor class (or a functools.partial of one) depends on."""
+    processor_class = getattr(processor_factory, "func", processor_factory)
+    return getattr(processor_class, "DEPENDS_ON", ())
+
+
+class TaskOutput:
+    """
+    sys.stdout replacement that routes the print output of each scheduled task into its
+    own buffer, so concurrent tasks can be reported in a deterministic order.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    @contextlib.contextmanager
+    def capture(self):
+        self._local.buffer = io.StringIO()
+        try:
+            yield self._local.buffer
+        finally:
+            self._local.buffer = None
+
+
+def task_label(kind, partition):
+    account_id, region = partition
+    return f"{kind}[{account_id or '*'}/{region or '*'}]"
+
+
+def run_task(processors, steps, label, blocked_kinds=(), collect_updates=False, archived_units=()):
+    """
+    Process the steps of one task and return its captured output, inventory cache stats
+    and, when run in a worker process, the unit manifest updates to merge into the parent.
+    A worker process is also told which units of the task's account went into the
+    parent's archive, since processors check for the units they depend on.
+    """
+    unit_manifest.add_archived_units(archived_units)
+    if isinstance(sys.stdout, TaskOutput):
+        capture = sys.stdout.capture()
+    else:
+        capture = contextlib.redirect_stdout(io.StringIO())
+
+    before = {"inventory": inventory_cache.stats(), "api": client_pool.stats()}
+    with capture as buffer:
+        ok = process_steps(processors, steps, label, blocked_kinds)
+        output = buffer.getvalue()
+
+    after = {"inventory": inventory_cache.stats(), "api": client_pool.stats()}
+    stats = {
+        group: {key: after[group][key] - before[group][key] for key in after[group]}
+        for group in after
+    }
+    updates = None
+    if collect_updates:
+        updates = unit_manifest.take_updates()
+        stats["metrics"] = metrics.take()
+    return ok, output, stats, updates
+
+
+def init_worker(initializer, initargs):
+    """Start a worker process without the metrics and unit archive it inherited from the parent on fork."""
+    metrics.clear()
+    unit_manifest.detach_archive()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def process_task(processor_factory, resources, label):
+    """Process the resources of one task, timed per kind and partition. Returns True on success."""
+    kind = resources[0].kind if resources else None
+    account_id, region = partition_key(resources[0]) if resources else ("", "")
+    try:
+        with metrics.stage("process", kind=kind, account=account_id or None, region=region or None):
+            processor_factory(resources).process_resources()
+        metrics.count("tasks", kind=kind, result="succeeded")
+        return True
+    except Exception as e:
+        print(f"Error processing {label}: {e}")
+        metrics.count("tasks", kind=kind, result="failed")
+        return False
+
+
+def process_steps(processors, steps, label, blocked_kinds=()):
+    """
+    Process the (kind, partition, resources) steps of a task in order. A step is skipped
+    when a kind it depends on failed in its partition, or is in blocked_kinds because it
+    failed globally. Returns True if every step succeeded.
+    """
+    if len(steps) == 1 and not blocked_kinds:
+        kind, _, resources = steps[0]
+        return process_task(processors[kind], resources, label)
+
+    failed = set()
+    for kind, partition, resources in steps:
+        blocked = [
+            dependency for dependency in depends_on(processors[kind])
+            if dependency in blocked_kinds or (dependency, partition) in failed
+        ]
+        if blocked:
+            print(f"Skipping {task_label(kind, partition)}: dependency {blocked[0]} failed")
+            failed.add((kind, partition))
+        elif not process_task(processors[kind], resources, task_label(kind, partition)):
+            failed.add((kind, partition))
+    return not failed
+
+
+class Task:
+    """
+    A unit of scheduled work: the resources of one kind in one partition, or with account
+    sharding all the steps of one account.
+    """
+
+    def __init__(self, kind, partition, resources):
+        self.kind = kind
+        self.partition = partition
+        self.steps = [(kind, partition, resources)] if kind else []
+        self.dependencies = []
+        self.blocked_kinds = set()  # Kinds whose failure skips the steps depending on them
+
+    @property
+    def kinds(self):
+        return {kind for kind, _, _ in self.steps}
+
+    def __repr__(self):
+        if self.kind is None:
+            return f"account {self.partition[0]}"
+        return task_label(self.kind, self.partition)
+
+
+class KindScheduler:
+    """
+    Run processors as a DAG of (kind, account_id, region) tasks.
+
+    Kinds are ordered by the processors' DEPENDS_ON declarations. A task waits for the
+    tasks of the kinds it depends on in the same partition, and for global ones. Tasks
+    whose dependencies are done run concurrently on a thread or process pool. Output
+    is buffered per task and printed in a fixed order, so runs are deterministic
+    regardless of the number of workers.
+
+    With account sharding, the tasks of each account are merged into one task that runs
+    them in order on a single worker, so an account's VPC, attachment and analyzer units
+    are generated together. Global tasks (e.g. TransitGateway) still run first, on their own.
+    """
+
+    def __init__(self, processors, jobs=1, executor="thread", initializer=None, initargs=(), shard_by="partition"):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {executor}")
+        if shard_by not in SHARDINGS:
+            raise ValueError(f"Unknown sharding: {shard_by}")
+        self.processors = processors
+        self.jobs = max(1, jobs)
+        self.executor = executor
+        self.shard_by = shard_by
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def kind_order(self, kinds):
+        """Topologically sort the given kinds, keeping the processors' declaration order for ties."""
+        order = []
+        visiting = set()
+
+        def visit(kind):
+            if kind in order:
+                return
+            if kind in visiting:
+                raise ValueError(f"Dependency cycle detected involving kind {kind}")
+            visiting.add(kind)
+            for dependency in depends_on(self.processors[kind]):
+                if dependency in kinds:
+                    visit(dependency)
+            visiting.discard(kind)
+            order.append(kind)
+
+        for kind in self.processors:
+            if kind in kinds:
+                visit(kind)
+        return order
+
+    def build_tasks(self, resources_by_kind, partitions=None):
+        """
+        Partition the resources and return the tasks in execution order with dependencies resolved.
+
+        Args:
+            resources_by_kind (dict): All resources, grouped by kind.
+            partitions (set): Only build tasks for these (kind, (account_id, region)) partitions.
+        """
+        kinds = [kind for kind, resources in resources_by_kind.items() if resources and kind in self.processors]
+        tasks = []
+        tasks_by_kind = {}
+        for kind in self.kind_order(kinds):
+            resources_by_partition = {}
+            for resource in resources_by_kind[kind]:
+                resources_by_partition.setdefault(partition_key(resource), []).append(resource)
+
+            kind_tasks = [
+                Task(kind, partition, resources_by_partition[partition]) for partition in sorted(resources_by_partition)
+            ]
+            for task in kind_tasks:
+                for dependency in depends_on(self.processors[kind]):
+                    task.dependencies.extend(
+                        dependency_task for dependency_task in tasks_by_kind.get(dependency, [])
+                        if dependency_task.partition in (task.partition, GLOBAL_PARTITION)
+                    )
+            tasks_by_kind[kind] = kind_tasks
+            tasks.extend(kind_tasks)
+
+        if partitions is not None:
+            tasks = [task for task in tasks if (task.kind, task.partition) in partitions]
+        if self.shard_by == "account":
+            tasks = self.shard_by_account(tasks)
+        return tasks
+
+    @staticmethod
+    def shard_by_account(tasks):
+        """
+        Merge the tasks of each account into one task, keeping their order. Global tasks
+        only depend on other global tasks, so they run first and account tasks wait for
+        the global tasks their steps depend on.
+        """
+        global_tasks = []
+        account_tasks = {}
+        for task in tasks:
+            account_id = task.partition[0]
+            if not account_id:
+                global_tasks.append(task)
+                continue
+            account_task = account_tasks.get(account_id)
+            if account_task is None:
+                account_task = account_tasks[account_id] = Task(None, (account_id, ""), [])
+            account_task.steps.extend(task.steps)
+            for dependency in task.dependencies:
+                if not dependency.partition[0] and dependency not in account_task.dependencies:
+                    account_task.dependencies.append(dependency)
+        return global_tasks + list(account_tasks.values())
+
+    def run(self, resources_by_kind, partitions=None):
+        """
+        Validate each kind as a whole, then process all partitions.
+
+        Args:
+            resources_by_kind (dict): All resources, grouped by kind.
+            partitions (set): Only process these (kind, (account_id, region)) partitions.
+                Their kinds are still validated as a whole.
+
+        Returns:
+            bool: True if every task succeeded.
+        """
+        tasks = self.build_tasks(resources_by_kind, partitions)
+
+        # Cross-resource checks (duplicate names, CIDR overlaps) need the full set of a kind
+        failed = set()
+        for kind in self.kind_order(set().union(*(task.kinds for task in tasks))):
+            with metrics.stage("validate", kind=kind):
+                valid = self.processors[kind](resources_by_kind[kind]).validate()
+            if not valid:
+                print(f"Validation failed for kind {kind}, skipping its resources")
+                for task in tasks:
+                    if task.kind == kind:
+                        failed.add(task)
+                    elif task.kind is None and kind in task.kinds:
+                        # Only the kind's steps of an account task are dropped
+                        task.steps = [step for step in task.steps if step[0] != kind]
+                        task.blocked_kinds.add(kind)
+
+        if self.jobs == 1:
+            self._run_serial(tasks, failed)
+        else:
+            self._run_parallel(tasks, failed)
+        return not failed
+
+    def _blocked(self, task, failed):
+        """
+        Return why a task cannot run, or None if it can, marking blocked tasks as failed.
+        Account tasks always run, skipping only the steps whose dependencies failed.
+        """
+        if task in failed:
+            return ""
+        blocked = [dependency for dependency in task.dependencies if dependency in failed]
+        if blocked and task.kind is not None:
+            failed.add(task)
+            return f"Skipping {task}: dependency {blocked[0]} failed\n"
+        return None
+
+    def _blocked_kinds(self, task, failed):
+        """Return the kinds an account task's steps must not depend on."""
+        return task.blocked_kinds | {dependency.kind for dependency in task.dependencies if dependency in failed}
+
+    def _run_serial(self, tasks, failed):
+        for task in tasks:
+            reason = self._blocked(task, failed)
+            if reason is not None:
+                print(reason, end="")
+                continue
+            if not process_steps(self.processors, task.steps, repr(task), self._blocked_kinds(task, failed)):
+                failed.add(task)
+
+    def _run_parallel(self, tasks, failed):
+        outputs = {}
+        waiting = list(tasks)
+        running = {}
+        next_to_print = 0
+
+        if self.executor == "process":
+            pool = ProcessPoolExecutor(
+                max_workers=self.jobs, initializer=init_worker, initargs=(self.initializer, self.initargs)
+            )
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.jobs)
+            real_stdout = sys.stdout
+            sys.stdout = TaskOutput(real_stdout)
+
+        try:
+            with pool:
+                while waiting or running:
+                    # Submit every task whose dependencies have all finished
+                    for task in list(waiting):
+                        if any(dependency in waiting or dependency in running.values() for dependency in task.dependencies):
+                            continue
+                        waiting.remove(task)
+                        reason = self._blocked(task, failed)
+                        if reason is not None:
+                            outputs[task] = reason
+                            continue
+                        archived_units = ()
+                        if self.executor == "process" and task.partition[0]:
+                            archived_units = unit_manifest.archived_units(task.partition[0])
+                        future = pool.submit(
+                            run_task, {kind: self.processors[kind] for kind in task.kinds}, task.steps, repr(task),
+                            self._blocked_kinds(task, failed), self.executor == "process", archived_units,
+                        )
+                        running[future] = task
+
+                    if running:
+                        done, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            task = running.pop(future)
+                            try:
+                                ok, output, stats, updates = future.result()
+                            except Exception as e:
+                                ok, output, stats, updates = False, f"Error processing {task}: {e}\n", None, None
+                            if not ok:
+                                failed.add(task)
+                            if stats and self.executor == "process":
+                                inventory_cache.merge_stats(stats["inventory"])
+                                client_pool.merge_stats(stats["api"])
+                                metrics.merge(stats["metrics"])
+                            if updates:
+                                unit_manifest.merge_updates(updates)
+                            outputs[task] = output
+
+                    # Print finished tasks in execution order
+                    while next_to_print < len(tasks) and tasks[next_to_print] in outputs:
+                        self._print(outputs.pop(tasks[next_to_print]))
+                        next_to_print += 1
+        finally:
+            if self.executor != "process":
+                sys.stdout = real_stdout
+
+    def _print(self, output):
+        stream = sys.stdout.stream if isinstance(sys.stdout, TaskOutput) else sys.stdout
+        stream.write(output)
+        stream.flush()
@@ -0,0 +1,81 @@
+import json
+
+
+class SchemaRegistry:
+    """
+    Load and compile JSON schemas once per process.
+
+    Validators are cached by schema file path, so the schema is read, parsed and
+    checked a single time no matter how many resources of that kind are validated.
+    """
+
+    def __init__(self):
+        self._validators = {}
+
+    def get_validator(self, schema_file):
+        """Return the compiled validator for a schema file, loading it on first use."""
+        validator = self._validators.get(schema_file)
+        if validator is None:
+            with open(schema_file, 'r') as schema:
+                schema_data = json.load(schema)
+
+            # Imported on first use, runs that validate nothing skip loading jsonschema
+            from jsonschema.validators import validator_for
+
+            validator_class = validator_for(schema_data)
+            validator_class.check_schema(schema_data)
+            validator = validator_class(schema_data)
+            self._validators[schema_file] = validator
+        return validator
+
+    def validation_errors(self, schema_file, instance):
+        """
+        Validate an instance and collect every error instead of stopping at the first one.
+
+        Returns:
+            list: (path, message) tuples sorted by path. Empty if the instance is valid.
+        """
+        validator = self.get_validator(schema_file)
+        errors = [
+            ("/".join(str(part) for part in error.absolute_path), error.message)
+            for error in validator.iter_errors(instance)
+        ]
+        return sorted(errors)
+
+    def clear(self):
+        """Drop all compiled validators."""
+        self._validators.clear()
+
+
+class ValidationReport:
+    """Result of validating a batch of resources of one kind."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.errors = {}
+        self.validated = 0
+        self.failed = 0
+
+    def add(self, resource_name, errors):
+        """Record the validation errors (possibly none) for a single resource."""
+        if errors:
+            self.failed += 1
+            self.errors.setdefault(resource_name, []).extend(errors)
+        else:
+            self.validated += 1
+
+    @property
+    def ok(self):
+        return self.failed == 0
+
+    def print_report(self):
+        """Print every error per resource followed by the validated/failed counts."""
+        for resource_name, errors in self.errors.items():
+            for path, message in errors:
+                location = path or "<root>"
+                print(f"Validation error in {self.kind} {resource_name} at {location}: {message}")
+        print(f"{self.kind}: {self.validated} validated, {self.failed} failed")
+
+
+# Process-wide registry shared by all resource models
+schema_registry = SchemaRegistry()
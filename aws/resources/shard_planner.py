@@ -0,0 +1,270 @@
+"""
+Plan how parallel CI workers run the generated units.
+
+Reads the `dependencies` blocks of every terragrunt.hcl below live/ and splits the unit
+DAG into waves: a unit runs in the wave after the last of its dependencies. Every wave is
+split into shards of balanced weight, so N workers can each run their shard of a wave on
+their own and only wait for each other between waves. Weights are recorded plan durations
+in seconds when given, otherwise every unit counts as 1. Run from the `aws` folder:
+
+    python3 resources/shard_planner.py --shards 8 --durations plan-durations.json --output shard-plan.json
+"""
+import argparse
+import heapq
+import json
+import os
+import re
+import sys
+
+UNIT_FILE = "terragrunt.hcl"
+
+SKIPPED_DIRS = {".terraform", ".terragrunt-cache"}
+
+DEPENDENCIES_PATTERN = re.compile(r'\bdependencies\s*\{\s*paths\s*=\s*\[([^\]]*)\]')
+STRING_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+def read_dependencies(unit_file):
+    """Return the paths listed in the `dependencies` block of a terragrunt.hcl, as written."""
+    with open(unit_file, 'r') as file:
+        content = file.read()
+    match = DEPENDENCIES_PATTERN.search(content)
+    if not match:
+        return []
+    return STRING_PATTERN.findall(match.group(1))
+
+
+def iter_units(live_dir="live"):
+    """Yield the directories holding a terragrunt.hcl below live_dir, in a stable order."""
+    for root, dirs, files in os.walk(live_dir):
+        dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS and not d.startswith("."))
+        if UNIT_FILE in files:
+            yield root
+
+
+def read_units(live_dir="live"):
+    """
+    Find the units below a directory.
+
+    Returns:
+        dict: {unit_dir: [dependency unit_dir, ...]}, with dependencies resolved against
+            the unit directory, e.g. {"live/acc1/CoreNetworkAttachment/vpc1": ["live/acc1/VPC/vpc1"]}.
+    """
+    return {
+        unit_dir: [
+            os.path.normpath(os.path.join(unit_dir, path)) for path in read_dependencies(os.path.join(unit_dir, UNIT_FILE))
+        ]
+        for unit_dir in iter_units(live_dir)
+    }
+
+
+def plan_waves(units):
+    """
+    Split the unit DAG into waves, the topological levels of the units.
+
+    Dependencies that are not part of the units (e.g. units outside the plan) are ignored.
+
+    Returns:
+        list: One sorted list of units per wave.
+
+    Raises:
+        ValueError: If the dependencies form a cycle.
+    """
+    pending = {unit: {dependency for dependency in dependencies if dependency in units and dependency != unit}
+               for unit, dependencies in units.items()}
+    dependents = {}
+    for unit, dependencies in pending.items():
+        for dependency in dependencies:
+            dependents.setdefault(dependency, []).append(unit)
+
+    waves = []
+    ready = sorted(unit for unit, dependencies in pending.items() if not dependencies)
+    planned = 0
+    while ready:
+        waves.append(ready)
+        planned += len(ready)
+        next_ready = []
+        for unit in ready:
+            for dependent in dependents.get(unit, ()):
+                pending[dependent].discard(unit)
+                if not pending[dependent]:
+                    next_ready.append(dependent)
+        ready = sorted(next_ready)
+
+    if planned < len(units):
+        cycle = sorted(unit for unit, dependencies in pending.items() if dependencies)
+        raise ValueError(f"Dependency cycle, these units cannot be ordered: {', '.join(cycle)}")
+    return waves
+
+
+def balance(units, weights, shards):
+    """
+    Split units into shards of balanced total weight, heaviest units first onto the
+    lightest shard (longest processing time first).
+
+    Returns:
+        list: (weight, units) per shard, in shard order.
+    """
+    heap = [(0, shard) for shard in range(shards)]
+    assigned = [[] for _ in range(shards)]
+    totals = [0] * shards
+    for unit in sorted(units, key=lambda unit: (-weights[unit], unit)):
+        total, shard = heapq.heappop(heap)
+        assigned[shard].append(unit)
+        totals[shard] = total + weights[unit]
+        heapq.heappush(heap, (totals[shard], shard))
+    return [(totals[shard], sorted(assigned[shard])) for shard in range(shards)]
+
+
+def unit_weights(units, durations=None):
+    """
+    Return the weight of every unit: its recorded duration, or the mean recorded duration
+    for units without one. Without durations every unit weighs 1.
+    """
+    if not durations:
+        return {unit: 1 for unit in units}
+    known = [durations[unit] for unit in units if unit in durations]
+    default = sum(known) / len(known) if known else 1
+    return {unit: durations.get(unit, default) for unit in units}
+
+
+def plan_shards(units, shards, durations=None):
+    """
+    Build the shard plan of the units.
+
+    Args:
+        units (dict): {unit_dir: [dependency unit_dir, ...]}, as returned by read_units.
+        shards (int): Number of parallel workers.
+        durations (dict): Optional recorded plan durations, {unit_dir: seconds}.
+
+    Returns:
+        dict: The plan, with the units of each shard of each wave and the estimated
+            duration of the run (the heaviest shard of each wave, summed).
+    """
+    if shards < 1:
+        raise ValueError("The number of shards must be at least 1")
+    weights = unit_weights(units, durations)
+    waves = []
+    assignments = {}
+    estimate = 0
+    for wave, wave_units in enumerate(plan_waves(units)):
+        wave_shards = []
+        for shard, (weight, shard_units) in enumerate(balance(wave_units, weights, shards)):
+            wave_shards.append({"shard": shard, "weight": round(weight, 3), "units": shard_units})
+            for unit in shard_units:
+                assignments[unit] = {
+                    "wave": wave,
+                    "shard": shard,
+                    "dependencies": sorted(dependency for dependency in units[unit] if dependency in units),
+                }
+        wave_weight = max(entry["weight"] for entry in wave_shards)
+        estimate += wave_weight
+        waves.append({"wave": wave, "weight": wave_weight, "shards": wave_shards})
+
+    return {
+        "shards": shards,
+        "weights": "durations" if durations else "units",
+        "estimate": round(estimate, 3),
+        "total": round(sum(weights.values()), 3),
+        "waves": waves,
+        "units": dict(sorted(assignments.items())),
+    }
+
+
+def select_units(units, selected):
+    """
+    Restrict units to the selected ones, e.g. the changed units of a run. Units that are
+    not selected need not run again, but the order they imposed is kept: a selected unit
+    depends on every selected unit it reaches through unselected ones. A changed analyzer
+    still runs after its changed VPC when the attachment between them is unchanged.
+    """
+    selected = set(selected)
+    missing = sorted(selected - set(units))
+    for unit in missing:
+        print(f"Selected unit {unit} not found, skipping it")
+
+    # Selected units each unselected unit depends on, directly or through unselected units
+    reachable = {}
+
+    def selected_dependencies(unit, visiting):
+        found = set()
+        for dependency in units.get(unit, ()):
+            if dependency in selected:
+                found.add(dependency)
+            elif dependency in units and dependency not in visiting:
+                if dependency not in reachable:
+                    visiting.add(dependency)
+                    reachable[dependency] = selected_dependencies(dependency, visiting)
+                    visiting.discard(dependency)
+                found |= reachable[dependency]
+        return found
+
+    return {unit: sorted(selected_dependencies(unit, {unit}) - {unit})
+            for unit in units if unit in selected}
+
+
+def load_durations(path):
+    """Load recorded plan durations, a JSON object of {unit_dir: seconds}."""
+    with open(path, 'r') as durations_file:
+        durations = json.load(durations_file)
+    return {os.path.normpath(unit): float(seconds) for unit, seconds in durations.items()}
+
+
+def write_shard_plan(output, shards, live_dir="live", durations_file=None, selected=None):
+    """
+    Plan the units below live_dir and write the plan as JSON.
+
+    Args:
+        output (str): File to write the plan to.
+        shards (int): Number of parallel workers.
+        live_dir (str): Directory holding the units.
+        durations_file (str): Optional JSON file of recorded plan durations.
+        selected: Optional units to restrict the plan to.
+
+    Returns:
+        dict: The plan.
+    """
+    units = read_units(live_dir)
+    missing = sorted({dependency for dependencies in units.values() for dependency in dependencies} - set(units))
+    for dependency in missing:
+        print(f"Dependency {dependency} is not a unit, ignoring it")
+    if selected is not None:
+        units = select_units(units, selected)
+
+    durations = load_durations(durations_file) if durations_file else None
+    plan = plan_shards(units, shards, durations)
+    with open(output, 'w') as plan_file:
+        json.dump(plan, plan_file, indent=2)
+        plan_file.write("\n")
+    print(
+        f"Shard plan: {len(plan['units'])} units in {len(plan['waves'])} waves on {shards} shards, "
+        f"estimated {plan['estimate']} of {plan['total']} ({plan['weights']}), written to {output}"
+    )
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split the generated units into balanced, dependency-ordered CI shards.")
+    parser.add_argument("--shards", type=int, required=True, help="Number of parallel CI workers.")
+    parser.add_argument("--live-dir", type=str, default="live", help="Directory holding the units (default: live).")
+    parser.add_argument("--durations", type=str, help="JSON file of recorded plan durations in seconds per unit directory.")
+    parser.add_argument("--changed-units-file", type=str, help="Only plan the changed units listed in this file, as written by main.py, or the units a plan_cache.py selection includes.")
+    parser.add_argument("--output", type=str, default="shard-plan.json", help="File to write the plan to (default: shard-plan.json).")
+    args = parser.parse_args()
+
+    selected = None
+    if args.changed_units_file:
+        with open(args.changed_units_file, 'r') as changed_file:
+            changed = json.load(changed_file)
+        # A changed units file of main.py, or a plan selection of plan_cache.py
+        selected = [os.path.normpath(unit) for unit in changed.get("changed", changed.get("include", []))]
+    try:
+        write_shard_plan(args.output, args.shards, args.live_dir, args.durations, selected)
+    except (OSError, ValueError) as e:
+        print(f"Error planning shards: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import os
+from instrumentation import metrics
+
+TEMPLATE_DIR = "resources/templates"
+
+
+class TemplateRegistry:
+    """
+    Process-wide Jinja2 environment over the templates directory.
+
+    Each template is compiled once and reused for every render. An optional
+    bytecode cache directory lets repeated CLI runs skip compilation entirely.
+    """
+
+    def __init__(self, template_dir=TEMPLATE_DIR, bytecode_cache_dir=None):
+        self.template_dir = template_dir
+        self.bytecode_cache_dir = bytecode_cache_dir
+        self._environment = None
+        self._templates = {}
+
+    def configure(self, template_dir=None, bytecode_cache_dir=None):
+        """Change the template or bytecode cache directory, dropping compiled templates."""
+        if template_dir:
+            self.template_dir = template_dir
+        if bytecode_cache_dir:
+            self.bytecode_cache_dir = bytecode_cache_dir
+        self._environment = None
+        self._templates.clear()
+
+    @property
+    def environment(self):
+        if self._environment is None:
+            # Imported on first use, runs that render nothing skip loading jinja2
+            from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+            bytecode_cache = None
+            if self.bytecode_cache_dir:
+                os.makedirs(self.bytecode_cache_dir, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(self.bytecode_cache_dir)
+
+            self._environment = Environment(
+                loader=FileSystemLoader(self.template_dir),
+                bytecode_cache=bytecode_cache,
+                auto_reload=False,
+            )
+        return self._environment
+
+    def get_template(self, template_file):
+        """
+        Return the compiled template for a template name or a path inside the template directory.
+
+        Args:
+            template_file (str): e.g. 'vpc_terragrunt.hcl.j2' or 'resources/templates/vpc_terragrunt.hcl.j2'.
+        """
+        template = self._templates.get(template_file)
+        if template is None:
+            name = template_file
+            if os.path.dirname(template_file):
+                name = os.path.relpath(template_file, self.template_dir)
+            template = self.environment.get_template(name)
+            self._templates[template_file] = template
+        return template
+
+    def render(self, template_file, **context):
+        """Render a template with the given context."""
+        with metrics.stage("render", template=os.path.basename(template_file)):
+            return self.get_template(template_file).render(**context)
+
+
+# Process-wide registry shared by all renderers
+template_registry = TemplateRegistry()
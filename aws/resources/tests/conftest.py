@@ -0,0 +1,44 @@
+import os
+import sys
+import pytest
+
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+AWS_DIR = os.path.join(RESOURCE_DIR, "..")
+BENCHMARK_DIR = os.path.join(AWS_DIR, "benchmarks")
+
+# The resource modules import each other by module name, as when main.py runs from aws/
+sys.path.insert(0, RESOURCE_DIR)
+
+
+def pytest_addoption(parser):
+    parser.addoption("--runslow", action="store_true", help="Also run the tests marked slow.")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: runs main.py on a large synthetic config, only run with --runslow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runslow"):
+        return
+    skip_slow = pytest.mark.skip(reason="slow, run with --runslow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+@pytest.fixture
+def aws_dir(monkeypatch):
+    """Run from the `aws` folder, which schema and template paths are relative to."""
+    monkeypatch.chdir(AWS_DIR)
+    return AWS_DIR
+
+
+@pytest.fixture
+def ec2_client():
+    """An EC2 client with fake credentials, for use with a botocore Stubber. It never reaches AWS."""
+    import boto3
+
+    return boto3.client(
+        "ec2", region_name="us-east-1", aws_access_key_id="testing", aws_secret_access_key="testing",
+    )
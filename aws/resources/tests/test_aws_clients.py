@@ -0,0 +1,158 @@
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+from botocore.stub import Stubber
+
+from aws_clients import DEFAULT_CONCURRENCY, DEFAULT_RATE, ClientPool
+
+REGION = "us-east-1"
+
+
+class FakeClock:
+    """Time that only passes when the pool sleeps, so backoff and rate limiting cost nothing."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # A real sleep always lets some time pass, even when rounding leaves a token a hair short
+        seconds = max(seconds, 1e-6)
+        self.now += seconds
+        self.slept += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def pool(clock):
+    return ClientPool(clock=clock, sleep=clock.sleep)
+
+
+@pytest.fixture
+def stubber(pool, ec2_client):
+    pool.register_client("ec2", REGION, ec2_client)
+    with Stubber(ec2_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def throttle(stubber, times, code="RequestLimitExceeded"):
+    for _ in range(times):
+        stubber.add_client_error("describe_vpcs", service_error_code=code, http_status_code=503)
+
+
+def test_throttled_calls_are_retried_and_counted(pool, stubber, clock):
+    throttle(stubber, 2)
+    stubber.add_response("describe_vpcs", {"Vpcs": [{"VpcId": "vpc-1"}]})
+
+    response = pool.call("ec2", REGION, "describe_vpcs")
+
+    assert response["Vpcs"] == [{"VpcId": "vpc-1"}]
+    assert pool.stats() == {"calls": 3, "throttles": 2, "retries": 2}
+    # Jittered backoff of at most base_delay * 2 and base_delay * 4
+    assert clock.slept <= pool.base_delay * 6
+
+
+def test_throttling_lowers_concurrency_and_rate_and_successes_restore_them(pool, stubber, clock):
+    limiter = pool.limiter(REGION)
+    throttle(stubber, 3)
+    stubber.add_response("describe_vpcs", {"Vpcs": []})
+    pool.call("ec2", REGION, "describe_vpcs")
+
+    # Halved on each of the three throttles, then raised by one success
+    assert limiter.concurrency == pytest.approx(DEFAULT_CONCURRENCY / 8 + 1 / (DEFAULT_CONCURRENCY / 8))
+    assert limiter.bucket.rate == pytest.approx(DEFAULT_RATE / 8 + 0.5)
+
+    for _ in range(100):
+        stubber.add_response("describe_vpcs", {"Vpcs": []})
+        pool.call("ec2", REGION, "describe_vpcs")
+
+    assert limiter.concurrency == DEFAULT_CONCURRENCY
+    assert limiter.bucket.rate == DEFAULT_RATE
+    # While the rate was reduced, the bucket made calls wait
+    assert clock.slept > 0
+    assert pool.stats() == {"calls": 104, "throttles": 3, "retries": 3}
+
+
+def test_throttling_beyond_max_attempts_raises(pool, stubber):
+    pool.configure(max_attempts=3)
+    throttle(stubber, 3, code="Throttling")
+
+    with pytest.raises(ClientError):
+        pool.call("ec2", REGION, "describe_vpcs")
+
+    assert pool.stats() == {"calls": 3, "throttles": 3, "retries": 2}
+    assert pool.limiter(REGION).concurrency == DEFAULT_CONCURRENCY / 8
+
+
+def test_other_errors_are_not_retried(pool, stubber):
+    stubber.add_client_error("describe_vpcs", service_error_code="UnauthorizedOperation", http_status_code=403)
+
+    with pytest.raises(ClientError):
+        pool.call("ec2", REGION, "describe_vpcs")
+
+    assert pool.stats() == {"calls": 1, "throttles": 0, "retries": 0}
+
+
+@pytest.mark.parametrize("code, status", [("InternalError", 500), ("Unavailable", 503), ("SomethingElse", 502)])
+def test_server_errors_are_retried_without_lowering_limits(pool, stubber, clock, code, status):
+    stubber.add_client_error("describe_vpcs", service_error_code=code, http_status_code=status)
+    stubber.add_response("describe_vpcs", {"Vpcs": [{"VpcId": "vpc-1"}]})
+
+    assert pool.call("ec2", REGION, "describe_vpcs")["Vpcs"] == [{"VpcId": "vpc-1"}]
+    assert pool.stats() == {"calls": 2, "throttles": 0, "retries": 1}
+    assert pool.limiter(REGION).concurrency == DEFAULT_CONCURRENCY
+    assert 0 < clock.slept <= pool.base_delay * 2
+
+
+class UnreachableClient:
+    """A client whose first `failures` calls cannot reach the endpoint."""
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def describe_vpcs(self):
+        if self.failures:
+            self.failures -= 1
+            raise EndpointConnectionError(endpoint_url="https://ec2.us-east-1.amazonaws.com")
+        return {"Vpcs": []}
+
+
+def test_connection_errors_are_retried_up_to_max_attempts(pool):
+    assert pool.call("ec2", REGION, "describe_vpcs", client=UnreachableClient(2)) == {"Vpcs": []}
+    assert pool.stats() == {"calls": 3, "throttles": 0, "retries": 2}
+
+    pool.configure(max_attempts=2)
+    with pytest.raises(EndpointConnectionError):
+        pool.call("ec2", REGION, "describe_vpcs", client=UnreachableClient(2))
+
+
+def test_pages_go_through_the_limiter_one_call_each(pool, stubber):
+    stubber.add_response("describe_vpcs", {"Vpcs": [{"VpcId": "vpc-1"}], "NextToken": "page-2"})
+    throttle(stubber, 1)
+    stubber.add_response("describe_vpcs", {"Vpcs": [{"VpcId": "vpc-2"}]}, {"NextToken": "page-2"})
+
+    vpcs = list(pool.paginate("ec2", REGION, "describe_vpcs", "Vpcs"))
+
+    assert [vpc["VpcId"] for vpc in vpcs] == ["vpc-1", "vpc-2"]
+    assert pool.stats() == {"calls": 3, "throttles": 1, "retries": 1}
+
+
+def test_clients_are_reused(pool, stubber, ec2_client, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    assert pool.client("ec2", REGION) is ec2_client
+
+    created = pool.client("ec2", "eu-west-1")
+    assert pool.client("ec2", "eu-west-1") is created
+    assert created is not ec2_client
+    # Limits can change without dropping the clients
+    pool.configure(rate=5)
+    assert pool.client("ec2", "eu-west-1") is created
+    assert pool.limiter(REGION).bucket.rate == 5
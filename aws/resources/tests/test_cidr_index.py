@@ -0,0 +1,36 @@
+import ipaddress
+import random
+
+from cidr_index import CidrOverlapIndex
+
+
+def overlapping(network, admitted):
+    return [str(other) for other in admitted if network.overlaps(other)]
+
+
+def test_admit_rejects_what_overlaps_an_admitted_prefix():
+    rng = random.Random(7)
+    index = CidrOverlapIndex()
+    admitted = []
+    for number in range(1000):
+        network = ipaddress.ip_network((0x0A000000 | rng.getrandbits(24), rng.choice([12, 16, 20, 24, 28])), strict=False)
+        conflict = index.admit(str(network), f"vpc{number}", "acc1", "us-east-1")
+        expected = overlapping(network, admitted)
+        if expected:
+            assert conflict is not None and conflict[0] in expected
+        else:
+            assert conflict is None
+            admitted.append(network)
+    assert 100 < len(admitted) < 1000
+
+
+def test_admit_ignores_the_live_vpc_of_the_declared_one():
+    index = CidrOverlapIndex()
+    index.admit("10.0.0.0/16", "vpc1", "acc1", "us-east-1", live=True)
+    index.admit("10.1.0.0/24", "other", "acc1", "us-east-1", live=True)
+
+    assert index.admit("10.0.0.0/16", "vpc1", "acc1", "us-east-1", live_name="vpc1") is None
+    assert index.admit("10.1.0.0/16", "vpc2", "acc1", "us-east-1") == ("10.1.0.0/24", "other", True)
+    assert index.admit("10.1.0.0/16", "vpc2", "acc1", "us-west-2") is None
+    assert index.admit("10.1.0.0/16", "vpc2", "acc1", "us-east-1", "other-domain") is None
+
@@ -0,0 +1,93 @@
+import marshal
+import os
+import pickle
+import stat
+
+import config_loader
+from config_snapshot import ConfigSnapshot
+from unit_manifest import UMASK
+
+VPC = "kind: VPC\nmetadata:\n  name: vpc1\nspec:\n  environment: {}\n"
+
+
+def load(snapshot, config_dir):
+    return {os.path.basename(path): documents for path, documents, _ in snapshot.load(config_dir)}
+
+
+def test_hashes_the_bytes_that_were_parsed(aws_dir, tmp_path, monkeypatch):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    config_file = config_dir / "vpc1.yaml"
+    config_file.write_text(VPC.format("dev"))
+    snapshot_file = str(tmp_path / ".config-snapshot")
+
+    parse_documents = config_loader.parse_documents
+
+    def parse_then_edit(stream, file_path, kinds=None):
+        documents = parse_documents(stream, file_path, kinds)
+        # Same size, so only the hash can tell the edit apart
+        config_file.write_text(VPC.format("stg"))
+        return documents
+
+    monkeypatch.setattr(config_loader, "parse_documents", parse_then_edit)
+    first = load(ConfigSnapshot(snapshot_file), str(config_dir))
+    monkeypatch.undo()
+    snapshot = ConfigSnapshot(snapshot_file)
+    second = load(snapshot, str(config_dir))
+
+    assert first["vpc1.yaml"][0]["spec"]["environment"] == "dev"
+    assert second["vpc1.yaml"][0]["spec"]["environment"] == "stg"
+    assert snapshot.stats["parsed"] == 1
+
+
+def test_files_that_failed_to_parse_are_parsed_again(aws_dir, tmp_path, capsys):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "broken.yaml").write_text("kind: VPC\nspec: [\n")
+    snapshot_file = str(tmp_path / ".config-snapshot")
+
+    load(ConfigSnapshot(snapshot_file), str(config_dir))
+    snapshot = ConfigSnapshot(snapshot_file)
+    assert load(snapshot, str(config_dir)) == {"broken.yaml": []}
+
+    assert snapshot.stats["parsed"] == 1
+    assert capsys.readouterr().out.count("Error parsing YAML file") == 2
+
+
+def test_snapshot_is_not_private_to_its_writer(aws_dir, tmp_path):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "vpc1.yaml").write_text(VPC.format("dev"))
+    snapshot_file = str(tmp_path / ".config-snapshot")
+
+    load(ConfigSnapshot(snapshot_file), str(config_dir))
+    assert stat.S_IMODE(os.stat(snapshot_file).st_mode) == 0o666 & ~UMASK
+
+    os.chmod(snapshot_file, 0o640)
+    (config_dir / "vpc2.yaml").write_text(VPC.format("dev").replace("vpc1", "vpc2"))
+    load(ConfigSnapshot(snapshot_file), str(config_dir))
+    assert stat.S_IMODE(os.stat(snapshot_file).st_mode) == 0o640
+
+
+def test_snapshot_holds_data_only(aws_dir, tmp_path, capsys):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "vpc1.yaml").write_text(VPC.format("dev"))
+    (config_dir / "dated.yaml").write_text(VPC.format("dev").replace("vpc1", "dated") + "  created: 2024-01-01\n")
+    snapshot_file = tmp_path / ".config-snapshot"
+
+    load(ConfigSnapshot(str(snapshot_file)), str(config_dir))
+    with open(snapshot_file, "rb") as file:
+        assert sorted(os.path.basename(path) for path in marshal.load(file)["files"]) == ["vpc1.yaml"]
+
+    snapshot = ConfigSnapshot(str(snapshot_file))
+    documents = load(snapshot, str(config_dir))
+    assert str(documents["dated.yaml"][0]["spec"]["created"]) == "2024-01-01"
+    assert snapshot.stats == {"reused": 1, "parsed": 1, "removed": 0, "validated": 0}
+
+    # Anything else, such as a pickle, is ignored
+    snapshot_file.write_bytes(pickle.dumps({"version": 2}))
+    snapshot = ConfigSnapshot(str(snapshot_file))
+    load(snapshot, str(config_dir))
+    assert "Ignoring unreadable config snapshot" in capsys.readouterr().out
+    assert snapshot.stats["parsed"] == 2
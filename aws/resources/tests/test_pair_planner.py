@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import trafficplatform_aws_v1_core_network_attachment_processor as processor_module
+from conftest import RESOURCE_DIR
+from pair_planner import PairPlanner
+from trafficplatform_aws_v1_core_network_attachment_processor import CoreNetworkAttachmentProcessor
+from unit_manifest import UnitManifest
+
+VPCS = [
+    {"vpc_id": "vpc-1", "vpc_name": "vpc1"},
+    {"vpc_id": "vpc-2", "vpc_name": "vpc2"},
+    {"vpc_id": "vpc-3", "vpc_name": "vpc3"},
+]
+ANALYZER_DIR = "live/acc1/ReachabilityAnalyzer"
+
+
+@pytest.fixture
+def work_dir(tmp_path, monkeypatch):
+    """An empty `aws` folder with the real templates, and a manifest of its own."""
+    os.symlink(RESOURCE_DIR, tmp_path / "resources")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(processor_module, "unit_manifest", UnitManifest())
+    return tmp_path
+
+
+def analyze(vpcs, strategy, prune_pairs=False):
+    processor = CoreNetworkAttachmentProcessor([], prune_pairs=prune_pairs)
+    processor.process_network_path_analysis(vpcs, "acc1", "config/acc1.yaml", "us-east-1", {"strategy": strategy})
+    return sorted(os.listdir(ANALYZER_DIR))
+
+
+def test_missing_inputs_leave_the_plan_undecided():
+    planner = PairPlanner("hub_spoke")
+    assert planner.plan(VPCS) == {} and planner.undecided
+
+    planner = PairPlanner("full_mesh")
+    assert planner.plan([]) == {} and planner.undecided
+    assert len(planner.plan(VPCS)) == 6 and planner.undecided is None
+
+
+def test_undecided_plan_keeps_existing_pairs(work_dir):
+    pairs = analyze(VPCS, "full_mesh")
+    assert len(pairs) == 7  # 6 pairs and the state file
+
+    assert analyze(VPCS, "hub_spoke", prune_pairs=True) == pairs
+    assert analyze([], "full_mesh", prune_pairs=True) == pairs
+    assert processor_module.unit_manifest.orphans() == []
+
+
+def test_unplanned_pairs_are_only_deleted_when_pruning(work_dir, capsys):
+    analyze(VPCS, "full_mesh")
+    settings = {"strategy": "hub_spoke", "probe_vpcs": ["vpc1"]}
+
+    processor = CoreNetworkAttachmentProcessor([])
+    processor.process_network_path_analysis(VPCS, "acc1", "config/acc1.yaml", "us-east-1", settings)
+    assert "2 stale" in capsys.readouterr().out
+    assert "vpc2_to_vpc3" in os.listdir(ANALYZER_DIR)
+
+    processor = CoreNetworkAttachmentProcessor([], prune_pairs=True)
+    processor.process_network_path_analysis(VPCS, "acc1", "config/acc1.yaml", "us-east-1", settings)
+    assert "2 pruned, 0 stale" in capsys.readouterr().out
+    assert sorted(os.listdir(ANALYZER_DIR)) == [
+        ".pairs-us-east-1.json", "vpc1_to_vpc2", "vpc1_to_vpc3", "vpc2_to_vpc1", "vpc3_to_vpc1",
+    ]
@@ -0,0 +1,63 @@
+from route_graph import NO_VPC_ROUTE, REACHABLE, UNKNOWN, RouteModel
+
+TGW_ID = "tgw-1"
+
+
+def vpc(vpc_id, cidr, tgw_routes):
+    return {"vpc_id": vpc_id, "cidr_block": cidr, "transit_gateway_id": TGW_ID, "tgw_routes": {f"rtb-{vpc_id}": tgw_routes}}
+
+
+def routing(truncated=False):
+    return {TGW_ID: {
+        "transit_gateway_id": TGW_ID,
+        "attachments": {"tgw-attach-a": "vpc-a", "tgw-attach-b": "vpc-b", "tgw-attach-c": "vpc-c"},
+        "route_tables": [{
+            "route_table_id": "tgw-rtb-1",
+            "truncated": truncated,
+            "associations": ["tgw-attach-a", "tgw-attach-b", "tgw-attach-c"],
+            "propagations": ["tgw-attach-a", "tgw-attach-b", "tgw-attach-c"],
+            "routes": [
+                {"cidr": "10.0.0.0/24", "state": "active", "attachment_ids": ["tgw-attach-a"]},
+                {"cidr": "10.0.1.0/24", "state": "active", "attachment_ids": ["tgw-attach-b"]},
+                {"cidr": "10.0.2.0/24", "state": "active", "attachment_ids": ["tgw-attach-c"]},
+            ],
+        }],
+    }}
+
+
+VPCS = [
+    vpc("vpc-a", "10.0.0.0/24", ["10.0.0.0/16"]),
+    vpc("vpc-b", "10.0.1.0/24", ["10.0.0.0/16"]),
+    # Only routes to vpc-a
+    vpc("vpc-c", "10.0.2.0/24", ["10.0.0.0/24"]),
+]
+
+
+def test_complete_routes_are_modelled():
+    model = RouteModel(VPCS, routing())
+
+    assert model.verdict(VPCS[0], VPCS[1]) == REACHABLE
+    assert model.verdict(VPCS[2], VPCS[0]) == REACHABLE
+    assert model.verdict(VPCS[2], VPCS[1]) == NO_VPC_ROUTE
+
+
+def test_truncated_route_table_makes_its_pairs_unknown():
+    model = RouteModel(VPCS, routing(truncated=True))
+
+    # The routes that were fetched would say reachable, but a more specific one may be missing
+    assert model.verdict(VPCS[0], VPCS[1]) == UNKNOWN
+    assert model.verdict(VPCS[2], VPCS[0]) == UNKNOWN
+    # VPC routes are complete, so a missing VPC route is still a finding
+    assert model.verdict(VPCS[2], VPCS[1]) == NO_VPC_ROUTE
+    verdicts = {(source["vpc_id"], target["vpc_id"]): verdict for source, target, verdict in model.unreachable()}
+    assert len(verdicts) == model.pair_count()
+    assert verdicts[("vpc-c", "vpc-b")] == NO_VPC_ROUTE
+    assert set(verdicts.values()) == {UNKNOWN, NO_VPC_ROUTE}
+
+
+def test_routing_without_the_truncated_flag_is_complete():
+    """Inventory snapshots written before route tables were flagged stay usable."""
+    data = routing()
+    del data[TGW_ID]["route_tables"][0]["truncated"]
+
+    assert RouteModel(VPCS, data).verdict(VPCS[0], VPCS[1]) == REACHABLE
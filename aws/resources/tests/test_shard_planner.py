@@ -0,0 +1,55 @@
+import pytest
+
+from shard_planner import plan_shards, plan_waves, select_units
+
+VPC = "live/acc1/VPC/vpc1"
+ATTACHMENT = "live/acc1/CoreNetworkAttachment/vpc1"
+ANALYZER = "live/acc1/ReachabilityAnalyzer/vpc1-vpc2"
+OTHER_VPC = "live/acc1/VPC/vpc2"
+
+UNITS = {
+    VPC: [],
+    OTHER_VPC: [],
+    ATTACHMENT: [VPC],
+    ANALYZER: [ATTACHMENT],
+}
+
+
+def test_waves_follow_dependencies():
+    assert plan_waves(UNITS) == [[VPC, OTHER_VPC], [ATTACHMENT], [ANALYZER]]
+
+
+def test_selection_keeps_ordering_through_unselected_units():
+    selected = select_units(UNITS, [VPC, ANALYZER])
+
+    assert selected == {VPC: [], ANALYZER: [VPC]}
+    assert plan_waves(selected) == [[VPC], [ANALYZER]]
+
+
+def test_selection_follows_chains_of_unselected_units():
+    units = {"a": [], "b": ["a"], "c": ["b"], "d": ["c", "x"], "x": []}
+
+    assert select_units(units, ["a", "d"]) == {"a": [], "d": ["a"]}
+    assert select_units(units, ["a", "c", "d"]) == {"a": [], "c": ["a"], "d": ["c"]}
+    assert select_units(units, ["d"]) == {"d": []}
+
+
+def test_selection_skips_unknown_units(capsys):
+    assert select_units(UNITS, [VPC, "live/acc1/VPC/gone"]) == {VPC: []}
+    assert "live/acc1/VPC/gone not found" in capsys.readouterr().out
+
+
+def test_cycles_through_unselected_units_are_reported():
+    units = {"a": ["y"], "y": ["b"], "b": ["a"]}
+
+    with pytest.raises(ValueError, match="cycle"):
+        plan_waves(select_units(units, ["a", "b"]))
+
+
+def test_shards_balance_each_wave():
+    plan = plan_shards(UNITS, 2, durations={VPC: 3.0, OTHER_VPC: 1.0})
+
+    assert [len(wave["shards"]) for wave in plan["waves"]] == [2, 2, 2]
+    assert plan["units"][ANALYZER] == {"wave": 2, "shard": 0, "dependencies": [ATTACHMENT]}
+    # Units without a recorded duration weigh the mean duration
+    assert plan["estimate"] == 3.0 + 2.0 + 2.0
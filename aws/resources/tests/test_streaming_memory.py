@@ -0,0 +1,44 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+from conftest import BENCHMARK_DIR, RESOURCE_DIR
+
+sys.path.insert(0, BENCHMARK_DIR)
+
+from bench_pipeline import synthetic_vpcs, write_config_tree  # noqa: E402
+from bench_streaming import MODES, run_mode  # noqa: E402
+
+# Streamed generation of 100k VPC units peaks around 215MiB. What stays in memory is the
+# cross-resource state (manifest entries, CIDR index, declared VPC index), not the resources.
+MAX_STREAM_RSS_MB = 320
+
+
+# The small run checks the measurement itself, the full one only runs with --runslow
+@pytest.mark.parametrize("vpcs", [1000, pytest.param(100000, marks=pytest.mark.slow)])
+def test_streamed_generation_peak_rss(tmp_path, capsys, record_property, vpcs):
+    write_config_tree(str(tmp_path / "config"), synthetic_vpcs(vpcs, 100, 4))
+    # Template and schema paths are relative to the `aws` folder
+    os.symlink(os.path.abspath(RESOURCE_DIR), tmp_path / "resources")
+
+    # Peak RSS of the main.py child process, from wait4
+    try:
+        result = run_mode(str(tmp_path), MODES["stream"], load_jobs=1)
+    finally:
+        # pytest keeps the last few temporary directories, these hold 200k files
+        for directory in ("config", "live"):
+            shutil.rmtree(tmp_path / directory, ignore_errors=True)
+
+    record_property("stream_peak_rss_mb", round(result["peak_rss_mb"], 1))
+    with capsys.disabled():
+        print(
+            f"\nmain.py --stream, {vpcs} VPCs: peak RSS {result['peak_rss_mb']:.1f}MiB, "
+            f"first unit after {result['first_unit_seconds']:.2f}s, {result['total_seconds']:.1f}s in total"
+        )
+    assert result["units"] == vpcs
+    assert 0 < result["peak_rss_mb"] < MAX_STREAM_RSS_MB
+    if vpcs >= 100000:
+        # The first unit is written long before the config is fully loaded
+        assert result["first_unit_seconds"] < result["total_seconds"] / 10
@@ -0,0 +1,54 @@
+import os
+
+from tgw_registry import TransitGatewayRegistry
+
+TGW_FILE = """\
+kind: TransitGateway
+metadata:
+  name: {name}
+spec:
+  transit_gateways:
+    - id: {tgw_id}
+      region: us-east-1
+"""
+
+
+class Resource:
+    def __init__(self, name, spec):
+        self.metadata = {"name": name}
+        self.spec = spec
+
+
+def write_tgw(directory, name, tgw_id):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{name}.yaml"), "w") as file:
+        file.write(TGW_FILE.format(name=name, tgw_id=tgw_id))
+
+
+def test_first_follows_sorted_file_order(tmp_path):
+    # Created out of order, so the directory listing order differs from the sorted one
+    write_tgw(tmp_path / "zz", "tgw-z", "tgw-2")
+    write_tgw(tmp_path / "aa", "tgw-a", "tgw-1")
+    write_tgw(tmp_path / "aa" / "nested", "tgw-n", "tgw-3")
+    (tmp_path / "other.yaml").write_text("kind: VPC\nmetadata:\n  name: vpc1\n")
+
+    registry = TransitGatewayRegistry(policy="first")
+    registry.load_directory(str(tmp_path))
+
+    assert [tgw["id"] for tgw in registry.candidates("us-east-1")] == ["tgw-1", "tgw-3", "tgw-2"]
+    assert registry.find("us-east-1") == "tgw-1"
+
+
+def test_registering_again_replaces_entries(tmp_path):
+    write_tgw(tmp_path, "tgw-a", "tgw-1")
+    write_tgw(tmp_path, "tgw-b", "tgw-2")
+    registry = TransitGatewayRegistry(policy="strict")
+    registry.register(Resource("tgw-a", {"transit_gateways": [{"id": "tgw-1", "region": "us-east-1", "default": True}]}))
+    registry.load_directory(str(tmp_path))
+    assert [tgw["id"] for tgw in registry.candidates("us-east-1")] == ["tgw-1", "tgw-2"]
+
+    registry.register(Resource("tgw-b", {"transit_gateways": [{"id": "tgw-3", "region": "us-east-1"}]}))
+    assert [tgw["id"] for tgw in registry.candidates("us-east-1")] == ["tgw-1", "tgw-3"]
+
+    registry.register(Resource("tgw-b", {"transit_gateways": []}))
+    assert registry.find("us-east-1") == "tgw-1"
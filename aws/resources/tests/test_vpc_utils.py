@@ -0,0 +1,168 @@
+import pytest
+from botocore.stub import Stubber
+
+import vpc_utils
+from aws_clients import ClientPool
+
+REGION = "us-east-1"
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = ClientPool(sleep=lambda seconds: None)
+    monkeypatch.setattr(vpc_utils, "client_pool", pool)
+    return pool
+
+
+def vpc_id(i):
+    return f"vpc-{i:017x}"
+
+
+def pages(items, page_size):
+    """Split items into pages of at most page_size, all but the last with a NextToken."""
+    chunks = [items[start:start + page_size] for start in range(0, len(items), page_size)] or [[]]
+    return [(chunk, f"token-{n + 1}" if n + 1 < len(chunks) else None) for n, chunk in enumerate(chunks)]
+
+
+def add_pages(stubber, operation, result_key, items, page_size, filters):
+    """Queue the paged responses of one describe call, checking the filters of every page."""
+    previous_token = None
+    for chunk, next_token in pages(items, page_size):
+        response = {result_key: chunk}
+        if next_token:
+            response["NextToken"] = next_token
+        expected = {"Filters": filters}
+        if previous_token:
+            expected["NextToken"] = previous_token
+        stubber.add_response(operation, response, expected)
+        previous_token = next_token
+
+
+def stub_discovery(stubber, vpc_count, page_size, other_vpcs=0):
+    """
+    Stub the VPC, subnet and route table sweeps of a region with vpc_count tagged VPCs,
+    two subnets and one route table each. other_vpcs adds subnets and route tables of
+    VPCs that are not tagged, which a region-wide sweep also returns.
+
+    Returns:
+        int: The number of calls discovery should make.
+    """
+    ids = [vpc_id(i) for i in range(vpc_count)]
+    vpcs = [
+        {"VpcId": vpc, "CidrBlock": f"10.{i // 256}.{i % 256}.0/24", "Tags": [{"Key": "Name", "Value": f"vpc{i}"}]}
+        for i, vpc in enumerate(ids)
+    ]
+    owners = ids + [vpc_id(vpc_count + i) for i in range(other_vpcs)]
+    subnets = [{"SubnetId": f"subnet-{i:015x}{n}", "VpcId": vpc} for i, vpc in enumerate(owners) for n in range(2)]
+    route_tables = [
+        {
+            "RouteTableId": f"rtb-{i:017x}",
+            "VpcId": vpc,
+            "Routes": [{"DestinationCidrBlock": "10.0.0.0/8", "TransitGatewayId": "tgw-1", "State": "active"}],
+        }
+        for i, vpc in enumerate(owners)
+    ]
+
+    tag_filter = [vpc_utils.TGW_ATTACHMENT_FILTER]
+    if vpc_count <= vpc_utils.VPC_ID_FILTER_LIMIT:
+        filters = [{"Name": "vpc-id", "Values": ids}, vpc_utils.TGW_ATTACHMENT_FILTER]
+    else:
+        filters = tag_filter
+    add_pages(stubber, "describe_vpcs", "Vpcs", vpcs, page_size, tag_filter)
+    add_pages(stubber, "describe_subnets", "Subnets", subnets, page_size, filters)
+    add_pages(stubber, "describe_route_tables", "RouteTables", route_tables, page_size, filters)
+    return sum(len(pages(items, page_size)) for items in (vpcs, subnets, route_tables))
+
+
+@pytest.mark.parametrize("vpc_count, page_size, other_vpcs", [
+    (2, 1000, 0),
+    (2, 1, 0),
+    (150, 100, 0),
+    (200, 1000, 0),
+    (201, 1000, 0),
+    (450, 200, 30),
+])
+def test_discovery_makes_a_constant_number_of_paged_calls(pool, ec2_client, vpc_count, page_size, other_vpcs):
+    stubber = Stubber(ec2_client)
+    expected_calls = stub_discovery(stubber, vpc_count, page_size, other_vpcs)
+
+    with stubber:
+        vpcs = vpc_utils.find_vpcs_with_tgw_attachment("acc1", REGION, ec2=ec2_client)
+        stubber.assert_no_pending_responses()
+
+    assert pool.stats() == {"calls": expected_calls, "throttles": 0, "retries": 0}
+    # Paging aside, one call each for VPCs, subnets and route tables, however many VPCs there are
+    assert expected_calls == sum(-(-count // page_size) for count in (
+        vpc_count, 2 * (vpc_count + other_vpcs), vpc_count + other_vpcs
+    ))
+    assert [vpc["vpc_id"] for vpc in vpcs] == [vpc_id(i) for i in range(vpc_count)]
+    first = vpcs[0]
+    assert first["vpc_name"] == "vpc0"
+    assert first["subnet_ids"] == (f"subnet-{0:015x}0", f"subnet-{0:015x}1")
+    assert first["route_table_ids"] == (f"rtb-{0:017x}",)
+    assert first["tgw_routes"] == {f"rtb-{0:017x}": ("10.0.0.0/8",)}
+
+
+def test_more_vpcs_than_a_filter_takes_sweep_the_region(pool, ec2_client):
+    """Past 200 VPC IDs, subnets and route tables come from one tag-filtered sweep, grouped client-side."""
+    stubber = Stubber(ec2_client)
+    stub_discovery(stubber, vpc_utils.VPC_ID_FILTER_LIMIT + 1, 1000, other_vpcs=5)
+
+    with stubber:
+        vpcs = vpc_utils.find_vpcs_with_tgw_attachment("acc1", REGION, ec2=ec2_client)
+        stubber.assert_no_pending_responses()
+
+    assert pool.stats()["calls"] == 3
+    # Subnets and route tables of the untagged VPCs are dropped
+    assert len(vpcs) == vpc_utils.VPC_ID_FILTER_LIMIT + 1
+    assert all(len(vpc["subnet_ids"]) == 2 and len(vpc["route_table_ids"]) == 1 for vpc in vpcs)
+
+
+def test_no_tagged_vpcs_skips_the_subnet_and_route_table_sweeps(pool, ec2_client):
+    stubber = Stubber(ec2_client)
+    stubber.add_response("describe_vpcs", {"Vpcs": []}, {"Filters": [vpc_utils.TGW_ATTACHMENT_FILTER]})
+
+    with stubber:
+        assert vpc_utils.find_vpcs_with_tgw_attachment("acc1", REGION, ec2=ec2_client) == []
+        stubber.assert_no_pending_responses()
+
+    assert pool.stats()["calls"] == 1
+
+
+def stub_tgw_routing(stubber, additional_routes_available):
+    tgw_filter = {"Name": "transit-gateway-id", "Values": ["tgw-1"]}
+    stubber.add_response("describe_transit_gateway_attachments", {"TransitGatewayAttachments": [
+        {"TransitGatewayAttachmentId": "tgw-attach-a", "ResourceId": "vpc-a"},
+    ]})
+    stubber.add_response("describe_transit_gateway_route_tables", {"TransitGatewayRouteTables": [
+        {"TransitGatewayRouteTableId": "tgw-rtb-1"},
+    ]}, {"Filters": [tgw_filter]})
+    stubber.add_response("get_transit_gateway_route_table_associations", {"Associations": [
+        {"TransitGatewayAttachmentId": "tgw-attach-a", "State": "associated"},
+    ]})
+    stubber.add_response("get_transit_gateway_route_table_propagations", {"TransitGatewayRouteTablePropagations": [
+        {"TransitGatewayAttachmentId": "tgw-attach-a", "State": "enabled"},
+    ]})
+    stubber.add_response("search_transit_gateway_routes", {
+        "Routes": [{
+            "DestinationCidrBlock": "10.0.0.0/24",
+            "State": "active",
+            "TransitGatewayAttachments": [{"TransitGatewayAttachmentId": "tgw-attach-a"}],
+        }],
+        "AdditionalRoutesAvailable": additional_routes_available,
+    })
+
+
+@pytest.mark.parametrize("additional_routes_available", [False, True])
+def test_tgw_route_tables_with_more_routes_are_marked_truncated(pool, ec2_client, additional_routes_available):
+    stubber = Stubber(ec2_client)
+    stub_tgw_routing(stubber, additional_routes_available)
+
+    with stubber:
+        routing = vpc_utils.find_tgw_routing(REGION, "tgw-1", ec2=ec2_client)
+        stubber.assert_no_pending_responses()
+
+    assert routing["attachments"] == {"tgw-attach-a": "vpc-a"}
+    route_table = routing["route_tables"][0]
+    assert route_table["truncated"] is additional_routes_available
+    assert route_table["routes"] == [{"cidr": "10.0.0.0/24", "state": "active", "attachment_ids": ["tgw-attach-a"]}]
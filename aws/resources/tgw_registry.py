@@ -0,0 +1,137 @@
+import os
+from config_loader import load_documents
+
+SELECTION_POLICIES = ("first", "default", "strict")
+
+
+class TransitGatewayRegistry:
+    """
+    Index of Transit Gateways declared by TransitGateway resources.
+
+    TGWs are indexed by region and by (account_id, region), so lookups are O(1).
+    Entries that carry an `account_id` only apply to that account; entries without
+    one apply to every account in their region. When several TGWs match, the
+    selection policy decides:
+
+    - first:   the first TGW in declaration order
+    - default: the TGW marked `default: true`, otherwise the first one
+    - strict:  ambiguity is an error and no TGW is returned
+    """
+
+    def __init__(self, policy="default"):
+        self.policy = policy
+        self._entries = {}  # (source, tgw id) -> entry, in declaration order
+        self._by_region = {}
+        self._by_account_region = {}
+        self._indexed = True
+        self._loaded = False
+
+    def configure(self, policy=None):
+        if policy is not None:
+            if policy not in SELECTION_POLICIES:
+                raise ValueError(f"Unknown TGW selection policy: {policy}")
+            self.policy = policy
+
+    def register(self, resource):
+        """Index all transit gateways of a TransitGateway resource."""
+        self.register_document(resource.metadata["name"], resource.spec)
+
+    def register_document(self, name, spec):
+        """
+        Index all transit gateways listed in a TransitGateway spec. Registering a resource
+        again replaces its entries, which keep their place in the declaration order.
+        """
+        self._loaded = True
+        tgws = spec.get("transit_gateways", [])
+        keys = {(name, tgw.get("id")) for tgw in tgws}
+        for key in [key for key in self._entries if key[0] == name and key not in keys]:
+            del self._entries[key]
+        for tgw in tgws:
+            self._entries[(name, tgw.get("id"))] = dict(tgw, source=name)
+        self._indexed = False
+
+    def _index(self):
+        """Rebuild the region and account lookups after registrations."""
+        if self._indexed:
+            return
+        # Built aside and swapped in, so concurrent lookups never see a partial index
+        by_region = {}
+        by_account_region = {}
+        for entry in list(self._entries.values()):
+            account_id = entry.get("account_id")
+            if account_id:
+                by_account_region.setdefault((account_id, entry["region"]), []).append(entry)
+            else:
+                by_region.setdefault(entry["region"], []).append(entry)
+        self._by_region, self._by_account_region = by_region, by_account_region
+        self._indexed = True
+
+    def load_directory(self, input_dir):
+        """
+        Register every TransitGateway document found in the YAML files of a directory, in
+        file order. Files that do not declare the kind are skipped without being parsed.
+        """
+        for _, documents in load_documents(input_dir, {"TransitGateway"}):
+            for document in documents:
+                self.register_document(document["metadata"]["name"], document.get("spec", {}))
+        self._loaded = True
+
+    def ensure_loaded(self, input_dir=None):
+        """Load TransitGateway documents from the config directory unless resources were already registered."""
+        if not self._loaded:
+            self.load_directory(input_dir or os.path.join(os.getcwd(), "config"))
+
+    def candidates(self, region, account_id=None):
+        """Return the TGWs that apply to an account and region, account-specific ones first."""
+        self.ensure_loaded()
+        self._index()
+        if account_id:
+            account_tgws = self._by_account_region.get((account_id, region))
+            if account_tgws:
+                return account_tgws
+        return self._by_region.get(region, [])
+
+    def select(self, region, account_id=None):
+        """
+        Select the TGW entry for a region (and optionally account) according to the selection policy.
+
+        Returns:
+            dict: The TGW entry, with the `source` TransitGateway resource it was declared in,
+                if found, otherwise None.
+        """
+        tgws = self.candidates(region, account_id)
+        if not tgws:
+            return None
+        if len(tgws) == 1 or self.policy == "first":
+            return tgws[0]
+
+        if self.policy == "strict":
+            tgw_ids = ", ".join(tgw["id"] for tgw in tgws)
+            print(f"Multiple Transit Gateways found for region {region}: {tgw_ids}")
+            return None
+
+        for tgw in tgws:
+            if tgw.get("default"):
+                return tgw
+        return tgws[0]
+
+    def find(self, region, account_id=None):
+        """
+        Select the TGW ID for a region (and optionally account) according to the selection policy.
+
+        Returns:
+            str: The TGW ID if found, otherwise None.
+        """
+        tgw = self.select(region, account_id)
+        return tgw["id"] if tgw else None
+
+    def clear(self):
+        self._entries.clear()
+        self._by_region = {}
+        self._by_account_region = {}
+        self._indexed = True
+        self._loaded = False
+
+
+# Process-wide registry shared by validation and processing
+tgw_registry = TransitGatewayRegistry()
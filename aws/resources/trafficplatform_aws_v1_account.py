@@ -2,6 +2,8 @@ from base_resource import BaseResource
 
 
 class AccountResource(BaseResource):
+    __slots__ = ()
+
     SCHEMA_FILE = "resources/schemas/account_schema.json"
     TEMPLATE_FILE = "resources/templates/account_terragrunt.hcl.j2"
 
@@ -9,4 +11,4 @@ class AccountResource(BaseResource):
         return super().validate(self.SCHEMA_FILE)
 
     def transform(self):
-        raise NotImplementedError("Transformation is not supported for AccountResource.")
\ No newline at end of file
+        return super().transform(self.TEMPLATE_FILE)
\ No newline at end of file
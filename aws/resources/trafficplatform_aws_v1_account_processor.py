@@ -7,7 +7,7 @@ class AccountProcessor(BaseProcessor):
         seen_names = set()
 
         for resource in self.resources:
-            resource_name = resource["metadata"]["name"]
+            resource_name = resource.metadata["name"]
 
             # Check for duplicate resource names
             if resource_name in seen_names:
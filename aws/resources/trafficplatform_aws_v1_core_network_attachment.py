@@ -1,8 +1,11 @@
 from base_resource import BaseResource
-from vpc_utils import find_vpcs_with_tgw_attachment, find_tgw_id
+from declared_vpcs import declared_vpcs
+from vpc_utils import find_tgw_id
 
 
 class CoreNetworkAttachmentResource(BaseResource):
+    __slots__ = ()
+
     SCHEMA_FILE = "resources/schemas/core_network_attachment_schema.json"
     TEMPLATE_FILE = "resources/templates/core_network_attachment_terragrunt.hcl.j2"
 
@@ -16,7 +19,7 @@ class CoreNetworkAttachmentResource(BaseResource):
             return False
 
         # Validate that the region has a valid Transit Gateway
-        transit_gateway_id = find_tgw_id(self.spec["region"])
+        transit_gateway_id = find_tgw_id(self.spec["region"], self.spec["account_id"])
         if not transit_gateway_id:
             print(
                 f"Validation error: No Transit Gateway found for region {self.spec['region']}. "
@@ -25,7 +28,7 @@ class CoreNetworkAttachmentResource(BaseResource):
             return False
 
         # Find VPCs with TGW attachment
-        vpcs = find_vpcs_with_tgw_attachment(self.spec["account_id"], self.spec["region"])
+        vpcs = declared_vpcs.get_vpcs(self.spec["account_id"], self.spec["region"])
         if not vpcs:
             print(
                 f"Validation error: No VPCs with Transit Gateway attachments found for account "
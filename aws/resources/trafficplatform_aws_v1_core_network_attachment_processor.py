@@ -1,32 +1,50 @@
 from base_processor import BaseProcessor
-from vpc_utils import find_vpcs_with_tgw_attachment, find_tgw_id
+from instrumentation import metrics
+from declared_vpcs import declared_vpcs
+from inventory_cache import inventory_cache
+from tgw_registry import tgw_registry
+from vpc_utils import find_tgw_id
 import json
-from jinja2 import Template
+import os
+from template_registry import template_registry
+from unit_manifest import unit_manifest
+from pair_planner import PairPlanner, PairState
+from route_graph import RouteModel
 from pathlib import Path
 
 
 class CoreNetworkAttachmentProcessor(BaseProcessor):
-    def process(self):
+    REACHABILITY_TEMPLATE_FILE = "resources/templates/reachability_analyzer_terragrunt.hcl.j2"
+    DEPENDS_ON = ("TransitGateway", "VPC")
+
+    def __init__(self, resources, pair_strategy=None, prune_pairs=False):
+        super().__init__(resources)
+        self.pair_strategy = pair_strategy  # Default strategy for resources without a reachability block
+        self.prune_pairs = prune_pairs  # Delete pair units that are no longer planned, as --prune-orphans does
+
+    def process_resources(self):
         """
-        Process the resources: validate and transform them. Generate one terragrunt.hcl
-        for each VPC found in the specified account and region. Additionally, generate
-        reachability analysis terragrunt files for each VPC pair.
+        Transform the resources. Generate one terragrunt.hcl for each VPC found in the
+        specified account and region. Additionally, generate reachability analysis
+        terragrunt files for each VPC pair.
         """
-        if not self.validate():
-            return None
-
         processed_vpcs = []  # Global list of all processed VPCs
+        account_id = None
+        region = None
+        reachability = None
 
         for resource in self.resources:
             if not self.validate_resource(resource):
                 print(f"Validation failed for resource {resource.metadata['name']}")
+                metrics.count("resources_failed", kind=resource.kind, account=resource.spec.get("account_id"), reason="validation")
                 continue
 
             try:
                 # Find VPCs with TGW attachment in the specified account and region
                 account_id = resource.spec.get("account_id")
                 region = resource.spec.get("region")
-                vpcs = find_vpcs_with_tgw_attachment(account_id, region)
+                reachability = resource.spec.get("reachability") or reachability
+                vpcs = declared_vpcs.get_vpcs(account_id, region)
 
                 if not vpcs:
                     raise ValueError(
@@ -35,27 +53,37 @@ class CoreNetworkAttachmentProcessor(BaseProcessor):
                     )
 
                 # Get Transit Gateway ID
-                transit_gateway_id = find_tgw_id(region)
+                transit_gateway_id = find_tgw_id(region, account_id)
                 if not transit_gateway_id:
                     raise ValueError(
                         f"No Transit Gateway found for region {region}. "
                         "Please check your TGW configuration."
                     )
 
-                # Render and write one terragrunt.hcl file per VPC
+                # Render and write one terragrunt.hcl file per VPC, skipping unchanged ones
                 for vpc in vpcs:
+                    context = self.attachment_context(vpc, transit_gateway_id, resource)
+                    if unit_manifest.is_current(
+                        str(self.unit_path(resource, vpc)), context, resource.TEMPLATE_FILE, resource.source_path
+                    ):
+                        processed_vpcs.append(dict(vpc, region=region, transit_gateway_id=transit_gateway_id))
+                        continue
+
                     terragrunt_content = self.transform_resource(resource, vpc, transit_gateway_id)
                     if terragrunt_content:
-                        self.write_to_filesystem(resource, vpc, terragrunt_content)
-                        processed_vpcs.append(vpc)  # Add VPC to the processed list
+                        self.write_to_filesystem(resource, vpc, terragrunt_content, context)
+                        processed_vpcs.append(dict(vpc, region=region, transit_gateway_id=transit_gateway_id))  # Add VPC to the processed list
                     else:
                         print(f"Failed to render terragrunt.hcl for VPC {vpc['vpc_id']}")
+                        metrics.count("resources_failed", kind=resource.kind, account=account_id, reason="render")
 
             except ValueError as e:
                 print(f"Error processing resource {resource.metadata['name']}: {e}")
+                metrics.count("resources_failed", kind=resource.kind, account=account_id, reason="error")
 
         # Call the reachability analysis function
-        self.process_network_path_analysis(processed_vpcs, account_id)
+        source_path = self.resources[-1].source_path if self.resources else None
+        self.process_network_path_analysis(processed_vpcs, account_id, source_path, region, reachability)
 
     def validate(self):
         """Validate the list of CoreNetworkAttachment resources."""
@@ -76,19 +104,19 @@ class CoreNetworkAttachmentProcessor(BaseProcessor):
         """Validate a single CoreNetworkAttachment resource."""
         return resource.validate()
 
-    def transform_resource(self, resource, vpc, transit_gateway_id):
+    def attachment_context(self, vpc, transit_gateway_id, resource=None):
         """
-        Transform a single CoreNetworkAttachment resource into terragrunt.hcl content.
+        Build the template inputs for attaching one VPC to the Transit Gateway.
 
         Args:
-            resource: The resource being processed.
             vpc: The VPC data dictionary.
             transit_gateway_id: The Transit Gateway ID for the region.
+            resource: The resource being processed. When given, the units the attachment
+                depends on are added as `dependencies`.
 
         Returns:
-            str: The rendered terragrunt.hcl content.
+            dict: The render context.
         """
-       
         spec = {
             "vpc_id": vpc["vpc_id"],
             "subnet_ids": vpc.get("subnet_ids", []),
@@ -102,73 +130,181 @@ class CoreNetworkAttachmentProcessor(BaseProcessor):
         if not spec["route_table_ids"]:
             raise ValueError(f"No route table IDs found for VPC {vpc['vpc_id']}.")
 
-        # Render the Jinja2 template
-        template_file = resource.TEMPLATE_FILE
-        with open(template_file, 'r') as file:
-            template_content = file.read()
+        dependencies = self.attachment_dependencies(resource, vpc, transit_gateway_id) if resource else []
+        if dependencies:
+            spec["dependencies"] = dependencies
+        return spec
 
-        template = Template(template_content)
-        return template.render(**spec)
+    def attachment_dependencies(self, resource, vpc, transit_gateway_id):
+        """
+        Return the units an attachment has to be applied after, relative to its own unit:
+        the unit of the declared VPC it attaches and the unit of its Transit Gateway.
+        Only units that exist, under live/ or in the run's archive, are returned.
+        """
+        account_id = resource.spec.get("account_id")
+        region = resource.spec.get("region")
+        unit_dirs = []
+
+        vpc_unit_dir = declared_vpcs.unit_dir(account_id, region, vpc.get("vpc_name"))
+        if vpc_unit_dir:
+            unit_dirs.append(vpc_unit_dir)
+
+        # TransitGateway units are named after the resource declaring the TGW
+        tgw = tgw_registry.select(region, account_id)
+        if tgw and tgw["id"] == transit_gateway_id:
+            unit_dirs.append(f"live/{tgw.get('account_id') or account_id}/TransitGateway/{tgw['source']}")
+
+        attachment_dir = str(self.unit_path(resource, vpc).parent)
+        return [os.path.relpath(unit_dir, attachment_dir) for unit_dir in unit_dirs if unit_manifest.has_unit(unit_dir)]
 
-    def write_to_filesystem(self, resource, vpc, terragrunt_content):
+    def transform_resource(self, resource, vpc, transit_gateway_id):
         """
-        Write the rendered terragrunt.hcl content to the filesystem.
+        Transform a single CoreNetworkAttachment resource into terragrunt.hcl content.
 
         Args:
             resource: The resource being processed.
             vpc: The VPC data dictionary.
-            terragrunt_content: The rendered terragrunt.hcl content.
+            transit_gateway_id: The Transit Gateway ID for the region.
+
+        Returns:
+            str: The rendered terragrunt.hcl content.
         """
+        spec = self.attachment_context(vpc, transit_gateway_id, resource)
+
+        # Render the Jinja2 template
+        return template_registry.render(resource.TEMPLATE_FILE, **spec)
+
+    def unit_path(self, resource, vpc):
+        """Return the path of the terragrunt.hcl generated for attaching a VPC."""
         account_id = resource.spec.get("account_id")
-        kind = resource.kind
         vpc_name = vpc.get("vpc_name") or vpc["vpc_id"]
-        live_dir = Path(f"live/{account_id}/{kind}/{vpc_name}")
-        live_dir.mkdir(parents=True, exist_ok=True)
-
-        terragrunt_file_path = live_dir / "terragrunt.hcl"
-        with open(terragrunt_file_path, "w") as terragrunt_file:
-            terragrunt_file.write(terragrunt_content)
+        return Path(f"live/{account_id}/{resource.kind}/{vpc_name}") / "terragrunt.hcl"
 
-        print(f"Generated terragrunt.hcl for {kind} {resource.metadata['name']} at {terragrunt_file_path}")
+    def write_to_filesystem(self, resource, vpc, terragrunt_content, context):
+        """
+        Write the rendered terragrunt.hcl content to the filesystem if it changed.
 
-    def process_network_path_analysis(self, vpcs, account_id):
+        Args:
+            resource: The resource being processed.
+            vpc: The VPC data dictionary.
+            terragrunt_content: The rendered terragrunt.hcl content.
+            context: The render context, recorded in the manifest.
         """
-        Generate reachability analysis terragrunt files for all VPC pairs.
+        terragrunt_file_path = self.unit_path(resource, vpc)
+        written = unit_manifest.write_unit(
+            str(terragrunt_file_path), terragrunt_content, context, resource.TEMPLATE_FILE, resource.source_path
+        )
+        if written:
+            print(f"Generated terragrunt.hcl for {resource.kind} {resource.metadata['name']} at {terragrunt_file_path}")
+
+    def process_network_path_analysis(self, vpcs, account_id, source_path=None, region=None, settings=None):
+        """
+        Generate reachability analysis terragrunt files for the VPC pairs chosen by the
+        pair planner. Pair units of this region that are no longer planned are reported as
+        stale, and deleted when pruning is enabled. When the planner cannot decide (no VPCs,
+        no probe VPCs), the existing pair units and the planner state are left as they are.
 
         Args:
             vpcs: List of processed VPCs.
             account_id: Account ID for the resources.
+            source_path: Config file the pair units are recorded against in the manifest.
+            region: Region of the VPCs, used to keep per-region planner state.
+            settings: The `reachability` block of the CoreNetworkAttachment spec.
         """
-        for source_vpc in vpcs:
-            for target_vpc in vpcs:
-                if source_vpc["vpc_id"] == target_vpc["vpc_id"]:
-                    continue  # Skip pairing a VPC with itself
-
-                # Generate args for the reachability analyzer
-                args = {
-                    "source_vpc_id": source_vpc["vpc_id"],
-                    "target_vpc_id": target_vpc["vpc_id"]
-                }
-
-                # Use VPC names for the directory naming
-                source_vpc_name = source_vpc.get("vpc_name", source_vpc["vpc_id"])
-                target_vpc_name = target_vpc.get("vpc_name", target_vpc["vpc_id"])
-                vpc_pair_name = f"{source_vpc_name}_to_{target_vpc_name}"
-
-                # Render the reachability analyzer terragrunt.hcl content
-                template_file = 'resources/templates/reachability_analyzer_terragrunt.hcl.j2'
-                with open(template_file, 'r') as file:
-                    template_content = file.read()
-
-                template = Template(template_content)
-                content = template.render(**args)
-
-                # Write the rendered content to the filesystem
-                live_dir = Path(f"live/{account_id}/ReachabilityAnalyzer/{vpc_pair_name}")
-                live_dir.mkdir(parents=True, exist_ok=True)
-
-                terragrunt_file_path = live_dir / "terragrunt.hcl"
-                with open(terragrunt_file_path, "w") as terragrunt_file:
-                    terragrunt_file.write(content)
-
-                print(f"Generated reachability analysis terragrunt.hcl for {vpc_pair_name} at {terragrunt_file_path}")
\ No newline at end of file
+        if account_id is None:
+            return
+
+        planner = PairPlanner.from_spec(settings, self.pair_strategy)
+        analyzer_dir = f"live/{account_id}/ReachabilityAnalyzer"
+        state = PairState(analyzer_dir, region or "default")
+        existing = state.existing_pairs(vpcs)
+
+        model = None
+        if planner.strategy == "model":
+            with metrics.stage("route_model", account=account_id, region=region):
+                model = self.route_model(vpcs, account_id, region)
+
+        with metrics.stage("pairing", account=account_id, region=region, strategy=planner.strategy):
+            planned = planner.plan(vpcs, state, model)
+        if planner.undecided:
+            # Nothing was decided about the existing pairs, which must not look orphaned
+            unit_manifest.keep([f"{analyzer_dir}/{name}/terragrunt.hcl" for name in sorted(existing)], source_path)
+            print(
+                f"Reachability pairs ({planner.strategy}) for account {account_id}, region {region}: "
+                f"none planned, {planner.undecided}; {len(existing)} existing pairs kept"
+            )
+            return
+        added = set(planned) - existing
+        # Kept pairs are unchanged, so they only get recorded as current in the manifest
+        for name, pair in planner.keep_existing(existing, vpcs).items():
+            planned.setdefault(name, pair)
+
+        for vpc_pair_name, (source_vpc, target_vpc) in planned.items():
+            # Generate args for the reachability analyzer
+            args = self.pair_context(source_vpc, target_vpc, account_id)
+
+            terragrunt_file_path = Path(f"{analyzer_dir}/{vpc_pair_name}") / "terragrunt.hcl"
+            if unit_manifest.is_current(
+                str(terragrunt_file_path), args, self.REACHABILITY_TEMPLATE_FILE, source_path
+            ):
+                continue
+
+            # Render the reachability analyzer terragrunt.hcl content
+            content = template_registry.render(self.REACHABILITY_TEMPLATE_FILE, **args)
+
+            # Write the rendered content to the filesystem if it changed
+            written = unit_manifest.write_unit(
+                str(terragrunt_file_path), content, args, self.REACHABILITY_TEMPLATE_FILE, source_path
+            )
+            if written:
+                print(f"Generated reachability analysis terragrunt.hcl for {vpc_pair_name} at {terragrunt_file_path}")
+
+        # An archive run leaves live/ as it is: pruned units and the planner state would
+        # describe units that were never written below live/
+        stale = [] if unit_manifest.archiving else sorted(existing - set(planned))
+        pruned = stale if self.prune_pairs else []
+        unit_manifest.prune([f"{analyzer_dir}/{name}/terragrunt.hcl" for name in pruned])
+        for name in stale:
+            if self.prune_pairs:
+                print(f"Pruned reachability analysis for {name}")
+            else:
+                print(f"Stale reachability analysis for {name}, delete it with --prune-orphans")
+
+        if model is not None:
+            print(f"Route model for account {account_id}, region {region}: {model.summary(planner.verdicts)}")
+        if not unit_manifest.archiving:
+            # Stale pairs that were kept stay in the state, to be pruned by a later run
+            state.save(vpcs, set(planned) | (set(stale) - set(pruned)), planner.verdicts)
+        metrics.count("pairs", len(planned), account=account_id, strategy=planner.strategy, result="planned")
+        metrics.count("pairs", len(added), account=account_id, strategy=planner.strategy, result="added")
+        metrics.count("pairs", len(pruned), account=account_id, strategy=planner.strategy, result="pruned")
+        metrics.count("pairs", len(stale) - len(pruned), account=account_id, strategy=planner.strategy, result="stale")
+        print(
+            f"Reachability pairs ({planner.strategy}) for account {account_id}, region {region}: "
+            f"{len(planned)} planned, {len(added)} added, {len(pruned)} pruned, {len(stale) - len(pruned)} stale"
+        )
+
+    def pair_context(self, source_vpc, target_vpc, account_id):
+        """
+        Build the template inputs of the reachability analysis of a VPC pair. The analysis
+        depends on the attachment units of both VPCs, when they exist.
+        """
+        args = {
+            "source_vpc_id": source_vpc["vpc_id"],
+            "target_vpc_id": target_vpc["vpc_id"]
+        }
+        dependencies = []
+        for vpc in (source_vpc, target_vpc):
+            vpc_name = vpc.get("vpc_name") or vpc["vpc_id"]
+            if unit_manifest.has_unit(f"live/{account_id}/CoreNetworkAttachment/{vpc_name}"):
+                dependencies.append(f"../../CoreNetworkAttachment/{vpc_name}")
+        if dependencies:
+            args["dependencies"] = dependencies
+        return args
+
+    def route_model(self, vpcs, account_id, region):
+        """Build the offline route model of the VPCs from the cached Transit Gateway routing."""
+        routing = {}
+        for transit_gateway_id in sorted({vpc["transit_gateway_id"] for vpc in vpcs}):
+            routing[transit_gateway_id] = inventory_cache.get_tgw_routing(account_id, region, transit_gateway_id)
+        return RouteModel(vpcs, routing)
@@ -0,0 +1,13 @@
+from base_resource import BaseResource
+
+
+class TransitGatewayResource(BaseResource):
+    __slots__ = ()
+
+    SCHEMA_FILE = "resources/schemas/transit_gateway_schema.json"
+
+    def validate(self):
+        return super().validate(self.SCHEMA_FILE)
+
+    def transform(self):
+        raise NotImplementedError("Transform is not supported for TransitGatewayResource.")
@@ -0,0 +1,39 @@
+from base_processor import BaseProcessor
+from tgw_registry import tgw_registry
+
+
+class TransitGatewayProcessor(BaseProcessor):
+    def process_resources(self):
+        """
+        Register the TransitGateway resources in the TGW registry. TransitGateway
+        resources are reference data for other kinds, no terragrunt.hcl is generated.
+        """
+        for resource in self.resources:
+            self.process_resource(resource)
+
+    def process_resource(self, resource):
+        """Register a single TransitGateway resource."""
+        if not self.validate_resource(resource):
+            print(f"Validation failed for resource {resource.metadata['name']}")
+            return
+
+        tgw_registry.register(resource)
+
+    def validate(self):
+        """Validate the list of TransitGateway resources for duplicate names."""
+        seen_names = set()
+
+        for resource in self.resources:
+            resource_name = resource.metadata["name"]
+
+            # Check for duplicate resource names
+            if resource_name in seen_names:
+                print(f"Duplicate name found: {resource_name}")
+                return False
+            seen_names.add(resource_name)
+
+        return True
+
+    def validate_resource(self, resource):
+        """Validate a single TransitGateway resource."""
+        return resource.validate()
@@ -2,6 +2,8 @@ from base_resource import BaseResource
 
 
 class VPCResource(BaseResource):
+    __slots__ = ()
+
     SCHEMA_FILE = "resources/schemas/vpc_schema.json"
     TEMPLATE_FILE = "resources/templates/vpc_terragrunt.hcl.j2"
 
@@ -1,11 +1,20 @@
 from base_processor import BaseProcessor
+from cidr_index import CidrOverlapIndex, DEFAULT_ROUTING_DOMAIN
+from declared_vpcs import declared_vpcs
+from inventory_cache import inventory_cache
 import json
 
 class VPCProcessor(BaseProcessor):
+    def __init__(self, resources, include_live_cidrs=False):
+        super().__init__(resources)
+        self.include_live_cidrs = include_live_cidrs
+        self.cidr_index = CidrOverlapIndex()  # CIDRs admitted so far when streaming
+        self.live_partitions = set()
+
     def validate(self):
-        """Validate the list of VPC resources for duplicates and conflicting CIDR blocks."""
+        """Validate the list of VPC resources for duplicates and overlapping CIDR blocks."""
         seen_names = set()
-        cidr_blocks = set()
+        cidr_index = CidrOverlapIndex()
 
         for resource in self.resources:
             # Accessing attributes via dot notation, not subscripting
@@ -18,18 +27,93 @@ class VPCProcessor(BaseProcessor):
                 return False
             seen_names.add(resource_name)
 
-            # Check for conflicting CIDR blocks
-            if cidr_block in cidr_blocks:
-                print(f"Conflicting CIDR block found: {cidr_block}")
+            try:
+                cidr_index.add(
+                    cidr_block,
+                    resource_name,
+                    resource.spec.get("account_id"),
+                    resource.spec.get("region"),
+                    resource.spec.get("routing_domain"),
+                )
+            except (TypeError, ValueError):
+                print(f"Invalid CIDR block {cidr_block} for resource {resource_name}")
                 return False
-            cidr_blocks.add(cidr_block)
 
+        if self.include_live_cidrs:
+            self.add_live_cidrs(cidr_index)
+
+        # Check for overlapping CIDR blocks, reporting every conflicting pair
+        conflicts = cidr_index.conflicts()
+        for (account_id, region, routing_domain), (cidr, owner, _), (other_cidr, other_owner, other_live) in conflicts:
+            source = "live VPC" if other_live else "VPC"
+            print(
+                f"Conflicting CIDR block found in account {account_id}, region {region}, routing domain "
+                f"{routing_domain}: {cidr} ({owner}) overlaps {other_cidr} ({source} {other_owner})"
+            )
+        return not conflicts
+
+    def admit(self, resource):
+        """Check a VPC for a duplicate name and for CIDR overlaps with the VPCs admitted before it."""
+        resource_name = resource.metadata["name"]
+        cidr_block = resource.spec.get("cidr_block")
+        account_id = resource.spec.get("account_id")
+        region = resource.spec.get("region")
+        routing_domain = resource.spec.get("routing_domain")
+
+        if self.include_live_cidrs and (account_id, region) not in self.live_partitions:
+            self.live_partitions.add((account_id, region))
+            for vpc in inventory_cache.get_vpcs(account_id, region):
+                if vpc.get("cidr_block"):
+                    self.cidr_index.admit(vpc["cidr_block"], vpc.get("vpc_name") or vpc["vpc_id"], account_id, region, live=True)
+
+        if resource_name in self.seen_names:
+            print(f"Duplicate name found: {resource_name}")
+            return False
+
+        try:
+            conflict = self.cidr_index.admit(
+                cidr_block, resource_name, account_id, region, routing_domain, live_name=resource.spec.get("vpc_name")
+            )
+        except (TypeError, ValueError):
+            print(f"Invalid CIDR block {cidr_block} for resource {resource_name}")
+            return False
+        if conflict is not None:
+            other_cidr, other_owner, other_live = conflict
+            source = "live VPC" if other_live else "VPC"
+            print(
+                f"Conflicting CIDR block found in account {account_id}, region {region}, routing domain "
+                f"{routing_domain or DEFAULT_ROUTING_DOMAIN}: {cidr_block} ({resource_name}) overlaps {other_cidr} ({source} {other_owner})"
+            )
+            return False
+
+        self.seen_names.add(resource_name)
         return True
 
+    def add_live_cidrs(self, cidr_index):
+        """
+        Add the CIDRs of already-discovered VPCs to the overlap index. Live VPCs that carry
+        the name of a declared VPC are that VPC and are skipped.
+        """
+        declared = {}
+        for resource in self.resources:
+            key = (resource.spec.get("account_id"), resource.spec.get("region"))
+            declared.setdefault(key, set()).add(resource.spec.get("vpc_name"))
+
+        for (account_id, region), vpc_names in declared.items():
+            for vpc in inventory_cache.get_vpcs(account_id, region):
+                if not vpc.get("cidr_block") or vpc.get("vpc_name") in vpc_names:
+                    continue
+                cidr_index.add(vpc["cidr_block"], vpc.get("vpc_name") or vpc["vpc_id"], account_id, region, live=True)
+
+    def process_resource(self, resource):
+        """Generate the unit of a VPC and index it for attachments resolved from declared VPCs."""
+        declared_vpcs.register(resource)
+        super().process_resource(resource)
+
     def validate_resource(self, resource):
         """Validate a single VPC resource by calling resource's validate method."""
         return resource.validate()  # Calls the validate method of the resource model
 
     def transform_resource(self, resource):
         """Transform a single VPC resource into the Terragrunt configuration by calling the resource's transform method."""
-        return resource.transform()  # Calls the transform method of the resource model
\ No newline at end of file
+        return resource.transform()  # Calls the transform method of the resource model
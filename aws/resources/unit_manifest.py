@@ -0,0 +1,378 @@
+import hashlib
+import io
+import itertools
+import json
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+import zipfile
+from instrumentation import metrics, unit_labels
+
+MANIFEST_FILE = "live/.manifest.json"
+
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".zip")
+
+# Read once at import, before any worker thread: os.umask can only be read by setting it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+# Oldest timestamp zip supports, used for every member so archives only differ by content
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+def content_hash(data):
+    """Return the sha256 hex digest of a string or bytes."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def context_hash(context):
+    """Return a stable hash of a render context."""
+    return content_hash(json.dumps(context, sort_keys=True, default=str))
+
+
+def file_mode(file_path):
+    """
+    Return the mode a file written to file_path should get: the mode of the file it
+    replaces, or what open() would create (0666 less the umask) for a new file.
+    """
+    try:
+        return stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+def atomic_write(file_path, content):
+    """
+    Write a file through a temporary file in the same directory and an atomic rename.
+    `content` is a string or an iterable of string chunks, which are written as they come.
+    """
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        # mkstemp creates the file 0600, which the rename would keep
+        os.fchmod(fd, file_mode(file_path))
+        with os.fdopen(fd, "w") as temp_file:
+            if isinstance(content, str):
+                temp_file.write(content)
+            else:
+                temp_file.writelines(content)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class UnitArchive:
+    """
+    A tar or zip file the units of a run are streamed into, instead of one file per unit
+    below live/, so CI uploads and downloads one artifact. Members are named after the
+    unit paths (live/<account_id>/<kind>/<name>/terragrunt.hcl): extracting the archive in
+    the `aws` folder lays the units out as usual. The file is written under a temporary
+    name and renamed when closed.
+
+    Args:
+        path (str): Archive file, its format chosen by suffix: .tar, .tar.gz, .tgz or .zip.
+    """
+
+    def __init__(self, path):
+        if not path.endswith(ARCHIVE_SUFFIXES):
+            raise ValueError(f"Unknown archive format {path}, expected one of {', '.join(ARCHIVE_SUFFIXES)}")
+        self.path = path
+        self.names = set()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._temp_path = f"{path}.tmp"
+        self._tar = None
+        self._zip = None
+        if path.endswith(".zip"):
+            self._zip = zipfile.ZipFile(self._temp_path, "w", zipfile.ZIP_DEFLATED)
+        else:
+            mode = "w|" if path.endswith(".tar") else "w|gz"
+            self._tar = tarfile.open(self._temp_path, mode, format=tarfile.PAX_FORMAT)
+
+    def add(self, unit_path, content):
+        """Append a unit to the archive. A unit already in the archive is not added again."""
+        data = content.encode("utf-8")
+        with self._lock:
+            if unit_path in self.names:
+                return
+            self.names.add(unit_path)
+            if self._zip is not None:
+                info = zipfile.ZipInfo(unit_path, date_time=ZIP_EPOCH)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                self._zip.writestr(info, data)
+            else:
+                info = tarfile.TarInfo(unit_path)
+                info.size = len(data)
+                info.mode = 0o644
+                self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        with self._lock:
+            (self._zip or self._tar).close()
+            os.replace(self._temp_path, self.path)
+
+
+class UnitManifest:
+    """
+    Record of every generated unit under live/ with the hashes it was generated from.
+
+    Each entry holds the hash of the unit's input (its render context), of its template,
+    and of its rendered output, plus the config file it came from. Units whose input and
+    template hashes are unchanged are not rendered or written again.
+    """
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self._entries = None
+        self._template_hashes = {}
+        self._lock = threading.RLock()
+        self.force = False
+        self.changed = []
+        self.unchanged = []
+        self.removed = []
+        self.sources = set()
+        self.archive = None
+        self.archiving = False  # Also set in worker processes, which send their units to the parent's archive
+        self._archived = []
+        self._archived_units = set()
+        self._archived_by_account = {}
+
+    @property
+    def entries(self):
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+        return self._entries
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as manifest_file:
+                return json.load(manifest_file).get("units", {})
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print(f"Ignoring unreadable manifest {self.path}: {e}")
+            return {}
+
+    def template_hash(self, template_file):
+        template_hash = self._template_hashes.get(template_file)
+        if template_hash is None:
+            with open(template_file, 'rb') as file:
+                template_hash = content_hash(file.read())
+            self._template_hashes[template_file] = template_hash
+        return template_hash
+
+    def is_current(self, unit_path, context, template_file, source=None):
+        """
+        Check whether a unit is up to date. Current units are recorded as unchanged.
+
+        Args:
+            unit_path (str): Path of the generated terragrunt.hcl.
+            context (dict): The render context the unit is generated from.
+            template_file (str): The template the unit is rendered with.
+            source (str): The config file the unit comes from.
+        """
+        entry = self.entries.get(unit_path)
+        # Every unit of the run goes into the archive, so none is skipped
+        if (
+            self.force
+            or self.archiving
+            or entry is None
+            or entry.get("input_hash") != context_hash(context)
+            or entry.get("template_hash") != self.template_hash(template_file)
+            or not os.path.exists(unit_path)
+        ):
+            return False
+
+        with self._lock:
+            self.unchanged.append(unit_path)
+            if source:
+                self.sources.add(source)
+        metrics.count("units", result="unchanged", **unit_labels(unit_path))
+        return True
+
+    def write_unit(self, unit_path, content, context, template_file, source=None):
+        """
+        Atomically write a unit unless its rendered output is already on disk, and record it.
+
+        Returns:
+            bool: True if the file was written.
+        """
+        entry = {
+            "source": source,
+            "input_hash": context_hash(context),
+            "template_hash": self.template_hash(template_file),
+            "output_hash": content_hash(content),
+        }
+        previous = self.entries.get(unit_path)
+        if self.archiving:
+            written = previous is None or previous.get("output_hash") != entry["output_hash"]
+            with metrics.stage("write", **unit_labels(unit_path)):
+                self._archive_unit(unit_path, content)
+        elif not os.path.exists(unit_path):
+            written = True
+        elif previous is not None:
+            written = previous.get("output_hash") != entry["output_hash"]
+        else:
+            # Unit generated before the manifest existed: compare with the file on disk
+            with open(unit_path, 'rb') as unit_file:
+                written = content_hash(unit_file.read()) != entry["output_hash"]
+        if written and not self.archiving:
+            with metrics.stage("write", **unit_labels(unit_path)):
+                atomic_write(unit_path, content)
+
+        with self._lock:
+            self.entries[unit_path] = entry
+            (self.changed if written else self.unchanged).append(unit_path)
+            if source:
+                self.sources.add(source)
+        metrics.count("units", result="generated" if written else "unchanged", **unit_labels(unit_path))
+        return written
+
+    def open_archive(self, path):
+        """Stream the units of this run into an archive instead of writing them below live/."""
+        self.archive = UnitArchive(path)
+        self.archiving = True
+
+    def close_archive(self):
+        """Finish the archive. Returns its path, or None if no archive was open."""
+        if self.archive is None:
+            return None
+        self.archive.close()
+        path, self.archive = self.archive.path, None
+        return path
+
+    def detach_archive(self):
+        """
+        In a forked worker process, collect units for the parent's archive instead of
+        writing to it. The inherited writer stays referenced: releasing it would flush
+        its buffers into the parent's file.
+        """
+        if self.archive is not None:
+            self._parent_archive, self.archive = self.archive, None
+
+    def _archive_unit(self, unit_path, content):
+        with self._lock:
+            self._note_archived(unit_path)
+            if self.archive is None:
+                self._archived.append((unit_path, content))
+                return
+        self.archive.add(unit_path, content)
+
+    def archived_units(self, account_id):
+        """Return the paths of the units of an account that went into the archive in this run."""
+        with self._lock:
+            return list(self._archived_by_account.get(account_id, ()))
+
+    def add_archived_units(self, unit_paths):
+        """Record units another process sent to the archive."""
+        with self._lock:
+            for unit_path in unit_paths:
+                self._note_archived(unit_path)
+
+    def _note_archived(self, unit_path):
+        if unit_path not in self._archived_units:
+            self._archived_units.add(unit_path)
+            self._archived_by_account.setdefault(unit_labels(unit_path).get("account"), []).append(unit_path)
+
+    def keep(self, unit_paths, source=None):
+        """Record units of the manifest that a run leaves as they are as unchanged, so they are not orphaned."""
+        with self._lock:
+            for unit_path in unit_paths:
+                if unit_path in self.entries:
+                    self.unchanged.append(unit_path)
+            if source:
+                self.sources.add(source)
+
+    def has_unit(self, unit_dir):
+        """Return True if a unit exists below live/, or went into the archive in this run."""
+        return os.path.isdir(unit_dir) or os.path.join(unit_dir, "terragrunt.hcl") in self._archived_units
+
+    def reset(self):
+        """Forget what was recorded by the previous run, keeping the entries."""
+        with self._lock:
+            self.changed, self.unchanged, self.removed, self.sources = [], [], [], set()
+
+    def orphans(self):
+        """
+        Return units that were not produced by this run although they should have been:
+        their source config file was removed, or it was processed without yielding them.
+        """
+        produced = set(self.changed) | set(self.unchanged)
+        orphans = []
+        for unit_path, entry in self.entries.items():
+            if unit_path in produced:
+                continue
+            source = entry.get("source")
+            if source and (source in self.sources or not os.path.exists(source)):
+                orphans.append(unit_path)
+        return sorted(orphans)
+
+    def prune(self, unit_paths):
+        """Delete unit directories and drop them from the manifest."""
+        for unit_path in unit_paths:
+            unit_dir = os.path.dirname(unit_path)
+            if os.path.isdir(unit_dir):
+                shutil.rmtree(unit_dir)
+            with self._lock:
+                self.entries.pop(unit_path, None)
+                self.removed.append(unit_path)
+            metrics.count("units", result="removed", **unit_labels(unit_path))
+
+    def take_updates(self):
+        """Return and reset what was recorded since the last call, for merging across processes."""
+        with self._lock:
+            produced = self.changed + self.unchanged
+            updates = {
+                "entries": {unit_path: self.entries[unit_path] for unit_path in produced if unit_path in self.entries},
+                "changed": self.changed,
+                "unchanged": self.unchanged,
+                "removed": self.removed,
+                "sources": sorted(self.sources),
+                "archived": self._archived,
+            }
+            self.changed, self.unchanged, self.removed, self.sources = [], [], [], set()
+            self._archived = []
+        return updates
+
+    def merge_updates(self, updates):
+        """Merge updates returned by take_updates() in another process."""
+        with self._lock:
+            self.entries.update(updates["entries"])
+            self.changed.extend(updates["changed"])
+            self.unchanged.extend(updates["unchanged"])
+            self.sources.update(updates["sources"])
+            for unit_path in updates["removed"]:
+                self.entries.pop(unit_path, None)
+                self.removed.append(unit_path)
+        for unit_path, content in updates.get("archived", ()):
+            self._archive_unit(unit_path, content)
+
+    def save(self):
+        """Atomically write the manifest, keeping units in a stable order."""
+        manifest = {"units": dict(sorted(self.entries.items()))}
+        # Encoded in chunks, so the whole manifest never exists as one string
+        chunks = json.JSONEncoder(indent=2).iterencode(manifest)
+        atomic_write(self.path, itertools.chain(chunks, ["\n"]))
+
+    def report(self):
+        """Return the changed and orphaned units for CI."""
+        return {
+            "changed": sorted(self.changed),
+            "unchanged": len(self.unchanged),
+            "removed": sorted(self.removed),
+            "orphaned": self.orphans(),
+        }
+
+
+# Process-wide manifest shared by all writers
+unit_manifest = UnitManifest()
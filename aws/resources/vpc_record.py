@@ -0,0 +1,64 @@
+import sys
+from collections.abc import Mapping
+
+FIELDS = ("vpc_id", "vpc_name", "cidr_block", "environment", "subnet_ids", "route_table_ids", "tgw_routes")
+_FIELD_SET = frozenset(FIELDS)
+
+
+class VpcRecord(Mapping):
+    """
+    Compact record of one discovered VPC.
+
+    Discovery of large estates keeps hundreds of thousands of these in memory, so fields
+    live in __slots__ instead of a dict per VPC. ID lists are tuples, and the values many
+    VPCs share (environment, TGW route destinations) are interned. Records are read-only
+    mappings with the keys of the dicts they replace: vpc["vpc_id"], vpc.get("subnet_ids")
+    and dict(vpc) keep working. Unset (None) fields are left out of the mapping, like a
+    key missing from an older inventory snapshot.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, vpc_id, vpc_name=None, cidr_block=None, environment=None, subnet_ids=(), route_table_ids=(), tgw_routes=None):
+        self.vpc_id = vpc_id
+        self.vpc_name = vpc_name
+        self.cidr_block = cidr_block
+        self.environment = sys.intern(environment) if environment else environment
+        self.subnet_ids = tuple(subnet_ids)
+        self.route_table_ids = tuple(route_table_ids)
+        self.tgw_routes = None if tgw_routes is None else {
+            route_table_id: tuple(sys.intern(cidr) for cidr in cidrs) for route_table_id, cidrs in tgw_routes.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a VPC dict, e.g. one read from an inventory snapshot."""
+        return cls(**{field: data[field] for field in FIELDS if data.get(field) is not None})
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        return default
+
+    def __iter__(self):
+        return (field for field in FIELDS if getattr(self, field) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"VpcRecord({dict(self)!r})"
+
+
+def vpc_records(vpcs):
+    """Return VPC dicts (or records) as a list of VpcRecords."""
+    return [vpc if isinstance(vpc, VpcRecord) else VpcRecord.from_dict(vpc) for vpc in vpcs]
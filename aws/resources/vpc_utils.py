@@ -1,94 +1,179 @@
-import boto3
-import os
-import yaml
+from aws_clients import client_pool
+from tgw_registry import tgw_registry
+from vpc_record import VpcRecord
 
-def find_vpcs_with_tgw_attachment(account_id, region):
-    """Find all VPCs, subnets, and route tables with TransitGatewayAttachment=true."""
-    ec2 = boto3.client('ec2', region_name=region)
+# EC2 accepts at most 200 values per filter
+VPC_ID_FILTER_LIMIT = 200
 
-    vpcs = ec2.describe_vpcs(
-        Filters=[{"Name": "tag:TransitGatewayAttachment", "Values": ["true"]}]
-    )["Vpcs"]
+TGW_ATTACHMENT_FILTER = {"Name": "tag:TransitGatewayAttachment", "Values": ["true"]}
+
+
+def paginate(region, operation, result_key, filters, ec2=None):
+    """Yield every item of a paginated EC2 describe call, rate limited and retried by the client pool."""
+    return client_pool.paginate("ec2", region, operation, result_key, client=ec2, Filters=filters)
+
+
+def group_by_vpc(region, operation, result_key, vpc_ids, ec2=None):
+    """
+    Fetch tagged subnets or route tables for many VPCs at once and group them by VPC.
+
+    Up to VPC_ID_FILTER_LIMIT VPCs are queried with a single multi-value vpc-id filter.
+    Beyond that one tag-filtered sweep of the region is cheaper, so items are grouped
+    client-side and anything belonging to other VPCs is dropped.
+    """
+    grouped = {vpc_id: [] for vpc_id in vpc_ids}
+    if not vpc_ids:
+        return grouped
+
+    filters = [TGW_ATTACHMENT_FILTER]
+    if len(vpc_ids) <= VPC_ID_FILTER_LIMIT:
+        filters = [{"Name": "vpc-id", "Values": list(vpc_ids)}, TGW_ATTACHMENT_FILTER]
+
+    for item in paginate(region, operation, result_key, filters, ec2):
+        items = grouped.get(item["VpcId"])
+        if items is not None:
+            items.append(item)
+    return grouped
+
+
+def group_ids_by_vpc(region, operation, result_key, id_key, vpc_ids, ec2=None):
+    """Like group_by_vpc, keeping only the ID of each item."""
+    grouped = group_by_vpc(region, operation, result_key, vpc_ids, ec2)
+    return {vpc_id: [item[id_key] for item in items] for vpc_id, items in grouped.items()}
+
+
+def tgw_routes(route_table):
+    """Return the destination CIDRs a VPC route table sends to a Transit Gateway."""
+    return sorted(
+        route["DestinationCidrBlock"] for route in route_table.get("Routes", [])
+        if route.get("TransitGatewayId") and route.get("DestinationCidrBlock") and route.get("State") != "blackhole"
+    )
+
+
+def find_vpcs_with_tgw_attachment(account_id, region, ec2=None):
+    """
+    Find all VPCs, subnets, and route tables with TransitGatewayAttachment=true.
+
+    Discovery costs a constant number of paged calls per region: one sweep each for
+    VPCs, subnets and route tables, regardless of how many VPCs are found.
+
+    Args:
+        account_id (str): The account the VPCs belong to.
+        region (str): The region to search.
+        ec2: Optional EC2 client, e.g. one wrapped in a botocore Stubber. Defaults to
+            the shared client of the client pool.
+    """
+    vpcs = list(paginate(region, "describe_vpcs", "Vpcs", [TGW_ATTACHMENT_FILTER], ec2))
+    vpc_ids = [vpc["VpcId"] for vpc in vpcs]
+
+    subnets_by_vpc = group_ids_by_vpc(region, "describe_subnets", "Subnets", "SubnetId", vpc_ids, ec2)
+    route_tables_by_vpc = group_by_vpc(region, "describe_route_tables", "RouteTables", vpc_ids, ec2)
 
     results = []
     for vpc in vpcs:
         vpc_id = vpc["VpcId"]
 
-        # Fetch VPC name from the tags
-        vpc_name = None
-        if "Tags" in vpc:
-            for tag in vpc["Tags"]:
-                if tag["Key"] == "Name":
-                    vpc_name = tag["Value"]
-                    break
-        vpc_name = vpc_name or vpc_id  # Use vpc_id as fallback if no Name tag is found
-
-        # Fetch subnets
-        subnets = ec2.describe_subnets(
-            Filters=[
-                {"Name": "vpc-id", "Values": [vpc_id]},
-                {"Name": "tag:TransitGatewayAttachment", "Values": ["true"]}
-            ]
-        )["Subnets"]
-        subnet_ids = [subnet["SubnetId"] for subnet in subnets]
-
-        # Fetch route tables
-        route_tables = ec2.describe_route_tables(
-            Filters=[
-                {"Name": "vpc-id", "Values": [vpc_id]},
-                {"Name": "tag:TransitGatewayAttachment", "Values": ["true"]}
-            ]
-        )["RouteTables"]
-        route_table_ids = [rt["RouteTableId"] for rt in route_tables]
-
-        results.append({
-            "vpc_id": vpc_id,
-            "vpc_name": vpc_name, 
-            "subnet_ids": subnet_ids,
-            "route_table_ids": route_table_ids,
-        })
+        # Fetch VPC name and environment from the tags
+        tags = {tag["Key"]: tag["Value"] for tag in vpc.get("Tags", [])}
+        vpc_name = tags.get("Name") or vpc_id  # Use vpc_id as fallback if no Name tag is found
+
+        results.append(VpcRecord(
+            vpc_id,
+            vpc_name=vpc_name,
+            cidr_block=vpc.get("CidrBlock"),
+            environment=tags.get("Environment"),
+            subnet_ids=subnets_by_vpc[vpc_id],
+            route_table_ids=[route_table["RouteTableId"] for route_table in route_tables_by_vpc[vpc_id]],
+            tgw_routes={
+                route_table["RouteTableId"]: tgw_routes(route_table) for route_table in route_tables_by_vpc[vpc_id]
+            },
+        ))
 
     return results
 
 
-def find_tgw_id(region="eu-west-1", tgw_file="tgw.yaml"):
+def find_tgw_routing(region, transit_gateway_id, ec2=None):
+    """
+    Fetch the VPC attachments and route tables of a Transit Gateway, with the associations,
+    propagations and active or blackhole routes of each route table.
+
+    Returns:
+        dict: {"transit_gateway_id", "attachments": {attachment_id: vpc_id}, "route_tables": [...]}, with
+            "truncated" set on route tables with more routes than search_transit_gateway_routes returns.
+    """
+    tgw_filter = {"Name": "transit-gateway-id", "Values": [transit_gateway_id]}
+    attachments = list(paginate(
+        region, "describe_transit_gateway_attachments", "TransitGatewayAttachments",
+        [tgw_filter, {"Name": "resource-type", "Values": ["vpc"]}, {"Name": "state", "Values": ["available"]}], ec2,
+    ))
+
+    route_tables = []
+    for route_table in paginate(
+        region, "describe_transit_gateway_route_tables", "TransitGatewayRouteTables", [tgw_filter], ec2
+    ):
+        route_table_id = route_table["TransitGatewayRouteTableId"]
+        associations = list(client_pool.paginate(
+            "ec2", region, "get_transit_gateway_route_table_associations", "Associations",
+            client=ec2, TransitGatewayRouteTableId=route_table_id,
+        ))
+        propagations = list(client_pool.paginate(
+            "ec2", region, "get_transit_gateway_route_table_propagations", "TransitGatewayRouteTablePropagations",
+            client=ec2, TransitGatewayRouteTableId=route_table_id,
+        ))
+        response = client_pool.call(
+            "ec2", region, "search_transit_gateway_routes", client=ec2, TransitGatewayRouteTableId=route_table_id,
+            Filters=[{"Name": "state", "Values": ["active", "blackhole"]}], MaxResults=1000,
+        )
+        # The first 1000 routes may lack the most specific route of a CIDR, the model treats them as unknown
+        truncated = bool(response.get("AdditionalRoutesAvailable"))
+        if truncated:
+            print(f"Transit Gateway route table {route_table_id} has more than 1000 routes, its paths are not modelled.")
+
+        route_tables.append({
+            "route_table_id": route_table_id,
+            "truncated": truncated,
+            "associations": sorted(
+                association["TransitGatewayAttachmentId"] for association in associations
+                if association.get("State") == "associated"
+            ),
+            "propagations": sorted(
+                propagation["TransitGatewayAttachmentId"] for propagation in propagations
+                if propagation.get("State") == "enabled"
+            ),
+            "routes": [
+                {
+                    "cidr": route["DestinationCidrBlock"],
+                    "state": route["State"],
+                    "attachment_ids": sorted(
+                        attachment["TransitGatewayAttachmentId"]
+                        for attachment in route.get("TransitGatewayAttachments", [])
+                    ),
+                }
+                for route in response.get("Routes", []) if route.get("DestinationCidrBlock")
+            ],
+        })
+
+    return {
+        "transit_gateway_id": transit_gateway_id,
+        "attachments": {
+            attachment["TransitGatewayAttachmentId"]: attachment["ResourceId"] for attachment in attachments
+        },
+        "route_tables": route_tables,
+    }
+
+
+def find_tgw_id(region="eu-west-1", account_id=None):
     """
     Find the Transit Gateway (TGW) ID for the given region.
 
     Args:
         region (str): The region to look for the TGW ID.
-        tgw_file (str): The name of the YAML file containing TGW specifications. Default is 'tgw.yaml'.
+        account_id (str): Optional account, to prefer TGWs declared for that account.
 
     Returns:
         str: The TGW ID for the given region if found, otherwise None.
     """
-    try:
-        # Get the path to the tgw.yaml file in the "config" directory
-        current_dir = os.getcwd()
-        input_dir = os.path.join(current_dir, "config")
-        tgw_file_path = os.path.join(input_dir, tgw_file)
-
-        # Open and parse the tgw.yaml file
-        with open(tgw_file_path, 'r') as file:
-            tgw_data = yaml.safe_load(file)
-
-        # Check if the spec and transit_gateways keys exist
-        transit_gateways = tgw_data.get("spec", {}).get("transit_gateways", [])
-        if not transit_gateways:
-            print(f"No transit gateways found in {tgw_file_path}.")
-            return None
-
-        # Search for the region in the list of transit gateways
-        for tgw in transit_gateways:
-            if tgw.get("region") == region:
-                return tgw.get("id")
-
+    transit_gateway_id = tgw_registry.find(region, account_id)
+    if not transit_gateway_id:
         print(f"No Transit Gateway found for region: {region}")
-        return None
-
-    except FileNotFoundError:
-        print(f"File {tgw_file_path} not found.")
-        return None
-    except yaml.YAMLError as e:
-        print(f"Error parsing YAML file {tgw_file_path}: {e}")
-        return None
\ No newline at end of file
+    return transit_gateway_id
@@ -0,0 +1,23 @@
+provider "aws" {
+  region = var.region
+}
+
+data "aws_caller_identity" "current" {}
+
+# Account baseline: the environment of the account, readable by the other modules and by tooling
+resource "aws_ssm_parameter" "environment" {
+  name  = "/trafficplatform/account/environment"
+  type  = "String"
+  value = var.environment
+
+  tags = {
+    Environment = var.environment
+  }
+
+  lifecycle {
+    precondition {
+      condition     = data.aws_caller_identity.current.account_id == var.account_id
+      error_message = "The credentials belong to account ${data.aws_caller_identity.current.account_id}, not ${var.account_id}."
+    }
+  }
+}
@@ -0,0 +1,11 @@
+output "account_id" {
+  value = data.aws_caller_identity.current.account_id
+}
+
+output "environment" {
+  value = aws_ssm_parameter.environment.value
+}
+
+output "environment_parameter_name" {
+  value = aws_ssm_parameter.environment.name
+}
@@ -0,0 +1,15 @@
+variable "account_id" {
+  description = "ID of the AWS account the unit manages, checked against the credentials"
+  type        = string
+}
+
+variable "environment" {
+  description = "Environment of the account (e.g., dev, prod)"
+  type        = string
+}
+
+variable "region" {
+  description = "The AWS region the account baseline is kept in"
+  type        = string
+  default     = "us-east-1"
+}
@@ -0,0 +1,59 @@
+package test
+
+import (
+	"testing"
+
+	"github.com/aws/aws-sdk-go/aws"
+	"github.com/aws/aws-sdk-go/aws/session"
+	"github.com/aws/aws-sdk-go/service/ssm"
+	"github.com/aws/aws-sdk-go/service/sts"
+	"github.com/gruntwork-io/terratest/modules/terraform"
+	"github.com/stretchr/testify/assert"
+)
+
+func TestAccountModule(t *testing.T) {
+	t.Parallel()
+
+	region := "us-east-1"
+	sess := session.Must(session.NewSession(&aws.Config{Region: aws.String(region)}))
+
+	identity, err := sts.New(sess).GetCallerIdentity(&sts.GetCallerIdentityInput{})
+	if err != nil {
+		t.Fatalf("Failed to get the caller identity: %v", err)
+	}
+	accountID := *identity.Account
+
+	terraformOptions := &terraform.Options{
+		TerraformDir: "../terraform-modules/account",
+		Vars: map[string]interface{}{
+			"account_id":  accountID,
+			"environment": "test",
+			"region":      region,
+		},
+	}
+
+	defer terraform.Destroy(t, terraformOptions)
+	terraform.InitAndApply(t, terraformOptions)
+
+	assert.Equal(t, accountID, terraform.Output(t, terraformOptions, "account_id"), "Account ID should match the credentials")
+
+	// Validate the environment parameter exists in AWS
+	parameterName := terraform.Output(t, terraformOptions, "environment_parameter_name")
+	parameter, err := ssm.New(sess).GetParameter(&ssm.GetParameterInput{Name: aws.String(parameterName)})
+	if err != nil {
+		t.Fatalf("Failed to get SSM parameter %s: %v", parameterName, err)
+	}
+	assert.Equal(t, "test", *parameter.Parameter.Value, "Environment parameter should match")
+
+	// Planning with another account's ID must fail before anything is changed
+	otherAccountOptions := terraform.WithDefaultRetryableErrors(t, &terraform.Options{
+		TerraformDir: "../terraform-modules/account",
+		Vars: map[string]interface{}{
+			"account_id":  "000000000000",
+			"environment": "test",
+			"region":      region,
+		},
+	})
+	_, err = terraform.PlanE(t, otherAccountOptions)
+	assert.Error(t, err, "Plan should fail for another account")
+}